@@ -0,0 +1,127 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.firefox.options import Options as FirefoxOptions
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from browser_profile import LEAN_WINDOW_SIZE, browser_memory, lean_firefox_options
+
+
+# Прозрачный PNG 1x1
+PIXEL = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+
+
+class ReaderPageHandler(BaseHTTPRequestHandler):
+    """Страница читалки со сторонними скриптами, шрифтами, маяками, изображениями и анимацией перелистывания"""
+
+    def do_GET(self):
+        page = self.path.rstrip("/").split("/")[-1]
+        text = " ".join(f"Sentence {index} of page {page}." for index in range(200))
+        body = f"""<html><head>
+<link rel="stylesheet" href="https://fonts.googleapis.com/css?family=Bookerly">
+<script async src="https://www.googletagmanager.com/gtag/js"></script>
+<style>.kindleReaderPage {{ animation: turn 0.4s ease-in; }} @keyframes turn {{ from {{ opacity: 0; }} to {{ opacity: 1; }} }}</style>
+</head><body>
+<div class='kindleReaderPage'>{text}</div>
+{''.join(f"<img class='kfx-image' src='{PIXEL}'>" for _ in range(5))}
+<img src="https://fls-na.amazon.com/1/batch/1/OE/">
+</body></html>""".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def current_options(headless):
+    """Профиль, с которым браузер запускается сейчас (KindleScraper.setup_driver)"""
+    options = FirefoxOptions()
+    options.set_preference("browser.cache.disk.enable", False)
+    options.set_preference("browser.cache.memory.enable", False)
+    if headless:
+        options.add_argument("--headless")
+    return options
+
+
+def lean_options():
+    return lean_firefox_options(FirefoxOptions())
+
+
+def measure(options, window_size, base_url, page_count):
+    """
+    Загружает страницы в отдельном браузере
+
+    :return: (память браузера после загрузки страниц в МБ, миллисекунд на страницу)
+    """
+    driver = webdriver.Firefox(options=options)
+    try:
+        driver.set_window_size(*window_size)
+        start_time = time.monotonic()
+        for page in range(page_count):
+            driver.get(f"{base_url}/reader/{page}")
+            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, ".kindleReaderPage")))
+        render_time = (time.monotonic() - start_time) / page_count * 1000
+        memory = browser_memory(driver)
+        return (memory / 1024 / 1024 if memory else float("nan")), render_time
+    finally:
+        driver.quit()
+
+
+def available_memory():
+    """
+    :return: Доступная память хоста в МБ (только Linux) или None
+    """
+    try:
+        with open("/proc/meminfo", 'r') as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def run_benchmark(page_count=20, headless_current=False):
+    """
+    Сравнивает текущий и облегченный профили браузера
+
+    :param page_count: Количество страниц
+    :param headless_current: Запускать текущий профиль без окна (для хостов без дисплея)
+    :return: Список строк результатов (profile, memory_mb, ms_per_page)
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ReaderPageHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        return [
+            ("current", *measure(current_options(headless_current), (1366, 768), base_url, page_count)),
+            ("lean", *measure(lean_options(), LEAN_WINDOW_SIZE, base_url, page_count))
+        ]
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark memory per browser and page render time for the current and lean browser profiles')
+    parser.add_argument('--pages', type=int, default=20, help='Number of pages to load')
+    parser.add_argument('--headless-current', action='store_true', help='Run the current profile headless (hosts without a display)')
+
+    args = parser.parse_args()
+
+    free_memory = available_memory()
+    print(f"Pages: {args.pages}" + (f", available memory: {free_memory:.0f} MB" if free_memory else ""))
+    print(f"{'profile':>10} {'memory, MB':>12} {'ms/page':>10} {'browsers/host':>15}")
+    for profile, memory, ms_per_page in run_benchmark(args.pages, args.headless_current):
+        per_host = f"{free_memory // memory:.0f}" if free_memory and memory == memory else "-"
+        print(f"{profile:>10} {memory:>12.0f} {ms_per_page:>10.1f} {per_host:>15}")
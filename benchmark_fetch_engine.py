@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from kindle_api_scraper import KindleAPIScraper
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Имитация API Kindle: отвечает JSON с фиксированной задержкой"""
+    protocol_version = "HTTP/1.1"
+    latency = 0.08
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        body = json.dumps({"content": f"Text for {self.path}"}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def run_benchmark(url_count=100, latency=0.08, concurrency_levels=(1, 2, 4, 8, 16, 32)):
+    """
+    Замеряет время fetch_book_content в зависимости от уровня параллелизма
+
+    :param url_count: Количество URL в наборе
+    :param latency: Задержка ответа локального сервера в секундах
+    :param concurrency_levels: Проверяемые значения max_in_flight
+    :return: Список строк результатов (concurrency, wall_time, requests_per_second)
+    """
+    StandInHandler.latency = latency
+    server = StandInServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base_url}/content/{i}" for i in range(url_count)]
+
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for concurrency in concurrency_levels:
+                scraper = KindleAPIScraper(
+                    output_file=os.path.join(tmp_dir, "bench.txt"),
+                    max_in_flight=concurrency,
+                    host_rate_limit=0
+                )
+                start_time = time.monotonic()
+                scraper.fetch_book_content(urls)
+                wall_time = time.monotonic() - start_time
+
+                if len(scraper.text_content) != url_count or scraper.text_content[0] != "Text for /content/0":
+                    raise RuntimeError(f"Unexpected results at concurrency {concurrency}")
+
+                results.append((concurrency, wall_time, url_count / wall_time))
+    finally:
+        server.shutdown()
+
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark KindleAPIScraper.fetch_book_content against a local stand-in server')
+    parser.add_argument('--urls', type=int, default=100, help='Number of content URLs to fetch')
+    parser.add_argument('--latency', type=float, default=0.08, help='Server response latency in seconds')
+    parser.add_argument('--levels', default='1,2,4,8,16,32', help='Comma-separated concurrency levels')
+
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(',')]
+
+    legacy_time = args.urls * (args.latency + 1)
+    print(f"URLs: {args.urls}, server latency: {args.latency * 1000:.0f} ms")
+    print(f"Legacy sequential loop with time.sleep(1): ~{legacy_time:.1f} s")
+    print(f"{'concurrency':>12} {'wall time, s':>14} {'req/s':>10}")
+    for concurrency, wall_time, rps in run_benchmark(args.urls, args.latency, levels):
+        print(f"{concurrency:>12} {wall_time:>14.2f} {rps:>10.1f}")
@@ -0,0 +1,101 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from selenium import webdriver
+from selenium.webdriver.firefox.options import Options as FirefoxOptions
+
+from page_extractor import CommandCounter, extract_page, extract_page_per_element
+
+
+# Прозрачный PNG 1x1
+PIXEL = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+
+
+class ReaderPageHandler(BaseHTTPRequestHandler):
+    """Страница, похожая на разметку Kindle Cloud Reader: слои текста, изображения и индикатор позиции"""
+    blocks = 20
+    images = 3
+
+    def do_GET(self):
+        page = self.path.rstrip("/").split("/")[-1]
+        layers = "".join(f"<div class='textLayer'>Page {page}, block {index}</div>" for index in range(self.blocks))
+        pictures = "".join(f"<img class='kfx-image' src='{PIXEL}' alt='Figure {index}'>" for index in range(self.images))
+        body = (f"<html><body><div class='kindleReaderPage'>{layers}{pictures}</div>"
+                f"<div class='kr-footer-message'>Location {page} of 100</div></body></html>").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def measure(driver, base_url, extract, page_count):
+    """
+    Извлекает страницы указанным способом и считает команды WebDriver только на извлечение
+
+    :return: (команд на страницу, миллисекунд на страницу)
+    """
+    counter = CommandCounter(driver)
+    elapsed = 0.0
+    try:
+        for page in range(page_count):
+            driver.get(f"{base_url}/reader/{page}")
+            counter.start_page()
+            start_time = time.monotonic()
+            result = extract(driver)
+            elapsed += time.monotonic() - start_time
+            counter.end_page()
+            if not result["texts"]:
+                raise RuntimeError(f"No text extracted from page {page}")
+    finally:
+        counter.detach()
+    return counter.summary()["per_page"], elapsed / page_count * 1000
+
+
+def run_benchmark(page_count=20, blocks=20, images=3):
+    """
+    Сравнивает извлечение страницы по элементам и одним вызовом JavaScript
+
+    :param page_count: Количество страниц
+    :param blocks: Количество блоков текста на странице
+    :param images: Количество изображений на странице
+    :return: Список строк результатов (mode, commands_per_page, ms_per_page)
+    """
+    ReaderPageHandler.blocks = blocks
+    ReaderPageHandler.images = images
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ReaderPageHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    options = FirefoxOptions()
+    options.add_argument("--headless")
+    driver = webdriver.Firefox(options=options)
+    try:
+        return [
+            ("per-element", *measure(driver, base_url, extract_page_per_element, page_count)),
+            ("batched", *measure(driver, base_url, extract_page, page_count))
+        ]
+    finally:
+        driver.quit()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark WebDriver commands per page for per-element and batched extraction')
+    parser.add_argument('--pages', type=int, default=20, help='Number of pages to extract')
+    parser.add_argument('--blocks', type=int, default=20, help='Text blocks per page')
+    parser.add_argument('--images', type=int, default=3, help='Images per page')
+
+    args = parser.parse_args()
+
+    print(f"Pages: {args.pages}, text blocks: {args.blocks}, images: {args.images}")
+    print(f"{'mode':>12} {'commands':>10} {'ms/page':>10}")
+    for mode, commands, ms_per_page in run_benchmark(args.pages, args.blocks, args.images):
+        print(f"{mode:>12} {commands:>10.1f} {ms_per_page:>10.1f}")
@@ -0,0 +1,159 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.firefox.options import Options as FirefoxOptions
+
+from session_bridge import http_scraper_from_browser
+
+
+SESSION_COOKIE = "session-id=bench"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Имитация Kindle Cloud Reader: вход выдает cookie, страницы и API требуют ее"""
+    protocol_version = "HTTP/1.1"
+    latency = 0.08
+
+    def _send(self, status, body, content_type, extra_headers=None):
+        body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/signin":
+            self._send(200, "<html><body>Signed in</body></html>", "text/html",
+                       {"Set-Cookie": f"{SESSION_COOKIE}; Path=/"})
+            return
+
+        if SESSION_COOKIE not in (self.headers.get("Cookie") or ""):
+            self._send(302, "", "text/html", {"Location": "/signin"})
+            return
+
+        time.sleep(self.latency)
+        page = self.path.rstrip("/").split("/")[-1]
+        if self.path.startswith("/reader/"):
+            self._send(200, f"<html><body><div class='kindleReaderPage'>Text of page {page}</div></body></html>", "text/html")
+        else:
+            self._send(200, json.dumps({"content": f"Text of page {page}"}), "application/json")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def create_driver():
+    options = FirefoxOptions()
+    options.add_argument("--headless")
+    return webdriver.Firefox(options=options)
+
+
+def run_selenium(base_url, page_count):
+    """
+    Все страницы открываются в браузере
+
+    :return: (время входа, время загрузки страниц) в секундах
+    """
+    start_time = time.monotonic()
+    driver = create_driver()
+    try:
+        driver.get(f"{base_url}/signin")
+        login_time = time.monotonic() - start_time
+
+        start_time = time.monotonic()
+        for page in range(page_count):
+            driver.get(f"{base_url}/reader/{page}")
+            driver.find_element(By.CSS_SELECTOR, ".kindleReaderPage").text
+        return login_time, time.monotonic() - start_time
+    finally:
+        driver.quit()
+
+
+def run_hybrid(base_url, page_count, concurrency, output_file):
+    """
+    Вход через браузер, затем браузер закрывается, а страницы загружаются по HTTP
+
+    :return: (время входа и передачи сессии, время загрузки страниц) в секундах
+    """
+    start_time = time.monotonic()
+    driver = create_driver()
+    try:
+        driver.get(f"{base_url}/signin")
+        scraper = http_scraper_from_browser(
+            driver,
+            output_file=output_file,
+            max_in_flight=concurrency,
+            host_rate_limit=0,
+            http_cache=False,
+            session_store=False
+        )
+    finally:
+        driver.quit()
+    login_time = time.monotonic() - start_time
+
+    start_time = time.monotonic()
+    scraper.fetch_book_content([f"{base_url}/api/{page}" for page in range(page_count)])
+    fetch_time = time.monotonic() - start_time
+
+    if len(scraper.text_content) != page_count:
+        raise RuntimeError(f"Expected {page_count} pages over HTTP, got {len(scraper.text_content)}")
+    return login_time, fetch_time
+
+
+def run_benchmark(page_count=50, latency=0.08, concurrency=8):
+    """
+    Сравнивает скорость загрузки страниц только браузером и браузером с передачей сессии в HTTP
+
+    :param page_count: Количество страниц
+    :param latency: Задержка ответа локального сервера в секундах
+    :param concurrency: Количество одновременных HTTP-запросов после передачи сессии
+    :return: Список строк результатов (mode, login_time, fetch_time, pages_per_second)
+    """
+    StandInHandler.latency = latency
+    server = StandInServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    results = []
+    try:
+        login_time, fetch_time = run_selenium(base_url, page_count)
+        results.append(("selenium", login_time, fetch_time, page_count / fetch_time))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for level in sorted({1, concurrency}):
+                login_time, fetch_time = run_hybrid(base_url, page_count, level, os.path.join(tmp_dir, "bench.txt"))
+                results.append((f"hybrid x{level}", login_time, fetch_time, page_count / fetch_time))
+    finally:
+        server.shutdown()
+
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark browser-only page loading against browser login with HTTP hand-off')
+    parser.add_argument('--pages', type=int, default=50, help='Number of pages to load')
+    parser.add_argument('--latency', type=float, default=0.08, help='Server response latency in seconds')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent HTTP requests after the hand-off')
+
+    args = parser.parse_args()
+
+    print(f"Pages: {args.pages}, server latency: {args.latency * 1000:.0f} ms")
+    print(f"{'mode':>12} {'login, s':>10} {'pages, s':>10} {'pages/s':>10}")
+    for mode, login_time, fetch_time, pages_per_second in run_benchmark(args.pages, args.latency, args.concurrency):
+        print(f"{mode:>12} {login_time:>10.2f} {fetch_time:>10.2f} {pages_per_second:>10.1f}")
@@ -0,0 +1,359 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from browser_profile import browser_memory
+
+
+def create_pool_driver(lean=False):
+    """
+    Запускает Firefox для пула
+
+    :param lean: Облегченный профиль без окна (изображения включены: они нужны улучшенному скраперу)
+    :return: Экземпляр веб-драйвера
+    """
+    # Импорт внутри функции: модуль пула используется и без Selenium (например, для статуса)
+    from selenium import webdriver
+    from selenium.webdriver.firefox.options import Options as FirefoxOptions
+    from selenium.webdriver.firefox.service import Service as FirefoxService
+    from browser_profile import LEAN_WINDOW_SIZE, lean_firefox_options
+    from driver_resolver import resolve_driver
+
+    options = FirefoxOptions()
+    if lean:
+        lean_firefox_options(options, images=True)
+    driver = webdriver.Firefox(service=FirefoxService(resolve_driver("geckodriver")), options=options)
+    if lean:
+        driver.set_window_size(*LEAN_WINDOW_SIZE)
+    else:
+        driver.set_window_size(1366, 768)
+    driver.set_page_load_timeout(60)
+    driver.implicitly_wait(0)
+    return driver
+
+
+class BrowserLease:
+    def __init__(self, pool, entry):
+        """
+        Браузер, выданный пулом одному заданию
+
+        :param pool: Пул, в который браузер возвращается
+        :param entry: Запись пула
+        """
+        self.pool = pool
+        self.entry = entry
+        self.pages = 0
+
+    @property
+    def driver(self):
+        return self.entry["driver"]
+
+    @property
+    def account(self):
+        return self.entry["account"]
+
+    @property
+    def logged_in(self):
+        """True если в этом браузере уже выполнен вход в учетную запись задания"""
+        return self.entry["logged_in"]
+
+    def mark_logged_in(self):
+        self.entry["logged_in"] = True
+
+
+class BrowserPool:
+    def __init__(self, size=2, factory=None, lean=False, max_pages=500, max_memory_growth=512 * 1024 * 1024,
+                 lease_timeout=300):
+        """
+        Пул запущенных браузеров, общий для заданий веб-интерфейса.
+        Браузер после задания остается открытым вместе с cookies входа и выдается следующему заданию
+        той же учетной записи, поэтому холодный запуск и вход не повторяются.
+
+        :param size: Максимальное количество браузеров
+        :param factory: Функция без аргументов, запускающая браузер (по умолчанию create_pool_driver)
+        :param lean: Облегченный профиль для браузеров фабрики по умолчанию
+        :param max_pages: Браузер перезапускается после стольких страниц (0 - без ограничения)
+        :param max_memory_growth: Браузер перезапускается, если его память выросла больше чем на столько байт
+        :param lease_timeout: Сколько секунд задание ждет свободный браузер
+        """
+        self.size = max(1, size)
+        self.factory = factory or (lambda: create_pool_driver(lean))
+        self.max_pages = max_pages
+        self.max_memory_growth = max_memory_growth
+        self.lease_timeout = lease_timeout
+        self._condition = threading.Condition()
+        self._idle = []
+        self._leased = 0
+        self._starting = 0
+        self._waiting = 0
+        self._warm_target = 0
+        self._warm_account = None
+        self._warm_session_store = None
+        self.stats = {"created": 0, "recycled": 0, "leases": 0, "warm_hits": 0, "failures": 0}
+
+    def _total(self):
+        return len(self._idle) + self._leased + self._starting
+
+    def _create_entry(self):
+        driver = self.factory()
+        entry = {
+            "driver": driver,
+            "account": None,
+            "logged_in": False,
+            "pages": 0,
+            "leases": 0,
+            "created_at": time.time(),
+            "baseline_memory": browser_memory(driver)
+        }
+        with self._condition:
+            self.stats["created"] += 1
+        return entry
+
+    def _quit(self, entry, reason):
+        logging.info(f"Recycling pooled browser ({reason}) after {entry['leases']} leases and {entry['pages']} pages")
+        with self._condition:
+            self.stats["recycled"] += 1
+        try:
+            entry["driver"].quit()
+        except Exception as e:
+            logging.debug(f"Error quitting pooled browser: {e}")
+
+    def _healthy(self, driver):
+        try:
+            return bool(driver.window_handles) and driver.execute_script("return 1") == 1
+        except Exception as e:
+            logging.warning(f"Pooled browser failed health check: {e}")
+            return False
+
+    def _reset(self, driver):
+        """
+        Возвращает браузер к одной пустой вкладке, сохраняя cookies входа
+        """
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+
+        # Счетчик команд задания (page_extractor.attach_command_counter) не переносится в следующее задание
+        counter = getattr(driver, "_command_counter", None)
+        if counter is not None:
+            counter.detach()
+            del driver._command_counter
+
+        driver.get("about:blank")
+        driver.implicitly_wait(0)
+        driver.set_script_timeout(30)
+
+    def _recycle_reason(self, entry):
+        if self.max_pages and entry["pages"] >= self.max_pages:
+            return f"{entry['pages']} pages"
+        if self.max_memory_growth and entry["baseline_memory"]:
+            memory = browser_memory(entry["driver"])
+            if memory and memory - entry["baseline_memory"] > self.max_memory_growth:
+                return f"memory grew by {(memory - entry['baseline_memory']) // (1024 * 1024)} MB"
+        return None
+
+    def acquire(self, account=None, timeout=None):
+        """
+        Выдает браузер заданию: сначала уже вошедший в учетную запись, затем новый,
+        иначе перезапускает свободный браузер другой учетной записи
+
+        :param account: Учетная запись задания (email)
+        :param timeout: Сколько секунд ждать свободный браузер (по умолчанию lease_timeout)
+        :return: Экземпляр BrowserLease или None, если браузер не удалось получить
+        """
+        timeout = self.lease_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        stale = None
+        with self._condition:
+            self._waiting += 1
+            try:
+                while True:
+                    entry = next((e for e in self._idle if e["account"] == account and (e["leases"] or e["logged_in"])), None) \
+                        or next((e for e in self._idle if not e["leases"] and not e["logged_in"]), None)
+                    if entry is None and self._idle and self._total() >= self.size:
+                        # Cookies другой учетной записи не должны попасть в задание: браузер перезапускается
+                        stale = self._idle[0]
+                    if entry is not None or stale is not None or self._total() < self.size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        logging.error(f"No pooled browser became free within {timeout}s")
+                        return None
+                    self._condition.wait(remaining)
+
+                if entry is not None:
+                    self._idle.remove(entry)
+                    self._leased += 1
+                else:
+                    if stale is not None:
+                        self._idle.remove(stale)
+                    self._starting += 1
+            finally:
+                self._waiting -= 1
+
+        if entry is not None and not self._healthy(entry["driver"]):
+            self._quit(entry, "failed health check")
+            with self._condition:
+                self._leased -= 1
+                self._starting += 1
+            entry = None
+
+        if entry is None:
+            if stale is not None:
+                self._quit(stale, "different account")
+            try:
+                entry = self._create_entry()
+            except Exception as e:
+                logging.error(f"Could not start pooled browser: {e}")
+                with self._condition:
+                    self._starting -= 1
+                    self.stats["failures"] += 1
+                    self._condition.notify()
+                return None
+            with self._condition:
+                self._starting -= 1
+                self._leased += 1
+        else:
+            with self._condition:
+                self.stats["warm_hits"] += 1
+
+        if entry["account"] != account:
+            entry["account"] = account
+            entry["logged_in"] = False
+        entry["leases"] += 1
+        with self._condition:
+            self.stats["leases"] += 1
+        return BrowserLease(self, entry)
+
+    def release(self, lease, pages=None, discard=False):
+        """
+        Возвращает браузер в пул или перезапускает его
+
+        :param lease: Экземпляр BrowserLease
+        :param pages: Сколько страниц обработало задание (по умолчанию lease.pages)
+        :param discard: Закрыть браузер, не возвращая его в пул
+        """
+        entry = lease.entry
+        entry["pages"] += lease.pages if pages is None else pages
+
+        reason = "discarded" if discard else self._recycle_reason(entry)
+        if reason is None:
+            try:
+                self._reset(entry["driver"])
+            except Exception as e:
+                reason = f"reset failed: {e}"
+
+        with self._condition:
+            self._leased -= 1
+            if reason is None:
+                self._idle.append(entry)
+            self._condition.notify()
+
+        if reason is not None:
+            self._quit(entry, reason)
+            # Замена перезапущенного браузера запускается заранее, до следующего задания
+            if self._warm_target:
+                self.warm(self._warm_target, self._warm_account, self._warm_session_store)
+
+    @contextmanager
+    def lease(self, account=None, timeout=None):
+        """
+        Контекстный менеджер для acquire/release
+
+        :param account: Учетная запись задания (email)
+        :param timeout: Сколько секунд ждать свободный браузер
+        :return: Экземпляр BrowserLease или None
+        """
+        lease = self.acquire(account, timeout)
+        try:
+            yield lease
+        finally:
+            if lease is not None:
+                self.release(lease)
+
+    def _restore_login(self, entry, account, session_store):
+        """
+        Восстанавливает в браузере сохраненную сессию учетной записи, чтобы задание не выполняло вход
+        """
+        if session_store is None:
+            # Импорт внутри метода: хранилище сессий нужно только при прогреве с учетной записью
+            from session_store import get_default_store
+            session_store = get_default_store()
+        try:
+            restored = session_store and session_store.restore_driver(entry["driver"], account)
+        except Exception as e:
+            logging.warning(f"Could not restore the stored session in a pooled browser: {e}")
+            restored = False
+        if restored:
+            entry["account"] = account
+            entry["logged_in"] = True
+            logging.info(f"Pooled browser warmed up with the stored session of {account}")
+        else:
+            logging.info(f"No valid stored session for {account}, pooled browser warmed up without login")
+
+    def warm(self, count=None, account=None, session_store=None):
+        """
+        Запускает браузеры в фоне, чтобы первые задания не ждали холодного старта.
+        Если указана учетная запись, в браузерах восстанавливается ее сохраненная сессия
+        и задания этой учетной записи не выполняют вход; без сохраненной сессии прогрев
+        убирает только время запуска браузера.
+
+        :param count: Сколько браузеров держать готовыми (по умолчанию размер пула)
+        :param account: Учетная запись (email), сессия которой восстанавливается в браузерах
+        :param session_store: Хранилище сессий (None - общее хранилище)
+        """
+        count = min(self.size, self.size if count is None else count)
+        self._warm_target = count
+        self._warm_account = account
+        self._warm_session_store = session_store
+
+        def start_one():
+            try:
+                entry = self._create_entry()
+            except Exception as e:
+                logging.error(f"Could not warm up pooled browser: {e}")
+                with self._condition:
+                    self._starting -= 1
+                    self.stats["failures"] += 1
+                    self._condition.notify()
+                return
+            if account:
+                self._restore_login(entry, account, session_store)
+            with self._condition:
+                self._starting -= 1
+                self._idle.append(entry)
+                self._condition.notify()
+
+        with self._condition:
+            missing = max(0, min(count - len(self._idle) - self._starting, self.size - self._total()))
+            self._starting += missing
+        for _ in range(missing):
+            threading.Thread(target=start_one, daemon=True).start()
+        if missing:
+            logging.info(f"Warming up {missing} pooled browsers")
+
+    def snapshot(self):
+        """
+        :return: Словарь с занятостью пула (всего, свободно, выдано, запускается, ожидают) и счетчиками
+        """
+        with self._condition:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "leased": self._leased,
+                "starting": self._starting,
+                "waiting": self._waiting,
+                **self.stats
+            }
+
+    def shutdown(self):
+        """
+        Закрывает все свободные браузеры
+        """
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for entry in idle:
+            self._quit(entry, "shutdown")
@@ -0,0 +1,165 @@
+import os
+import logging
+
+
+# Размер окна для чтения текста: одна колонка страницы без лишней площади отрисовки
+LEAN_WINDOW_SIZE = (800, 900)
+
+# Сторонние хосты аналитики, рекламы, маяков и шрифтов, которые не нужны для текста книги
+BLOCKED_HOSTS = [
+    "fls-na.amazon.com",
+    "fls-eu.amazon.com",
+    "unagi.amazon.com",
+    "unagi-na.amazon.com",
+    "amazon-adsystem.com",
+    "aax.amazon-adsystem.com",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "scorecardresearch.com",
+    "facebook.net",
+    "fonts.googleapis.com",
+    "fonts.gstatic.com"
+]
+
+# PAC скрипт: запросы к заблокированным хостам уходят на закрытый порт и сразу завершаются ошибкой
+PAC_TEMPLATE = """function FindProxyForURL(url, host) {
+    var blocked = %s;
+    for (var i = 0; i < blocked.length; i++) {
+        if (host === blocked[i] || dnsDomainIs(host, '.' + blocked[i])) {
+            return 'PROXY 127.0.0.1:9';
+        }
+    }
+    return 'DIRECT';
+}"""
+
+
+def pac_url(blocked_hosts=None):
+    """
+    :param blocked_hosts: Хосты для блокировки (по умолчанию BLOCKED_HOSTS)
+    :return: data: URL с PAC скриптом для Firefox
+    """
+    hosts = ", ".join(f"'{host}'" for host in blocked_hosts or BLOCKED_HOSTS)
+    return "data:text/javascript," + (PAC_TEMPLATE % f"[{hosts}]").replace("\n", " ")
+
+
+def lean_firefox_options(options, headless=True, images=False, fonts=False, blocked_hosts=None):
+    """
+    Настраивает облегченный профиль Firefox: без окна, анимаций, сторонних хостов
+    и, по желанию, без изображений и загружаемых шрифтов
+
+    :param options: Экземпляр FirefoxOptions
+    :param headless: Запуск без окна
+    :param images: Загружать изображения
+    :param fonts: Загружать веб-шрифты (нужны для скриншотов страниц)
+    :param blocked_hosts: Хосты для блокировки (по умолчанию BLOCKED_HOSTS)
+    :return: Тот же экземпляр options
+    """
+    if headless:
+        options.add_argument("--headless")
+    options.add_argument(f"--width={LEAN_WINDOW_SIZE[0]}")
+    options.add_argument(f"--height={LEAN_WINDOW_SIZE[1]}")
+
+    # Блокировка сторонних хостов через PAC
+    options.set_preference("network.proxy.type", 2)
+    options.set_preference("network.proxy.autoconfig_url", pac_url(blocked_hosts))
+
+    if not images:
+        options.set_preference("permissions.default.image", 2)
+    if not fonts:
+        options.set_preference("gfx.downloadable_fonts.enabled", False)
+
+    # Без анимаций интерфейса и страниц (prefers-reduced-motion), перелистывание отрисовывается сразу
+    options.set_preference("ui.prefersReducedMotion", 1)
+    options.set_preference("toolkit.cosmeticAnimations.enabled", False)
+    options.set_preference("image.animation_mode", "none")
+    options.set_preference("layout.css.scroll-behavior.enabled", False)
+
+    # Меньше процессов и кэшей на браузер
+    options.set_preference("dom.ipc.processCount", 1)
+    options.set_preference("browser.sessionhistory.max_total_viewers", 0)
+    options.set_preference("media.autoplay.default", 5)
+    options.set_preference("browser.tabs.remote.warmup.enabled", False)
+    options.set_preference("app.update.enabled", False)
+    options.set_preference("datareporting.healthreport.uploadEnabled", False)
+    options.set_preference("toolkit.telemetry.enabled", False)
+
+    logging.info(f"Using lean Firefox profile (headless={headless}, images={images}, fonts={fonts})")
+    return options
+
+
+def lean_chrome_options(options, headless=True, images=False, blocked_hosts=None):
+    """
+    Настраивает облегченный профиль Chrome (аналог lean_firefox_options)
+
+    :param options: Экземпляр ChromeOptions
+    :param headless: Запуск без окна
+    :param images: Загружать изображения
+    :param blocked_hosts: Хосты для блокировки (по умолчанию BLOCKED_HOSTS)
+    :return: Тот же экземпляр options
+    """
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument(f"--window-size={LEAN_WINDOW_SIZE[0]},{LEAN_WINDOW_SIZE[1]}")
+
+    rules = ", ".join(f"MAP {host} ~NOTFOUND, MAP *.{host} ~NOTFOUND" for host in blocked_hosts or BLOCKED_HOSTS)
+    options.add_argument(f"--host-resolver-rules={rules}")
+
+    if not images:
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+
+    options.add_argument("--force-prefers-reduced-motion")
+    options.add_argument("--disable-smooth-scrolling")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--disable-background-networking")
+    options.add_argument("--disable-component-update")
+    options.add_argument("--disable-default-apps")
+    options.add_argument("--disable-sync")
+    options.add_argument("--mute-audio")
+    options.add_argument("--renderer-process-limit=1")
+
+    logging.info(f"Using lean Chrome profile (headless={headless}, images={images})")
+    return options
+
+
+def browser_memory(driver):
+    """
+    Возвращает память процессов браузера (основной процесс и все дочерние, только Linux)
+
+    :param driver: Экземпляр веб-драйвера Firefox
+    :return: Суммарный RSS в байтах или None, если его не удалось определить
+    """
+    pid = driver.capabilities.get("moz:processID")
+    if not pid:
+        return None
+
+    try:
+        children = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat", 'r') as f:
+                    # Имя процесса в скобках может содержать пробелы, поля после него разделены пробелами
+                    parent = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(parent, []).append(int(entry))
+
+        total = 0
+        pending = [pid]
+        while pending:
+            current = pending.pop()
+            pending.extend(children.get(current, []))
+            try:
+                with open(f"/proc/{current}/status", 'r') as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            total += int(line.split()[1]) * 1024
+                            break
+            except OSError:
+                continue
+        return total
+    except OSError:
+        return None
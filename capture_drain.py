@@ -0,0 +1,124 @@
+import time
+import logging
+
+
+DRAIN_SCRIPT = "return window.drainCaptured ? window.drainCaptured(arguments[0]) : null;"
+
+# Перехватчик без drainCaptured (страница открыта до обновления расширения): буферы читаются целиком
+LEGACY_READ_SCRIPT = """
+var result = {
+    requests: window.getCapturedRequests ? window.getCapturedRequests() : [],
+    images: window.getCapturedImages ? window.getCapturedImages() : [],
+    bytes: 0, pending: 0, pendingBytes: 0
+};
+window.capturedRequests = [];
+window.capturedImages = [];
+return result;
+"""
+
+# Размер одного ответа execute_script
+CHUNK_BYTES = 4 * 1024 * 1024
+# Сколько порций забирается за один плановый сбор, чтобы не задерживать перелистывание
+CHUNKS_PER_DRAIN = 4
+# Если в странице осталось больше, перелистывание ждет, пока буферы не будут разобраны
+HIGH_WATER_BYTES = 32 * 1024 * 1024
+
+
+class CaptureDrain:
+    def __init__(self, driver, every=5, chunk_bytes=CHUNK_BYTES, high_water=HIGH_WATER_BYTES):
+        """
+        Потоковый сбор ответов из буферов JS перехватчика (extensions/kindle_capture/hook.js):
+        каждые every страниц забирает ответы порциями не больше chunk_bytes и освобождает их в странице,
+        поэтому память вкладки и размер одного ответа WebDriver не растут с длиной книги.
+
+        :param driver: Экземпляр веб-драйвера
+        :param every: Забирать ответы каждые столько страниц
+        :param chunk_bytes: Максимальный размер одной порции
+        :param high_water: Объем неразобранных ответов в странице, при котором перелистывание ждет сбора
+        """
+        self.driver = driver
+        self.every = max(1, every)
+        self.chunk_bytes = chunk_bytes
+        self.high_water = high_water
+        self.stats = {
+            "drains": 0,
+            "chunks": 0,
+            "items": 0,
+            "bytes": 0,
+            "max_chunk_bytes": 0,
+            "max_pending_bytes": 0,
+            "stalls": 0,
+            "stall_seconds": 0.0
+        }
+
+    def chunk(self):
+        """
+        Забирает одну порцию ответов из текущей вкладки
+
+        :return: Кортеж (запросы, изображения, объем оставшихся в странице ответов)
+        """
+        result = self.driver.execute_script(DRAIN_SCRIPT, self.chunk_bytes)
+        if result is None:
+            result = self.driver.execute_script(LEGACY_READ_SCRIPT)
+        requests = result.get("requests") or []
+        images = result.get("images") or []
+        pending_bytes = result.get("pendingBytes", 0)
+
+        self.stats["chunks"] += 1
+        self.stats["items"] += len(requests) + len(images)
+        self.stats["bytes"] += result.get("bytes", 0)
+        self.stats["max_chunk_bytes"] = max(self.stats["max_chunk_bytes"], result.get("bytes", 0))
+        self.stats["max_pending_bytes"] = max(self.stats["max_pending_bytes"], pending_bytes)
+        return requests, images, pending_bytes
+
+    def take(self, max_chunks=None):
+        """
+        Забирает ответы порциями, пока буферы страницы не опустеют или не будет получено max_chunks порций
+
+        :param max_chunks: Ограничение количества порций (None - до опустошения буферов)
+        :return: Кортеж (запросы, изображения, объем оставшихся в странице ответов)
+        """
+        self.stats["drains"] += 1
+        requests, images = [], []
+        chunks = 0
+        while True:
+            chunk_requests, chunk_images, pending_bytes = self.chunk()
+            requests.extend(chunk_requests)
+            images.extend(chunk_images)
+            chunks += 1
+            if not pending_bytes or not (chunk_requests or chunk_images):
+                break
+            if max_chunks and chunks >= max_chunks:
+                break
+        return requests, images, pending_bytes
+
+    def after_page(self, page):
+        """
+        Плановый сбор после страницы: раз в every страниц забирает до CHUNKS_PER_DRAIN порций.
+        Если в странице осталось больше high_water, забирает все, прежде чем вернуть управление.
+
+        :param page: Номер обработанной страницы
+        :return: Кортеж (запросы, изображения)
+        """
+        if page % self.every:
+            return [], []
+
+        requests, images, pending_bytes = self.take(CHUNKS_PER_DRAIN)
+        if pending_bytes > self.high_water:
+            # Ответы приходят быстрее, чем забираются: перелистывание ждет сбора
+            start_time = time.monotonic()
+            more_requests, more_images, _ = self.take()
+            requests.extend(more_requests)
+            images.extend(more_images)
+            self.stats["stalls"] += 1
+            self.stats["stall_seconds"] += time.monotonic() - start_time
+            logging.info(f"Capture drain stalled page turns on page {page}: {pending_bytes} bytes were pending")
+        return requests, images
+
+    def summary(self):
+        """
+        :return: Словарь метрик сбора
+        """
+        stats = dict(self.stats)
+        stats["stall_seconds"] = round(stats["stall_seconds"], 3)
+        return stats
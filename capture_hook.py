@@ -0,0 +1,79 @@
+import os
+import logging
+
+from cdp_capture import is_chromium
+
+
+# Расширение с перехватчиком: hook.js выполняется в начале каждого документа amazon.com
+EXTENSION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "extensions", "kindle_capture")
+HOOK_FILE = os.path.join(EXTENSION_DIR, "hook.js")
+
+HOOK_STATE_SCRIPT = "return window.__kindleCaptureHook || null;"
+
+_hook_source = None
+
+
+def hook_source():
+    """
+    :return: Текст скрипта перехвата (extensions/kindle_capture/hook.js)
+    """
+    global _hook_source
+    if _hook_source is None:
+        with open(HOOK_FILE, 'r', encoding='utf-8') as f:
+            _hook_source = f.read()
+    return _hook_source
+
+
+def install_capture_hook(driver):
+    """
+    Регистрирует скрипт перехвата на старте каждого нового документа:
+    в Chrome через CDP Page.addScriptToEvaluateOnNewDocument (для текущей вкладки),
+    в Firefox через временное расширение (для всех вкладок). Повторный вызов ничего не делает.
+
+    :param driver: Экземпляр веб-драйвера
+    :return: Способ регистрации ("cdp" или "extension") или None, если зарегистрировать не удалось
+    """
+    if is_chromium(driver):
+        handles = getattr(driver, "_capture_hook_handles", None)
+        if handles is None:
+            handles = driver._capture_hook_handles = set()
+        handle = driver.current_window_handle
+        if handle in handles:
+            return "cdp"
+        try:
+            driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": hook_source()})
+        except Exception as e:
+            logging.warning(f"Could not register the capture hook via CDP: {e}")
+            return None
+        handles.add(handle)
+        logging.info("Capture hook registered via CDP for new documents")
+        return "cdp"
+
+    if getattr(driver, "_capture_hook", None):
+        return driver._capture_hook
+    if not hasattr(driver, "install_addon"):
+        return None
+    try:
+        driver.install_addon(EXTENSION_DIR, temporary=True)
+    except Exception as e:
+        logging.warning(f"Could not install the capture hook extension: {e}")
+        return None
+    driver._capture_hook = "extension"
+    logging.info("Capture hook extension installed")
+    return "extension"
+
+
+def ensure_capture_hook(driver):
+    """
+    Гарантирует работу перехватчика на текущей странице: регистрирует его для следующих документов
+    и, если текущий документ загружен до регистрации, выполняет скрипт на нем
+
+    :param driver: Экземпляр веб-драйвера
+    :return: Состояние перехватчика на странице ({version, documentStart, restored}) или None
+    """
+    install_capture_hook(driver)
+    state = driver.execute_script(HOOK_STATE_SCRIPT)
+    if not state:
+        driver.execute_script(hook_source())
+        state = driver.execute_script(HOOK_STATE_SCRIPT)
+    return state
@@ -0,0 +1,164 @@
+import re
+import json
+import base64
+import logging
+
+
+# Ответы, которые нужны для извлечения книги: API читалки и blob-данные (совпадает с JS перехватчиком)
+DEFAULT_CAPTURE_FILTERS = [
+    r"amazon\.com.*/(api|service)/",
+    r"^blob:"
+]
+
+# Размеры буферов Chrome для тел ответов: тело, вытесненное из буфера, уже не получить
+MAX_TOTAL_BUFFER_SIZE = 200 * 1024 * 1024
+MAX_RESOURCE_BUFFER_SIZE = 50 * 1024 * 1024
+
+CHROMIUM_BROWSERS = ("chrome", "chromium", "msedge", "microsoftedge")
+
+
+def is_chromium(driver):
+    """
+    :param driver: Экземпляр веб-драйвера
+    :return: True если драйвер управляет браузером на Chromium и поддерживает команды CDP
+    """
+    browser = (driver.capabilities.get("browserName") or "").lower()
+    return browser in CHROMIUM_BROWSERS and hasattr(driver, "execute_cdp_cmd")
+
+
+def enable_performance_log(options):
+    """
+    Включает журнал производительности chromedriver, через который приходят события CDP Network
+
+    :param options: Экземпляр ChromeOptions
+    :return: Тот же экземпляр options
+    """
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return options
+
+
+class CDPNetworkCapture:
+    def __init__(self, driver, filters=None):
+        """
+        Перехват ответов на уровне протокола DevTools (Network.responseReceived + Network.getResponseBody).
+        В отличие от подмены window.fetch видит XHR, запросы до загрузки страницы и ответы,
+        которые страница уже прочитала. События накапливаются в журнале chromedriver и забираются drain().
+
+        :param driver: Экземпляр веб-драйвера Chrome с включенным журналом производительности
+        :param filters: Регулярные выражения URL для сохранения (по умолчанию DEFAULT_CAPTURE_FILTERS)
+        """
+        self.driver = driver
+        self.filters = [re.compile(pattern) for pattern in (filters or DEFAULT_CAPTURE_FILTERS)]
+        self.captured_requests = []
+        self.captured_images = []
+        # requestId -> ответ, тело которого еще загружается
+        self._pending = {}
+        self.stats = {"events": 0, "matched": 0, "bodies": 0, "body_errors": 0, "failed": 0, "bytes": 0, "drains": 0}
+
+    def matches(self, url):
+        return any(pattern.search(url) for pattern in self.filters)
+
+    def start(self):
+        """
+        Включает домен Network в текущей вкладке. Вызывается для каждой новой вкладки и после перезагрузки.
+
+        :return: True если домен включен
+        """
+        try:
+            self.driver.execute_cdp_cmd("Network.enable", {
+                "maxTotalBufferSize": MAX_TOTAL_BUFFER_SIZE,
+                "maxResourceBufferSize": MAX_RESOURCE_BUFFER_SIZE
+            })
+            logging.info("CDP network capture enabled")
+            return True
+        except Exception as e:
+            logging.error(f"Could not enable CDP network capture: {e}")
+            return False
+
+    def drain(self):
+        """
+        Забирает накопленные события из журнала chromedriver и загружает тела завершенных ответов
+
+        :return: Количество новых сохраненных ответов
+        """
+        try:
+            entries = self.driver.get_log("performance")
+        except Exception as e:
+            logging.warning(f"Could not read the performance log: {e}")
+            return 0
+
+        self.stats["drains"] += 1
+        captured = 0
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, TypeError, ValueError):
+                continue
+            method = message.get("method", "")
+            if not method.startswith("Network."):
+                continue
+            self.stats["events"] += 1
+            params = message.get("params", {})
+
+            if method == "Network.responseReceived":
+                response = params.get("response", {})
+                if self.matches(response.get("url", "")):
+                    self.stats["matched"] += 1
+                    self._pending[params["requestId"]] = response
+            elif method == "Network.loadingFinished":
+                response = self._pending.pop(params.get("requestId"), None)
+                if response is not None and self._store_body(params["requestId"], response):
+                    captured += 1
+            elif method == "Network.loadingFailed":
+                if self._pending.pop(params.get("requestId"), None) is not None:
+                    self.stats["failed"] += 1
+
+        if captured:
+            logging.info(f"CDP capture stored {captured} responses ({len(self._pending)} still loading)")
+        return captured
+
+    def _store_body(self, request_id, response):
+        url = response.get("url", "")
+        mime_type = response.get("mimeType") or ""
+        try:
+            result = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+        except Exception as e:
+            logging.debug(f"Response body for {url} is not available: {e}")
+            self.stats["body_errors"] += 1
+            return False
+
+        body = result.get("body", "")
+        encoded = result.get("base64Encoded", False)
+        self.stats["bodies"] += 1
+        self.stats["bytes"] += len(body)
+
+        # Формат записей совпадает с window.getCapturedRequests()/getCapturedImages() JS перехватчика
+        if mime_type.startswith("image/") or url.startswith("blob:"):
+            data = body if encoded else base64.b64encode(body.encode("utf-8")).decode("ascii")
+            self.captured_images.append({
+                "url": url,
+                "type": mime_type or "blob",
+                "data": f"data:{mime_type or 'application/octet-stream'};base64,{data}"
+            })
+            return True
+
+        text = base64.b64decode(body).decode("utf-8", errors="replace") if encoded else body
+        if "json" in mime_type:
+            try:
+                self.captured_requests.append({"url": url, "type": "json", "data": json.loads(text)})
+                return True
+            except ValueError:
+                pass
+        self.captured_requests.append({"url": url, "type": mime_type or "text", "data": text})
+        return True
+
+    def take(self):
+        """
+        Забирает оставшиеся события и возвращает все сохраненные ответы, очищая буферы
+
+        :return: Кортеж (список запросов, список изображений)
+        """
+        self.drain()
+        requests, self.captured_requests = self.captured_requests, []
+        images, self.captured_images = self.captured_images, []
+        return requests, images
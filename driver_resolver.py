@@ -0,0 +1,272 @@
+import os
+import re
+import json
+import time
+import shutil
+import subprocess
+import hashlib
+import logging
+import threading
+from collections import deque
+
+
+DEFAULT_DRIVER_DIR = os.path.join(os.environ.get("KINDLE_CACHE_DIR", ".kindle_cache"), "drivers")
+
+# Переменная окружения, разрешающая загрузку драйвера через webdriver_manager
+ALLOW_DOWNLOAD_ENV = "KINDLE_ALLOW_DRIVER_DOWNLOAD"
+
+DRIVER_NAMES = ("geckodriver", "chromedriver")
+
+VERSION_PATTERN = re.compile(r"\d+(?:\.\d+)+")
+
+
+class DriverResolutionError(Exception):
+    """Драйвер не найден в закрепленном кэше, а загрузка не разрешена"""
+
+
+def file_sha256(path):
+    """
+    :param path: Путь к файлу
+    :return: SHA-256 файла в шестнадцатеричном виде
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def driver_version(path):
+    """
+    Определяет версию драйвера по пути webdriver_manager или по выводу "<драйвер> --version".
+    webdriver_manager хранит драйверы в директориях вида .../geckodriver/linux64/v0.36.0/geckodriver
+    и .../chromedriver/linux64/131.0.6778.85/chromedriver-linux64/chromedriver
+
+    :param path: Путь к исполняемому файлу драйвера
+    :return: Версия или None
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    while directory and directory != os.path.dirname(directory):
+        component = os.path.basename(directory).lstrip("v")
+        if VERSION_PATTERN.fullmatch(component):
+            return component
+        directory = os.path.dirname(directory)
+
+    try:
+        output = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        logging.warning(f"Could not determine the version of {path}: {e}")
+        return None
+    match = VERSION_PATTERN.search(output)
+    return match.group(0) if match else None
+
+
+class DriverResolver:
+    def __init__(self, driver_dir=DEFAULT_DRIVER_DIR, allow_download=None):
+        """
+        Поиск исполняемого файла веб-драйвера в локальном кэше с закрепленными версиями и контрольными суммами.
+        Манифест кэша (manifest.json) хранит для каждого драйвера версию, файл и SHA-256.
+        Сеть не используется, пока загрузка не разрешена явно.
+
+        :param driver_dir: Директория кэша драйверов
+        :param allow_download: Разрешить загрузку через webdriver_manager, если драйвера нет в кэше
+                               (None - по переменной окружения KINDLE_ALLOW_DRIVER_DOWNLOAD)
+        """
+        self.driver_dir = driver_dir
+        self.manifest_file = os.path.join(driver_dir, "manifest.json")
+        if allow_download is None:
+            allow_download = os.environ.get(ALLOW_DOWNLOAD_ENV, "").lower() in ("1", "true", "yes")
+        self.allow_download = allow_download
+        # Последние результаты поиска для телеметрии (resolve вызывается при каждом запуске браузера)
+        self.resolutions = deque(maxlen=50)
+        self._lock = threading.Lock()
+        # Проверенные файлы: (путь, размер, время изменения) -> SHA-256, чтобы не пересчитывать хэш при каждом запуске
+        self._verified = {}
+
+    def _load_manifest(self):
+        try:
+            if os.path.exists(self.manifest_file):
+                with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Driver manifest {self.manifest_file} is unreadable: {e}")
+        return {}
+
+    def _save_manifest(self, manifest):
+        if not os.path.exists(self.driver_dir):
+            os.makedirs(self.driver_dir)
+        tmp_file = f"{self.manifest_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_file, self.manifest_file)
+
+    def _verify(self, path, expected_sha256):
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime)
+        sha256 = self._verified.get(key)
+        if sha256 is None:
+            sha256 = file_sha256(path)
+            self._verified[key] = sha256
+        return sha256 == expected_sha256
+
+    def _record(self, name, source, start_time):
+        elapsed = time.monotonic() - start_time
+        resolution = {"driver": name, "source": source, "seconds": round(elapsed, 3)}
+        with self._lock:
+            self.resolutions.append(resolution)
+        logging.info(f"Resolved {name} from {source} in {elapsed:.3f}s")
+        return resolution
+
+    def cached_path(self, name):
+        """
+        Возвращает путь к закрепленному драйверу, если файл есть и его контрольная сумма совпадает
+
+        :param name: Имя драйвера (geckodriver или chromedriver)
+        :return: Путь к файлу или None
+        """
+        entry = self._load_manifest().get(name)
+        if not entry:
+            return None
+
+        path = os.path.join(self.driver_dir, entry["file"])
+        if not os.path.isfile(path):
+            logging.warning(f"Pinned {name} {entry.get('version')} is missing: {path}")
+            return None
+        if not self._verify(path, entry["sha256"]):
+            logging.error(f"Checksum mismatch for pinned {name} {entry.get('version')}: {path}, refusing to use it")
+            return None
+        return path
+
+    def pin(self, name, source_path, version=None):
+        """
+        Копирует исполняемый файл драйвера в кэш и закрепляет его контрольную сумму
+
+        :param name: Имя драйвера (geckodriver или chromedriver)
+        :param source_path: Путь к исполняемому файлу драйвера
+        :param version: Версия драйвера (для имени директории и манифеста)
+        :return: Путь к файлу в кэше
+        """
+        version = version or "local"
+        target_dir = os.path.join(self.driver_dir, f"{name}-{version}")
+        if not os.path.exists(target_dir):
+            os.makedirs(target_dir)
+        target = os.path.join(target_dir, os.path.basename(source_path))
+        if os.path.abspath(source_path) != os.path.abspath(target):
+            shutil.copy2(source_path, target)
+        os.chmod(target, 0o755)
+
+        sha256 = file_sha256(target)
+        with self._lock:
+            manifest = self._load_manifest()
+            manifest[name] = {
+                "version": version,
+                "file": os.path.relpath(target, self.driver_dir),
+                "sha256": sha256,
+                "pinned_at": time.time()
+            }
+            self._save_manifest(manifest)
+        logging.info(f"Pinned {name} {version} ({sha256[:12]}) at {target}")
+        return target
+
+    def download(self, name):
+        """
+        Загружает драйвер через webdriver_manager и закрепляет его в кэше
+
+        :param name: Имя драйвера (geckodriver или chromedriver)
+        :return: Путь к файлу в кэше
+        """
+        # Импорт внутри функции: на изолированных машинах webdriver_manager не используется
+        if name == "geckodriver":
+            from webdriver_manager.firefox import GeckoDriverManager
+            manager = GeckoDriverManager()
+        elif name == "chromedriver":
+            from webdriver_manager.chrome import ChromeDriverManager
+            manager = ChromeDriverManager()
+        else:
+            raise DriverResolutionError(f"Unknown driver {name}")
+
+        path = manager.install()
+        return self.pin(name, path, driver_version(path))
+
+    def resolve(self, name):
+        """
+        Возвращает путь к драйверу: из закрепленного кэша, иначе загрузкой, если она разрешена
+
+        :param name: Имя драйвера (geckodriver или chromedriver)
+        :return: Путь к исполняемому файлу
+        :raises DriverResolutionError: Драйвера нет в кэше, а загрузка не разрешена
+        """
+        start_time = time.monotonic()
+        path = self.cached_path(name)
+        if path:
+            self._record(name, "cache", start_time)
+            return path
+
+        if not self.allow_download:
+            raise DriverResolutionError(
+                f"{name} is not pinned in {self.driver_dir}. Pin a local binary with "
+                f"'python driver_resolver.py pin {name} /path/to/{name}' or allow downloading with {ALLOW_DOWNLOAD_ENV}=1"
+            )
+
+        path = self.download(name)
+        self._record(name, "download", start_time)
+        return path
+
+
+_default_resolver = None
+_default_lock = threading.Lock()
+
+
+def get_default_resolver():
+    """
+    Возвращает общий для процесса поиск драйверов
+
+    :return: Экземпляр DriverResolver
+    """
+    global _default_resolver
+    with _default_lock:
+        if _default_resolver is None:
+            _default_resolver = DriverResolver()
+        return _default_resolver
+
+
+def resolve_driver(name):
+    """
+    Возвращает путь к драйверу через общий DriverResolver
+
+    :param name: Имя драйвера (geckodriver или chromedriver)
+    :return: Путь к исполняемому файлу
+    """
+    return get_default_resolver().resolve(name)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Manage the pinned webdriver cache')
+    parser.add_argument('--dir', default=DEFAULT_DRIVER_DIR, help='Driver cache directory')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    pin_parser = subparsers.add_parser('pin', help='Copy a local driver binary into the cache and pin its checksum')
+    pin_parser.add_argument('name', choices=DRIVER_NAMES)
+    pin_parser.add_argument('path', help='Path to the driver binary')
+    pin_parser.add_argument('--version', help='Driver version')
+
+    download_parser = subparsers.add_parser('download', help='Download a driver with webdriver_manager and pin it')
+    download_parser.add_argument('name', choices=DRIVER_NAMES)
+
+    subparsers.add_parser('verify', help='Verify checksums of pinned drivers')
+
+    args = parser.parse_args()
+    resolver = DriverResolver(args.dir, allow_download=args.command == 'download')
+
+    if args.command == 'pin':
+        print(resolver.pin(args.name, args.path, args.version))
+    elif args.command == 'download':
+        print(resolver.download(args.name))
+    else:
+        for driver_name in DRIVER_NAMES:
+            path = resolver.cached_path(driver_name)
+            print(f"{driver_name}: {path or 'not pinned or invalid'}")
@@ -0,0 +1,137 @@
+import hashlib
+import itertools
+import logging
+
+
+# Статусы, после которых страниц дальше нет
+END_STATUS_CODES = (404, 410)
+
+
+# Индикатор позиции читалки ("Location 120 of 4500", "Page 5 of 300")
+READER_LOCATION_SELECTORS = ['#kindleReader_footer_message', '.kr-footer-message', '.footer-label', '[class*="location"]']
+
+# Возвращает текст индикатора позиции читалки или null
+READER_LOCATION_SCRIPT = """
+var selectors = arguments[0];
+for (var i = 0; i < selectors.length; i++) {
+    var element = document.querySelector(selectors[i]);
+    if (element && element.textContent.trim()) {
+        return element.textContent.trim();
+    }
+}
+return null;
+"""
+
+
+def read_reader_location(driver):
+    """
+    Читает позицию читалки Kindle Cloud Reader
+
+    :param driver: Экземпляр веб-драйвера
+    :return: Текст индикатора позиции или None
+    """
+    try:
+        return driver.execute_script(READER_LOCATION_SCRIPT, READER_LOCATION_SELECTORS)
+    except Exception as e:
+        logging.debug(f"Could not read reader location: {e}")
+        return None
+
+
+def page_numbers(start, budget):
+    """
+    Возвращает номера страниц для перебора
+
+    :param start: Номер первой страницы
+    :param budget: Номер последней страницы (None или 0 - без ограничения)
+    :return: range или бесконечный итератор номеров страниц
+    """
+    if not budget:
+        return itertools.count(start)
+    return range(start, budget + 1)
+
+
+class EndOfBookDetector:
+    def __init__(self, repeat_limit=2, empty_limit=2):
+        """
+        Определяет конец книги по признакам того, что читалка перестала продвигаться:
+        повтор содержимого страниц, пустые ответы или 404, неизменная позиция в книге
+
+        :param repeat_limit: Сколько страниц подряд должны совпасть с предыдущей (по содержимому или позиции)
+        :param empty_limit: Сколько пустых страниц подряд считаются концом книги
+        """
+        self.repeat_limit = repeat_limit
+        self.empty_limit = empty_limit
+        self.reset()
+
+    def reset(self):
+        """
+        Сбрасывает накопленное состояние
+        """
+        self.reason = None
+        self.pages_observed = 0
+        self._last_hash = None
+        self._last_location = None
+        self._repeats = 0
+        self._location_repeats = 0
+        self._empties = 0
+        self.repeated = False
+
+    @property
+    def finished(self):
+        return self.reason is not None
+
+    @staticmethod
+    def content_hash(content):
+        # Пробелы не учитываем: перерисовка страницы может менять только форматирование
+        normalized = " ".join(content.split())
+        return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+    def observe(self, content=None, status_code=None, location=None):
+        """
+        Учитывает очередную страницу
+
+        :param content: Текст страницы
+        :param status_code: HTTP статус ответа (для загрузки страниц по HTTP)
+        :param location: Позиция читалки (например, "Location 120 of 4500" или URL)
+        :return: True если достигнут конец книги; атрибут repeated показывает, что страница повторяет предыдущую
+        """
+        if self.finished:
+            return True
+        self.pages_observed += 1
+        self.repeated = False
+
+        if status_code in END_STATUS_CODES:
+            return self._finish(f"status {status_code}")
+
+        if not content or not content.strip():
+            self._empties += 1
+            self._repeats = 0
+            if self._empties >= self.empty_limit:
+                return self._finish(f"{self._empties} empty pages in a row")
+        else:
+            self._empties = 0
+            page_hash = self.content_hash(content)
+            if page_hash == self._last_hash:
+                self.repeated = True
+                self._repeats += 1
+                if self._repeats >= self.repeat_limit:
+                    return self._finish(f"content repeated on {self._repeats} pages in a row")
+            else:
+                self._repeats = 0
+            self._last_hash = page_hash
+
+        if location:
+            if location == self._last_location:
+                self._location_repeats += 1
+                if self._location_repeats >= self.repeat_limit:
+                    return self._finish(f"reader location {location} unchanged")
+            else:
+                self._location_repeats = 0
+            self._last_location = location
+
+        return False
+
+    def _finish(self, reason):
+        self.reason = reason
+        logging.info(f"End of book detected after {self.pages_observed} pages: {reason}")
+        return True
@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import logging
+import threading
+
+
+DEFAULT_CACHE_FILE = os.path.join(os.environ.get("KINDLE_CACHE_DIR", ".kindle_cache"), "endpoints.json")
+
+# Статусы, после которых эндпоинт считается отсутствующим
+MISSING_STATUS_CODES = (404, 410)
+
+
+class EndpointDiscoveryCache:
+    def __init__(self, cache_file=DEFAULT_CACHE_FILE, ttl=7 * 24 * 3600):
+        """
+        Дисковый кэш результатов проверки API эндпоинтов для каждой книги.
+        Ключ записи - ASIN и шаблон эндпоинта (например, "https://read.amazon.com/api/book/{asin}/content").
+
+        :param cache_file: Путь к JSON файлу кэша
+        :param ttl: Время жизни записи в секундах
+        """
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Endpoint cache {self.cache_file} is unreadable, starting empty: {e}")
+        return {}
+
+    def _fresh(self, entry):
+        return entry and time.time() - entry.get("checked_at", 0) < self.ttl
+
+    def plan(self, asin, templates):
+        """
+        Выбирает шаблоны эндпоинтов, которые стоит запрашивать для книги
+
+        :param asin: ASIN книги
+        :param templates: Список шаблонов эндпоинтов
+        :return: Известные рабочие шаблоны, если они есть, иначе все шаблоны кроме известных нерабочих
+        """
+        with self._lock:
+            book_entries = self._entries.get(asin, {})
+            known_good = [t for t in templates if self._fresh(book_entries.get(t)) and book_entries[t]["status"] == "good"]
+            if known_good:
+                logging.info(f"Endpoint cache hit for {asin}: {len(known_good)} known-good endpoints")
+                return known_good
+
+            planned = [t for t in templates if not (self._fresh(book_entries.get(t)) and book_entries[t]["status"] == "bad")]
+            skipped = len(templates) - len(planned)
+            if skipped:
+                logging.info(f"Endpoint cache for {asin}: skipping {skipped} known-bad endpoints")
+            return planned
+
+    def record(self, asin, template, usable, status_code=None):
+        """
+        Запоминает результат проверки эндпоинта
+
+        :param asin: ASIN книги
+        :param template: Шаблон эндпоинта
+        :param usable: True если эндпоинт вернул пригодный контент
+        :param status_code: HTTP статус ответа
+        """
+        if usable:
+            status = "good"
+        elif status_code in MISSING_STATUS_CODES:
+            # Эндпоинта нет для этой книги
+            status = "bad"
+        else:
+            # Непригодный ответ 200 (страница входа без авторизации, пустой JSON), временные ошибки (5xx, сеть)
+            # зависят от сессии и момента запроса, поэтому не кэшируются
+            return
+
+        with self._lock:
+            self._entries.setdefault(asin, {})[template] = {
+                "status": status,
+                "status_code": status_code,
+                "checked_at": time.time()
+            }
+
+    def save(self):
+        """
+        Сохраняет кэш на диск
+        """
+        with self._lock:
+            try:
+                cache_dir = os.path.dirname(self.cache_file)
+                if cache_dir and not os.path.exists(cache_dir):
+                    os.makedirs(cache_dir)
+
+                # Пишем во временный файл и атомарно заменяем, чтобы не повредить кэш
+                tmp_file = f"{self.cache_file}.tmp"
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(self._entries, f, indent=2)
+                os.replace(tmp_file, self.cache_file)
+            except OSError as e:
+                logging.error(f"Error saving endpoint cache: {e}")
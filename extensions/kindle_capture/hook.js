@@ -0,0 +1,230 @@
+// Перехват ответов Kindle Cloud Reader.
+// Регистрируется на старте каждого документа (CDP Page.addScriptToEvaluateOnNewDocument или
+// content script расширения), поэтому видит первые запросы читалки и работает после перезагрузок.
+// Тот же файл можно выполнить через execute_script на уже загруженной странице.
+(function() {
+    if (window.__kindleCaptureHook) {
+        return;
+    }
+
+    var STASH_KEY = '__kindleCapture';
+    // Сколько неподтвержденных URL запросов хранится, если их никто не забирает
+    var MAX_NETWORK_ENTRIES = 2000;
+
+    window.capturedRequests = [];
+    window.capturedImages = [];
+    window.kindleNetworkRequests = [];
+    // Порядковый номер первого элемента kindleNetworkRequests (курсор для getKindleNetworkRequestsSince)
+    window.kindleNetworkBase = 0;
+    // Объем трафика документа: все загруженные ресурсы и тела перехваченных ответов
+    window.kindleTraffic = {requests: 0, bytes: 0, capturedResponses: 0, capturedBytes: 0};
+
+    // Неполученные ответы предыдущего документа этой вкладки (сохраняются при уходе со страницы)
+    try {
+        var stashed = JSON.parse(window.sessionStorage.getItem(STASH_KEY) || 'null');
+        if (stashed) {
+            window.capturedRequests = stashed.requests || [];
+            window.capturedImages = stashed.images || [];
+            window.kindleNetworkRequests = stashed.network || [];
+            window.kindleNetworkBase = stashed.networkBase || 0;
+            window.kindleTraffic = stashed.traffic || window.kindleTraffic;
+            window.sessionStorage.removeItem(STASH_KEY);
+        }
+    } catch (e) {
+        // sessionStorage недоступен (about:blank, data: URL)
+    }
+
+    window.__kindleCaptureHook = {
+        version: 1,
+        documentStart: document.readyState === 'loading',
+        restored: window.capturedRequests.length + window.capturedImages.length
+    };
+
+    function absoluteUrl(url) {
+        try {
+            return new URL(String(url), window.location.href).href;
+        } catch (e) {
+            return String(url);
+        }
+    }
+
+    // API читалки и blob-данные
+    function shouldCapture(url) {
+        return url.indexOf('blob:') === 0 ||
+            (url.indexOf('amazon.com') !== -1 && (url.indexOf('/api/') !== -1 || url.indexOf('/service/') !== -1));
+    }
+
+    function countCaptured(size) {
+        window.kindleTraffic.capturedResponses += 1;
+        window.kindleTraffic.capturedBytes += size;
+    }
+
+    function storeJson(url, data, size) {
+        window.capturedRequests.push({url: url, type: 'json', data: data, size: size});
+        countCaptured(size);
+    }
+
+    function storeBlob(url, contentType, blob) {
+        countCaptured(blob.size);
+        var reader = new FileReader();
+        reader.onload = function() {
+            window.capturedImages.push({url: url, type: contentType || 'blob', data: reader.result});
+        };
+        reader.readAsDataURL(blob);
+    }
+
+    function isImage(url, contentType) {
+        return contentType.indexOf('image/') !== -1 || url.indexOf('blob:') === 0;
+    }
+
+    // fetch
+    var originalFetch = window.fetch;
+    if (originalFetch) {
+        window.fetch = function(input, init) {
+            var url = absoluteUrl(input && input.url ? input.url : input);
+            return originalFetch.apply(this, arguments).then(function(response) {
+                try {
+                    if (shouldCapture(url)) {
+                        var contentType = response.headers.get('Content-Type') || '';
+                        if (contentType.indexOf('application/json') !== -1) {
+                            // Тело читается из клона ответа, полученного читалкой, без повторного запроса
+                            response.clone().text().then(function(text) {
+                                storeJson(url, JSON.parse(text), text.length);
+                            }).catch(function() {});
+                        } else if (isImage(url, contentType)) {
+                            response.clone().blob().then(function(blob) {
+                                storeBlob(url, contentType, blob);
+                            }).catch(function() {});
+                        }
+                    }
+                } catch (e) {
+                    console.log('Kindle capture hook (fetch): ' + e);
+                }
+                return response;
+            });
+        };
+    }
+
+    // XMLHttpRequest: ответ читается после загрузки, поэтому клонировать его не нужно
+    var originalOpen = XMLHttpRequest.prototype.open;
+    var originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.open = function(method, url) {
+        this.__kindleCaptureUrl = absoluteUrl(url);
+        return originalOpen.apply(this, arguments);
+    };
+    XMLHttpRequest.prototype.send = function() {
+        var xhr = this;
+        if (xhr.__kindleCaptureUrl && shouldCapture(xhr.__kindleCaptureUrl)) {
+            xhr.addEventListener('load', function() {
+                try {
+                    var url = xhr.__kindleCaptureUrl;
+                    var contentType = xhr.getResponseHeader('Content-Type') || '';
+                    if (xhr.responseType === 'json') {
+                        storeJson(url, xhr.response, JSON.stringify(xhr.response).length);
+                    } else if (contentType.indexOf('application/json') !== -1 && (xhr.responseType === '' || xhr.responseType === 'text')) {
+                        storeJson(url, JSON.parse(xhr.responseText), xhr.responseText.length);
+                    } else if (isImage(url, contentType) && (xhr.responseType === 'blob' || xhr.responseType === 'arraybuffer')) {
+                        storeBlob(url, contentType, xhr.responseType === 'blob' ? xhr.response : new Blob([xhr.response], {type: contentType}));
+                    }
+                } catch (e) {
+                    console.log('Kindle capture hook (xhr): ' + e);
+                }
+            });
+        }
+        return originalSend.apply(this, arguments);
+    };
+
+    // URL всех fetch/XHR запросов, включая сделанные до выполнения этого скрипта (buffered).
+    // transferSize равен 0 для ответов из кэша и сторонних хостов без Timing-Allow-Origin.
+    try {
+        new PerformanceObserver(function(list) {
+            list.getEntries().forEach(function(entry) {
+                window.kindleTraffic.requests += 1;
+                window.kindleTraffic.bytes += entry.transferSize || entry.encodedBodySize || 0;
+                if (entry.initiatorType === 'xmlhttprequest' || entry.initiatorType === 'fetch') {
+                    window.kindleNetworkRequests.push(entry.name);
+                }
+            });
+            var overflow = window.kindleNetworkRequests.length - MAX_NETWORK_ENTRIES;
+            if (overflow > 0) {
+                window.kindleNetworkRequests.splice(0, overflow);
+                window.kindleNetworkBase += overflow;
+            }
+        }).observe({type: 'resource', buffered: true});
+    } catch (e) {
+        console.log('Kindle capture hook (performance observer): ' + e);
+    }
+
+    window.getCapturedRequests = function() {
+        return window.capturedRequests;
+    };
+    window.getCapturedImages = function() {
+        return window.capturedImages;
+    };
+    function itemSize(item) {
+        return item.size || (typeof item.data === 'string' ? item.data.length : 0);
+    }
+    // Забирает из буферов перехватчика ответы общим размером не больше maxBytes (минимум один ответ)
+    // и освобождает их в странице. pendingBytes - сколько еще осталось в буферах.
+    window.drainCaptured = function(maxBytes) {
+        var result = {requests: [], images: [], bytes: 0, pending: 0, pendingBytes: 0};
+        [['requests', window.capturedRequests], ['images', window.capturedImages]].forEach(function(pair) {
+            var source = pair[1];
+            var taken = 0;
+            while (taken < source.length) {
+                var size = itemSize(source[taken]);
+                if ((result.bytes > 0 || taken > 0) && result.bytes + size > maxBytes) {
+                    break;
+                }
+                result.bytes += size;
+                taken += 1;
+            }
+            result[pair[0]] = source.splice(0, taken);
+            result.pending += source.length;
+            source.forEach(function(item) {
+                result.pendingBytes += itemSize(item);
+            });
+        });
+        return result;
+    };
+    window.getKindleNetworkRequests = function() {
+        return window.kindleNetworkRequests;
+    };
+    // Возвращает URL запросов с порядковым номером не меньше cursor и удаляет из буфера
+    // подтвержденные (с номером меньше cursor), поэтому стоимость вызова не растет со временем
+    window.getKindleNetworkRequestsSince = function(cursor) {
+        var base = window.kindleNetworkBase;
+        var next = base + window.kindleNetworkRequests.length;
+        if (cursor > next || cursor < base) {
+            // Документ начал нумерацию заново (перезагрузка без сохраненного состояния) или записи вытеснены
+            cursor = base;
+        }
+        window.kindleNetworkRequests.splice(0, cursor - base);
+        window.kindleNetworkBase = cursor;
+        return {entries: window.kindleNetworkRequests.slice(), next: next};
+    };
+    window.getKindleTraffic = function() {
+        return window.kindleTraffic;
+    };
+
+    // Перед перезагрузкой читалки сохраняем ответы, чтобы их не пришлось запрашивать снова
+    window.addEventListener('pagehide', function() {
+        var state = {
+            requests: window.capturedRequests,
+            images: window.capturedImages,
+            network: window.kindleNetworkRequests,
+            networkBase: window.kindleNetworkBase,
+            traffic: window.kindleTraffic
+        };
+        try {
+            window.sessionStorage.setItem(STASH_KEY, JSON.stringify(state));
+        } catch (e) {
+            // Изображения не поместились в квоту sessionStorage: сохраняем хотя бы JSON ответы
+            try {
+                state.images = [];
+                window.sessionStorage.setItem(STASH_KEY, JSON.stringify(state));
+            } catch (ignored) {
+            }
+        }
+    });
+})();
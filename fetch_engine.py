@@ -0,0 +1,88 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from rate_governor import get_shared_governor
+from retry_policy import RetryMetrics, get_default_policy
+
+
+class ConcurrentFetcher:
+    def __init__(self, session, headers=None, max_in_flight=4, rate_governor=None, timeout=30, retry_policy=None, metrics=None):
+        """
+        Параллельная загрузка URL с ограничением числа одновременных запросов
+
+        :param session: Сессия requests для выполнения запросов
+        :param headers: Заголовки, добавляемые к каждому запросу
+        :param max_in_flight: Максимальное количество одновременных запросов
+        :param rate_governor: Регулятор частоты запросов (по умолчанию общий для процесса)
+        :param timeout: Таймаут одного запроса в секундах
+        :param retry_policy: Политика повторов (по умолчанию общая для процесса)
+        :param metrics: Метрики повторов задания (по умолчанию отдельные для загрузчика)
+        """
+        self.session = session
+        self.headers = headers or {}
+        self.max_in_flight = max(1, int(max_in_flight or 1))
+        self.rate_governor = rate_governor or get_shared_governor()
+        self.timeout = timeout
+        self.retry_policy = retry_policy or get_default_policy()
+        self.metrics = metrics or RetryMetrics()
+
+    def _send(self, url):
+        """
+        Одна попытка GET-запроса с учетом регулятора частоты
+        """
+        self.rate_governor.acquire(url)
+        start_time = time.monotonic()
+        try:
+            response = self.session.get(url, headers=self.headers, timeout=self.timeout)
+        except requests.RequestException:
+            self.rate_governor.record(url, None, time.monotonic() - start_time)
+            raise
+        self.rate_governor.record(url, response.status_code, time.monotonic() - start_time, response.headers)
+        return response
+
+    def fetch_one(self, url, index=0):
+        """
+        Выполняет GET-запрос с учетом регулятора частоты, повторяя временные ошибки
+
+        :param url: URL для запроса
+        :param index: Порядковый номер URL в исходном списке
+        :return: Словарь с ключами url, index, response, error, elapsed, attempts
+        """
+        start_time = time.monotonic()
+        response, error, attempts = self.retry_policy.execute(
+            lambda: self._send(url), url, method="GET", metrics=self.metrics
+        )
+        if error is not None:
+            logging.error(f"Request to {url} failed after {attempts} attempts: {error}")
+        return {
+            "url": url,
+            "index": index,
+            "response": response,
+            "error": error,
+            "elapsed": time.monotonic() - start_time,
+            "attempts": attempts
+        }
+
+    def fetch_all(self, urls):
+        """
+        Загружает все URL, сохраняя исходный порядок результатов
+
+        :param urls: Список URL
+        :return: Список результатов fetch_one в порядке исходного списка
+        """
+        urls = list(urls)
+        if not urls:
+            return []
+
+        if self.max_in_flight == 1 or len(urls) == 1:
+            return [self.fetch_one(url, index) for index, url in enumerate(urls)]
+
+        workers = min(self.max_in_flight, len(urls))
+        logging.info(f"Fetching {len(urls)} URLs with {workers} concurrent workers")
+
+        # executor.map возвращает результаты в порядке входных данных
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self.fetch_one, urls, range(len(urls))))
@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+from http_session import PooledHTTPAdapter
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("KINDLE_CACHE_DIR", ".kindle_cache"), "http")
+DEFAULT_MAX_BYTES = int(float(os.environ.get("KINDLE_HTTP_CACHE_MAX_MB", "200")) * 1024 * 1024)
+
+# Заголовки, которые не сохраняются вместе с телом (тело хранится уже декодированным)
+HOP_BY_HOP_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive')
+
+# Cookie, определяющие аккаунт Amazon: по ним ответы разных аккаунтов хранятся под разными ключами
+IDENTITY_COOKIES = ('session-id', 'ubid-main', 'x-main', 'at-main', 'sess-at-main')
+
+
+class DiskResponseStore:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Дисковое хранилище тел HTTP-ответов с валидаторами ETag/Last-Modified и LRU-вытеснением
+
+        :param cache_dir: Директория кэша
+        :param max_bytes: Максимальный суммарный размер тел ответов в байтах
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self._lock = threading.Lock()
+        self._dirty_touches = 0
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0, "bytes_saved": 0}
+
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self._index = self._load_index()
+
+    def _load_index(self):
+        try:
+            if os.path.exists(self.index_file):
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"HTTP cache index is unreadable, starting empty: {e}")
+        return {}
+
+    def _save_index(self):
+        tmp_file = f"{self.index_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_file, self.index_file)
+        self._dirty_touches = 0
+
+    def _body_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.body")
+
+    @staticmethod
+    def make_key(url, identity=""):
+        """
+        :param url: URL запроса
+        :param identity: Идентификатор пользователя (см. request_identity), чтобы ответы разных аккаунтов не смешивались
+        :return: Ключ записи
+        """
+        return hashlib.sha256(f"{identity}\n{url}".encode('utf-8')).hexdigest()
+
+    def record(self, name, amount=1):
+        """
+        Увеличивает счетчик статистики
+
+        :param name: Имя счетчика
+        :param amount: Величина увеличения
+        """
+        with self._lock:
+            self.stats[name] += amount
+
+    def get(self, key):
+        """
+        Возвращает метаданные записи или None
+
+        :param key: Ключ записи
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            return dict(entry) if entry else None
+
+    def read_body(self, key):
+        """
+        Читает тело ответа и обновляет время последнего обращения
+
+        :param key: Ключ записи
+        :return: Байты тела или None, если файл отсутствует
+        """
+        try:
+            with open(self._body_path(key), 'rb') as f:
+                body = f.read()
+        except OSError:
+            with self._lock:
+                self._index.pop(key, None)
+            return None
+
+        with self._lock:
+            entry = self._index.get(key)
+            if entry:
+                entry["last_access"] = time.time()
+                self._dirty_touches += 1
+                # Время доступа сохраняем пачками, чтобы не переписывать индекс на каждый запрос
+                if self._dirty_touches >= 20:
+                    self._save_index()
+        return body
+
+    def put(self, key, meta, body):
+        """
+        Сохраняет тело ответа и его валидаторы
+
+        :param key: Ключ записи
+        :param meta: Метаданные (url, status, headers, etag, last_modified)
+        :param body: Байты тела ответа
+        """
+        if self.max_bytes and len(body) > self.max_bytes:
+            return
+
+        try:
+            tmp_path = f"{self._body_path(key)}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, self._body_path(key))
+        except OSError as e:
+            logging.error(f"Error writing HTTP cache entry: {e}")
+            return
+
+        with self._lock:
+            self._index[key] = {**meta, "size": len(body), "last_access": time.time()}
+            self.stats["stored"] += 1
+            self._evict()
+            self._save_index()
+
+    def _evict(self):
+        total = sum(entry["size"] for entry in self._index.values())
+        if not self.max_bytes or total <= self.max_bytes:
+            return
+
+        # Удаляем записи, к которым дольше всего не обращались
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= entry["size"]
+            del self._index[key]
+            self.stats["evicted"] += 1
+            try:
+                os.remove(self._body_path(key))
+            except OSError:
+                pass
+
+    def flush(self):
+        """
+        Сохраняет индекс на диск
+        """
+        with self._lock:
+            self._save_index()
+
+
+def request_identity(request):
+    """
+    Идентификатор пользователя запроса: заголовок Authorization и cookie аккаунта
+    (если их нет, весь заголовок Cookie). Пустая строка для анонимных запросов.
+
+    :param request: Подготовленный запрос requests
+    :return: Хеш идентификатора или пустая строка
+    """
+    authorization = request.headers.get('Authorization', '')
+    cookie_header = request.headers.get('Cookie', '')
+    if not authorization and not cookie_header:
+        return ""
+
+    cookies = []
+    for part in cookie_header.split(';'):
+        name, _, value = part.strip().partition('=')
+        if name in IDENTITY_COOKIES:
+            cookies.append(f"{name}={value}")
+    identity = f"{authorization}\n{';'.join(sorted(cookies)) or cookie_header}"
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+def is_storable(response):
+    """
+    :param response: Ответ requests
+    :return: True если ответ можно сохранить в общий дисковый кэш (нет Cache-Control: no-store/private)
+    """
+    directives = [d.strip().split('=')[0].lower() for d in response.headers.get('Cache-Control', '').split(',')]
+    return 'no-store' not in directives and 'private' not in directives
+
+
+class CachingHTTPAdapter(PooledHTTPAdapter):
+    def __init__(self, store, **kwargs):
+        """
+        Транспортный адаптер requests с пулом соединений, условными запросами и локальным хранилищем ответов
+
+        :param store: Хранилище ответов (DiskResponseStore)
+        """
+        super().__init__(**kwargs)
+        self.store = store
+
+    def send(self, request, **kwargs):
+        if request.method != 'GET' or kwargs.get('stream'):
+            return super().send(request, **kwargs)
+
+        key = self.store.make_key(request.url, request_identity(request))
+        entry = self.store.get(key)
+
+        # Добавляем валидаторы, если ответ уже есть в кэше
+        added_validators = []
+        if entry:
+            if entry.get("etag") and 'If-None-Match' not in request.headers:
+                request.headers['If-None-Match'] = entry["etag"]
+                added_validators.append('If-None-Match')
+            if entry.get("last_modified") and 'If-Modified-Since' not in request.headers:
+                request.headers['If-Modified-Since'] = entry["last_modified"]
+                added_validators.append('If-Modified-Since')
+
+        response = super().send(request, **kwargs)
+        response.from_cache = False
+
+        if response.status_code == 304 and added_validators:
+            body = self.store.read_body(key)
+            if body is not None:
+                return self._build_cached_response(response, entry, body)
+            # Тело вытеснено из кэша: вызывающий код не отправлял условный запрос, поэтому повторяем без валидаторов
+            response.content
+            response.close()
+            for header in added_validators:
+                del request.headers[header]
+            response = super().send(request, **kwargs)
+            response.from_cache = False
+
+        if response.status_code == 200:
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if (etag or last_modified) and is_storable(response):
+                headers = {k: v for k, v in response.headers.items()
+                           if k.lower() not in HOP_BY_HOP_HEADERS and k.lower() != 'set-cookie'}
+                self.store.put(key, {
+                    "url": request.url,
+                    "status": response.status_code,
+                    "headers": headers,
+                    "etag": etag,
+                    "last_modified": last_modified
+                }, response.content)
+            self.store.record("misses")
+
+        return response
+
+    def _build_cached_response(self, response, entry, body):
+        """
+        Превращает ответ 304 в полноценный ответ с телом из кэша
+        """
+        # Дочитываем пустое тело 304, чтобы соединение вернулось в пул
+        response.content
+
+        fresh_headers = {k: v for k, v in response.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+        response.headers.clear()
+        response.headers.update(entry.get("headers", {}))
+        response.headers.update(fresh_headers)
+        response.status_code = entry.get("status", 200)
+        response.reason = 'OK'
+        response._content = body
+        response._content_consumed = True
+        response.from_cache = True
+
+        self.store.record("hits")
+        self.store.record("bytes_saved", len(body))
+        logging.debug(f"Served {response.url} from HTTP cache ({len(body)} bytes)")
+        return response
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_default_store():
+    """
+    Возвращает общее для процесса дисковое хранилище ответов
+
+    :return: Экземпляр DiskResponseStore
+    """
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = DiskResponseStore()
+        return _default_store
+
@@ -0,0 +1,157 @@
+import os
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+# Количество хостов, для которых держатся пулы, и число соединений в пуле одного хоста
+POOL_CONNECTIONS = int(os.environ.get("KINDLE_HTTP_POOL_HOSTS", "10"))
+POOL_MAXSIZE = int(os.environ.get("KINDLE_HTTP_POOL_SIZE", "32"))
+
+
+class ConnectionStats:
+    def __init__(self):
+        """
+        Счетчики запросов и новых соединений (TCP/TLS рукопожатий)
+        """
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.new_tls_connections = 0
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self, tls):
+        with self._lock:
+            self.new_connections += 1
+            if tls:
+                self.new_tls_connections += 1
+
+    def snapshot(self):
+        """
+        :return: Словарь со счетчиками и долей запросов, выполненных по уже открытому соединению
+        """
+        with self._lock:
+            reused = max(0, self.requests - self.new_connections)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "tls_handshakes": self.new_tls_connections,
+                "reused_connections": reused,
+                "reuse_ratio": round(reused / self.requests, 3) if self.requests else 0.0
+            }
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    def __init__(self, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, **kwargs):
+        """
+        Транспортный адаптер с увеличенными пулами keep-alive соединений и счетчиками переиспользования
+
+        :param pool_connections: Количество хостов, для которых кэшируются пулы
+        :param pool_maxsize: Максимальное количество соединений в пуле одного хоста
+        """
+        self.stats = ConnectionStats()
+        super().__init__(pool_connections=pool_connections, pool_maxsize=pool_maxsize, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        stats = self.stats
+
+        # Подменяем классы пулов, чтобы считать создание новых соединений
+        class CountingHTTPConnectionPool(HTTPConnectionPool):
+            def _new_conn(self):
+                stats.record_connection(tls=False)
+                return super()._new_conn()
+
+        class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+            def _new_conn(self):
+                stats.record_connection(tls=True)
+                return super()._new_conn()
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CountingHTTPConnectionPool,
+            "https": CountingHTTPSConnectionPool
+        }
+
+    def send(self, request, **kwargs):
+        self.stats.record_request()
+        return super().send(request, **kwargs)
+
+
+_registry_lock = threading.Lock()
+_shared_adapters = {}
+_account_sessions = {}
+
+
+def get_shared_adapter(http_cache=None):
+    """
+    Возвращает общий для процесса транспортный адаптер
+
+    :param http_cache: Хранилище HTTP-ответов (None - общее дисковое хранилище, False - без кэша)
+    :return: Экземпляр PooledHTTPAdapter
+    """
+    # Импорт внутри функции, т.к. http_cache сам зависит от PooledHTTPAdapter
+    from http_cache import CachingHTTPAdapter, get_default_store
+
+    if http_cache is False:
+        key = "plain"
+    else:
+        http_cache = http_cache or get_default_store()
+        key = id(http_cache)
+
+    with _registry_lock:
+        adapter = _shared_adapters.get(key)
+        if adapter is None:
+            adapter = PooledHTTPAdapter() if http_cache is False else CachingHTTPAdapter(http_cache)
+            _shared_adapters[key] = adapter
+        return adapter
+
+
+def get_session(account=None, http_cache=None):
+    """
+    Возвращает сессию requests, использующую общий пул соединений процесса.
+    Для каждой учетной записи хранится своя сессия (и свой набор cookies),
+    сессии без учетной записи создаются заново для каждого вызова.
+
+    :param account: Идентификатор учетной записи (например, email)
+    :param http_cache: Хранилище HTTP-ответов (None - общее дисковое хранилище, False - без кэша)
+    :return: Экземпляр requests.Session
+    """
+    adapter = get_shared_adapter(http_cache)
+    key = (account, id(adapter))
+
+    with _registry_lock:
+        if account and key in _account_sessions:
+            return _account_sessions[key]
+
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        if account:
+            _account_sessions[key] = session
+            logging.info(f"Created pooled HTTP session for account {account}")
+        return session
+
+
+def connection_stats():
+    """
+    Возвращает суммарные счетчики переиспользования соединений по всем общим адаптерам
+
+    :return: Словарь со счетчиками
+    """
+    with _registry_lock:
+        adapters = list(_shared_adapters.values())
+
+    totals = {"requests": 0, "new_connections": 0, "tls_handshakes": 0, "reused_connections": 0}
+    for adapter in adapters:
+        snapshot = adapter.stats.snapshot()
+        for name in totals:
+            totals[name] += snapshot[name]
+    totals["reuse_ratio"] = round(totals["reused_connections"] / totals["requests"], 3) if totals["requests"] else 0.0
+    return totals
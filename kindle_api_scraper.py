@@ -4,12 +4,30 @@ import time
 import logging
 from urllib.parse import urlparse, parse_qs
 from bs4 import BeautifulSoup
+from fetch_engine import ConcurrentFetcher
+from rate_governor import AIMDRateGovernor, get_shared_governor
+from endpoint_cache import EndpointDiscoveryCache
+from http_session import get_session, connection_stats
+from session_store import cookies_from_jar, get_default_store
 
 logging.basicConfig(filename='kindle_api_scraper.log', level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Шаблоны потенциальных API эндпоинтов книги
+API_ENDPOINT_TEMPLATES = [
+    "https://read.amazon.com/api/book/{asin}/metadata",
+    "https://read.amazon.com/api/book/{asin}/content",
+    "https://read.amazon.com/service/metadata/lookup?asin={asin}",
+    "https://read.amazon.com/service/content/lookup?asin={asin}",
+    "https://read.amazon.com/api/book/get-content?asin={asin}",
+    "https://read.amazon.com/api/book/{asin}/properties",
+    "https://read.amazon.com/service/content/json?asin={asin}",
+    "https://read.amazon.com/api/book/{asin}/pages",
+    "https://read.amazon.com/api/book/{asin}/chapters"
+]
+
 class KindleAPIScraper:
-    def __init__(self, email=None, password=None, book_id=None, book_url=None, output_file="kindle_book.txt", session_cookies=None):
+    def __init__(self, email=None, password=None, book_id=None, book_url=None, output_file="kindle_book.txt", session_cookies=None, max_in_flight=4, host_rate_limit=None, endpoint_cache=None, http_cache=None, session_store=None, retry_policy=None):
         """
         Инициализация API скрапера для Kindle Cloud Reader
         
@@ -19,6 +37,12 @@ class KindleAPIScraper:
         :param book_url: URL книги в Kindle Cloud Reader
         :param output_file: Имя файла для сохранения текста
         :param session_cookies: Cookies из открытой сессии Kindle (из инструментов разработчика, опционально)
+        :param max_in_flight: Максимальное количество одновременных запросов к API
+        :param host_rate_limit: Потолок частоты запросов к одному хосту (None - общий адаптивный регулятор, 0 - без ограничения)
+        :param endpoint_cache: Кэш обнаруженных API эндпоинтов (по умолчанию дисковый кэш в .kindle_cache)
+        :param http_cache: Хранилище HTTP-ответов для условных запросов (None - общее дисковое хранилище, False - без кэша)
+        :param session_store: Зашифрованное хранилище авторизованных сессий (None - общее хранилище, False - всегда полный вход)
+        :param retry_policy: Политика повторов временных ошибок (по умолчанию общая для процесса)
         """
         self.email = email
         self.password = password
@@ -26,8 +50,13 @@ class KindleAPIScraper:
         self.book_url = book_url
         self.output_file = output_file
         self.session_cookies = session_cookies or {}
-        self.session = requests.Session()
+        
+        # Общий для процесса пул соединений; cookies хранятся отдельно для каждой учетной записи.
+        # Кэш ответов с ревалидацией по ETag/Last-Modified подключен на уровне адаптера
+        self.session = get_session(account=email, http_cache=http_cache)
+        self.http_cache_adapter = self.session.get_adapter('https://') if http_cache is not False else None
         self.is_authenticated = False
+        self.session_store = get_default_store() if session_store is None else session_store
         
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -41,6 +70,24 @@ class KindleAPIScraper:
         for cookie_name, cookie_value in self.session_cookies.items():
             self.session.cookies.set(cookie_name, cookie_value)
         
+        # Адаптивный регулятор частоты запросов вместо фиксированных пауз
+        if host_rate_limit is None:
+            self.rate_governor = get_shared_governor()
+        else:
+            self.rate_governor = AIMDRateGovernor(max_rate=host_rate_limit)
+        
+        self.fetcher = ConcurrentFetcher(
+            self.session,
+            headers=self.headers,
+            max_in_flight=max_in_flight,
+            rate_governor=self.rate_governor,
+            retry_policy=retry_policy
+        )
+        
+        # Кэш обнаруженных эндпоинтов и соответствие URL -> шаблон для текущей книги
+        self.endpoint_cache = endpoint_cache or EndpointDiscoveryCache()
+        self.endpoint_templates = {}
+        
         # Извлекаем ID книги из URL, если предоставлен
         if not self.book_id and self.book_url:
             self.book_id = self._extract_asin(self.book_url)
@@ -57,6 +104,23 @@ class KindleAPIScraper:
         }
         logging.info("Initialized Kindle API Scraper")
         
+    def get_telemetry(self):
+        """
+        Возвращает телеметрию запросов скрапера
+        
+        :return: Словарь с текущей частотой запросов, состоянием регулятора по хостам, повторами и автоматами защиты
+        """
+        telemetry = {
+            "request_rate": self.rate_governor.current_rate("read.amazon.com"),
+            "hosts": self.rate_governor.snapshot(),
+            "connections": connection_stats(),
+            "retries": self.fetcher.metrics.snapshot(),
+            "breakers": self.fetcher.retry_policy.breaker.snapshot()
+        }
+        if self.http_cache_adapter:
+            telemetry["http_cache"] = dict(self.http_cache_adapter.store.stats)
+        return telemetry
+        
     def _extract_asin(self, url):
         """
         Извлекает ASIN книги из URL
@@ -82,6 +146,13 @@ class KindleAPIScraper:
             logging.error(f"Error extracting ASIN: {e}")
             return None
             
+    def _store_session(self):
+        """
+        Сохраняет cookies авторизованной сессии для следующих запусков
+        """
+        if self.session_store and self.email:
+            self.session_store.save(self.email, cookies_from_jar(self.session.cookies))
+    
     def authenticate(self):
         """
         Авторизация на сайте Amazon
@@ -90,6 +161,11 @@ class KindleAPIScraper:
         """
         if self.is_authenticated:
             return True
+        
+        # Сначала пробуем сохраненную сессию: одна проверка вместо полного входа
+        if self.email and self.session_store and self.session_store.restore_session(self.session, self.email, self.headers, self.fetcher):
+            self.is_authenticated = True
+            return True
             
         if not self.email or not self.password:
             logging.warning("No credentials provided for authentication")
@@ -153,12 +229,14 @@ class KindleAPIScraper:
             if "Your Account" in login_response.text or "Hello," in login_response.text:
                 logging.info("Successfully authenticated with Amazon")
                 self.is_authenticated = True
+                self._store_session()
                 return True
                 
             # Проверяем перенаправление на страницу Kindle
             if "read.amazon.com" in login_response.url:
                 logging.info("Redirected to Kindle Cloud Reader, authentication successful")
                 self.is_authenticated = True
+                self._store_session()
                 return True
                 
             logging.warning("Authentication status uncertain, proceeding anyway")
@@ -267,16 +345,25 @@ class KindleAPIScraper:
         :return: True если успешно, иначе False
         """
         try:
-            for url in api_urls:
-                logging.info(f"Fetching content from: {url}")
-                response = self.session.get(url, headers=self.headers)
+            # Запросы выполняются параллельно, результаты возвращаются в исходном порядке
+            for result in self.fetcher.fetch_all(api_urls):
+                url = result["url"]
+                response = result["response"]
+                
+                if response is None:
+                    logging.error(f"Failed to fetch content from {url}: {result['error']}")
+                    continue
                 
+                logging.info(f"Fetched content from: {url} in {result['elapsed']:.2f}s")
+                
+                usable = False
                 if response.status_code == 200:
                     try:
                         data = response.json()
                         extracted_text = self.extract_text_from_json(data)
                         if extracted_text:
                             self.text_content.append(extracted_text)
+                            usable = True
                             logging.info(f"Successfully extracted content from {url}")
                         else:
                             logging.warning(f"No text content found in response from {url}")
@@ -286,8 +373,13 @@ class KindleAPIScraper:
                 else:
                     logging.error(f"Failed to fetch content, status code: {response.status_code}")
                 
-                # Небольшая задержка между запросами
-                time.sleep(1)
+                # Запоминаем результат проверки обнаруженного эндпоинта
+                template = self.endpoint_templates.get(url)
+                if template:
+                    self.endpoint_cache.record(self.book_id, template, usable, response.status_code)
+            
+            if self.endpoint_templates:
+                self.endpoint_cache.save()
                 
             return len(self.text_content) > 0
         except Exception as e:
@@ -368,20 +460,10 @@ class KindleAPIScraper:
             logging.error("Book ID (ASIN) is required to discover API endpoints")
             return []
             
-        # Список потенциальных API эндпоинтов
-        api_endpoints = [
-            f"https://read.amazon.com/api/book/{self.book_id}/metadata",
-            f"https://read.amazon.com/api/book/{self.book_id}/content",
-            f"https://read.amazon.com/service/metadata/lookup?asin={self.book_id}",
-            f"https://read.amazon.com/service/content/lookup?asin={self.book_id}",
-            f"https://read.amazon.com/api/book/get-content?asin={self.book_id}",
-            f"https://read.amazon.com/api/book/{self.book_id}/properties",
-            f"https://read.amazon.com/service/content/json?asin={self.book_id}",
-            # Добавляем для Quantum Poker
-            f"https://read.amazon.com/api/book/B009SE1Z9E/content",
-            f"https://read.amazon.com/api/book/B009SE1Z9E/pages",
-            f"https://read.amazon.com/api/book/B009SE1Z9E/chapters"
-        ]
+        # Пропускаем известные нерабочие эндпоинты и сразу используем известные рабочие
+        templates = self.endpoint_cache.plan(self.book_id, API_ENDPOINT_TEMPLATES)
+        self.endpoint_templates = {template.format(asin=self.book_id): template for template in templates}
+        api_endpoints = list(self.endpoint_templates)
         
         logging.info(f"Generated {len(api_endpoints)} potential API endpoints for book ID: {self.book_id}")
         return api_endpoints
@@ -491,8 +573,8 @@ class KindleAPIScraper:
         :param response_file: Путь к файлу с ответом API (опционально)
         :return: True если успешно, иначе False
         """
-        # Авторизуемся, если предоставлены учетные данные
-        if self.email and self.password:
+        # Авторизуемся, если предоставлены учетные данные или сохранена сессия
+        if self.email and (self.password or self.session_store):
             auth_success = self.authenticate()
             if not auth_success:
                 logging.error("Authentication failed, extraction might be limited")
@@ -569,6 +651,8 @@ if __name__ == "__main__":
     parser.add_argument('--har', help='Path to HAR file exported from developer tools')
     parser.add_argument('--response', help='Path to saved API response file')
     parser.add_argument('--output', default='kindle_book.txt', help='Path to save extracted text')
+    parser.add_argument('--concurrency', type=int, default=4, help='Maximum number of concurrent API requests')
+    parser.add_argument('--rate', type=float, default=None, help='Request rate ceiling per host (default: shared adaptive governor)')
     
     args = parser.parse_args()
     
@@ -577,7 +661,7 @@ if __name__ == "__main__":
         parser.print_help()
         exit(1)
     
-    scraper = KindleAPIScraper(output_file=args.output)
+    scraper = KindleAPIScraper(output_file=args.output, max_in_flight=args.concurrency, host_rate_limit=args.rate)
     success = scraper.run(har_file=args.har, response_file=args.response)
     
     if success:
@@ -11,11 +11,23 @@ from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.firefox.options import Options
 from selenium.webdriver.firefox.service import Service
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from webdriver_manager.firefox import GeckoDriverManager
+from end_of_book import EndOfBookDetector, page_numbers
+from session_store import cookies_from_driver, get_default_store
+from session_bridge import http_scraper_from_browser
+from page_turn import PageTurnWaiter
+from browser_profile import lean_chrome_options, lean_firefox_options
+from cdp_capture import CDPNetworkCapture, enable_performance_log, is_chromium
+from capture_hook import ensure_capture_hook
+from capture_drain import CaptureDrain
+from driver_resolver import resolve_driver
+from page_extractor import extract_page, is_embedded_image, attach_command_counter, log_command_summary
+from tab_capture import REACHED_NEXT_RANGE, location_ranges, location_url, merge_tab_pages, parse_location
 
 # Импортируем расширенное логирование
 from debug_utils import (
@@ -42,7 +54,7 @@ console_handler.setFormatter(formatter)
 logging.getLogger('').addHandler(console_handler)
 
 class KindleAPIScraperEnhanced:
-    def __init__(self, email=None, password=None, book_url=None, output_file="kindle_enhanced_book.txt", images_dir="kindle_images", page_load_time=5, max_pages=50):
+    def __init__(self, email=None, password=None, book_url=None, output_file="kindle_enhanced_book.txt", images_dir="kindle_images", page_load_time=5, max_pages=50, detect_end=False, session_store=None, http_handoff=False, lean_browser=False, browser_lease=None, parallel_tabs=1, stop_location=None, capture_backend="js", capture_filters=None, drain_every=5):
         """
         Инициализация улучшенного API скрапера для Kindle Cloud Reader с поддержкой изображений
         
@@ -52,7 +64,17 @@ class KindleAPIScraperEnhanced:
         :param output_file: Имя файла для сохранения текста
         :param images_dir: Директория для сохранения изображений
         :param page_load_time: Время ожидания загрузки страницы в секундах
-        :param max_pages: Максимальное количество страниц для обработки
+        :param max_pages: Максимальное количество страниц для обработки (None или 0 - до конца книги)
+        :param detect_end: Останавливать перелистывание при обнаружении конца книги (включается автоматически без max_pages)
+        :param session_store: Зашифрованное хранилище авторизованных сессий (None - общее хранилище, False - всегда полный вход)
+        :param http_handoff: После входа закрыть браузер и загружать API эндпоинты книги через HTTP
+        :param lean_browser: Облегченный профиль браузера: без окна, анимаций и сторонних хостов (см. browser_profile)
+        :param browser_lease: Браузер из пула (browser_pool.BrowserLease): используется вместо запуска нового и не закрывается по завершении
+        :param parallel_tabs: Количество вкладок, читающих разные диапазоны позиций книги одновременно (1 - последовательное чтение)
+        :param stop_location: Позиция читалки, на которой перелистывание останавливается (None - без ограничения)
+        :param capture_backend: Перехват ответов: "js" - подмена window.fetch в Firefox, "cdp" - протокол DevTools в Chrome (см. cdp_capture)
+        :param capture_filters: Регулярные выражения URL для перехвата через CDP (по умолчанию cdp_capture.DEFAULT_CAPTURE_FILTERS)
+        :param drain_every: Забирать ответы JS перехватчика порциями каждые столько страниц (см. capture_drain; False - после последней страницы)
         """
         self.email = email
         self.password = password
@@ -61,6 +83,19 @@ class KindleAPIScraperEnhanced:
         self.images_dir = images_dir
         self.page_load_time = page_load_time
         self.max_pages = max_pages
+        self.end_detector = EndOfBookDetector() if detect_end or not max_pages else None
+        self.session_store = get_default_store() if session_store is None else session_store
+        self.http_handoff = http_handoff
+        self.lean_browser = lean_browser
+        self.browser_lease = browser_lease
+        self.parallel_tabs = max(1, parallel_tabs or 1)
+        self.parallel_report = {}
+        self.stop_location = stop_location
+        self.capture_backend = capture_backend
+        self.capture_filters = capture_filters
+        self.network_capture = None
+        self.drain_every = drain_every
+        self.capture_drain = None
         
         # Создаем директорию для изображений, если она не существует
         if not os.path.exists(self.images_dir):
@@ -69,6 +104,7 @@ class KindleAPIScraperEnhanced:
         self.driver = None
         self.extracted_text = ""
         self.current_page = 0
+        self.current_location = None
         self.total_pages = 0
         self.current_page_callback = None
         self.asin = self._extract_asin(book_url) if book_url else None
@@ -129,12 +165,31 @@ class KindleAPIScraperEnhanced:
         Настройка Firefox для работы с Kindle Cloud Reader
         """
         try:
+            if self.browser_lease:
+                selenium_logger.info("Используем браузер из пула")
+                self.driver = self.browser_lease.driver
+                self.setup_request_interceptor()
+                return True
+            
+            if self.capture_backend == "cdp":
+                return self._setup_chrome_driver()
+            
             selenium_logger.info("Настраиваем Firefox для работы с Kindle Cloud Reader")
             
             # Настраиваем опции Firefox
             options = Options()
-            options.add_argument("--width=1366")
-            options.add_argument("--height=768")
+            if self.lean_browser:
+                # Изображения страниц нужны для сохранения, поэтому остаются включенными
+                lean_firefox_options(options, images=True)
+            else:
+                options.add_argument("--width=1366")
+                options.add_argument("--height=768")
+            
+            # Фоновые вкладки не должны замедлять таймеры читалки, пока драйвер работает с другой вкладкой
+            if self.parallel_tabs > 1:
+                options.set_preference("dom.min_background_timeout_value", 4)
+                options.set_preference("dom.timeout.enable_budget_timer_throttling", False)
+                options.set_preference("dom.suspend_inactive.enabled", False)
             
             # Настраиваем Firefox для логирования
             options.set_preference("devtools.console.stdout.content", True)
@@ -144,7 +199,7 @@ class KindleAPIScraperEnhanced:
             options.set_preference("network.http.use-cache", False)
             
             # Инициализируем драйвер
-            service = Service(GeckoDriverManager().install())
+            service = Service(resolve_driver("geckodriver"))
             self.driver = webdriver.Firefox(service=service, options=options)
             
             # Сохраняем скриншот для подтверждения запуска
@@ -164,107 +219,59 @@ class KindleAPIScraperEnhanced:
             selenium_logger.error(f"Трассировка: {traceback.format_exc()}")
             return False
 
+    def _setup_chrome_driver(self):
+        """
+        Запускает Chrome с журналом производительности для перехвата ответов через CDP
+        """
+        try:
+            selenium_logger.info("Настраиваем Chrome для перехвата ответов через CDP")
+            options = ChromeOptions()
+            if self.lean_browser:
+                lean_chrome_options(options, images=True)
+            else:
+                options.add_argument("--window-size=1366,768")
+            enable_performance_log(options)
+            
+            service = ChromeService(resolve_driver("chromedriver"))
+            self.driver = webdriver.Chrome(service=service, options=options)
+            
+            self.setup_request_interceptor()
+            selenium_logger.info("Chrome успешно настроен")
+            return True
+            
+        except Exception as e:
+            selenium_logger.error(f"Ошибка при настройке Chrome: {str(e)}")
+            selenium_logger.error(f"Трассировка: {traceback.format_exc()}")
+            return False
+
     @log_function_call(selenium_logger)
     def setup_request_interceptor(self):
         """
-        Устанавливает JavaScript для перехвата и сохранения запросов
+        Устанавливает перехватчик запросов (extensions/kindle_capture/hook.js) или включает перехват через CDP
         """
         if not self.driver:
             selenium_logger.error("Нельзя установить перехватчик запросов: драйвер не инициализирован")
             return
-            
-        interceptor_script = """
-        // Создаем массив для хранения перехваченных запросов
-        window.capturedRequests = [];
-        window.capturedImages = [];
-        
-        // Перехватываем fetch запросы
-        const originalFetch = window.fetch;
-        window.fetch = async function(url, options) {
-            // Вызываем оригинальный fetch
-            const response = await originalFetch(url, options);
-            
-            try {
-                // Проверяем, относится ли URL к API Kindle или blob
-                if (url.includes('amazon.com') && 
-                   (url.includes('/api/') || url.includes('/service/') || 
-                    url.includes('blob:') || url.startsWith('blob:'))) {
-                    
-                    console.log('Captured API request to: ' + url);
-                    
-                    // Клонируем ответ (т.к. response.json() можно вызвать только один раз)
-                    const clone = response.clone();
-                    
-                    // Пытаемся получить тело ответа в зависимости от Content-Type
-                    const contentType = response.headers.get('Content-Type') || '';
-                    console.log('Content-Type: ' + contentType);
-                    
-                    if (contentType.includes('application/json')) {
-                        // Для JSON данных
-                        clone.json().then(data => {
-                            console.log('Parsed JSON data from: ' + url);
-                            window.capturedRequests.push({
-                                url: url,
-                                type: 'json',
-                                data: data
-                            });
-                        }).catch(e => console.log('Error parsing JSON: ' + e));
-                    } 
-                    else if (contentType.includes('image/') || url.includes('blob:')) {
-                        // Для изображений или blob-данных
-                        clone.blob().then(blob => {
-                            console.log('Processing blob/image from: ' + url);
-                            const reader = new FileReader();
-                            reader.onload = function() {
-                                console.log('Image/blob data converted to base64');
-                                window.capturedImages.push({
-                                    url: url,
-                                    type: contentType || 'blob',
-                                    data: reader.result
-                                });
-                            };
-                            reader.readAsDataURL(blob);
-                        }).catch(e => console.log('Error processing blob: ' + e));
-                    }
-                }
-            } catch (e) {
-                console.log('Error in fetch interceptor: ' + e);
-                console.log('Error stack: ' + e.stack);
-            }
-            
-            // Возвращаем оригинальный ответ
-            return response;
-        };
-        
-        // Функция для получения перехваченных запросов
-        window.getCapturedRequests = function() {
-            console.log('getCapturedRequests called, count: ' + window.capturedRequests.length);
-            return window.capturedRequests;
-        };
-        
-        // Функция для получения перехваченных изображений
-        window.getCapturedImages = function() {
-            console.log('getCapturedImages called, count: ' + window.capturedImages.length);
-            return window.capturedImages;
-        };
-        
-        console.log('Interceptor installed successfully');
-        """
         
+        if self.capture_backend == "cdp":
+            if not is_chromium(self.driver):
+                selenium_logger.warning("Перехват через CDP доступен только в Chrome, используем JS перехватчик")
+            else:
+                if self.network_capture is None:
+                    self.network_capture = CDPNetworkCapture(self.driver, self.capture_filters)
+                if self.network_capture.start():
+                    return
+                selenium_logger.warning("Не удалось включить перехват через CDP, используем JS перехватчик")
+            
         try:
-            # Выполняем скрипт
-            self.driver.execute_script(interceptor_script)
-            selenium_logger.info("Установлен перехватчик запросов")
-            
-            # Проверяем, успешно ли установлен скрипт
-            check_script = """
-            return typeof window.getCapturedRequests === 'function' && 
-                  typeof window.getCapturedImages === 'function';
-            """
-            is_installed = self.driver.execute_script(check_script)
-            
-            if is_installed:
-                selenium_logger.info("Перехватчик успешно проверен")
+            # Перехватчик регистрируется на старте каждого документа: видит первые запросы читалки
+            # и продолжает работать после перезагрузок без повторной установки
+            state = ensure_capture_hook(self.driver)
+            
+            if state and state.get("documentStart"):
+                selenium_logger.info(f"Перехватчик работает с начала загрузки страницы (восстановлено ответов: {state.get('restored', 0)})")
+            elif state:
+                selenium_logger.info("Перехватчик установлен на загруженную страницу, следующие страницы перехватываются с начала загрузки")
             else:
                 selenium_logger.warning("Перехватчик установлен, но функции не обнаружены")
                 
@@ -279,9 +286,25 @@ class KindleAPIScraperEnhanced:
         
         :return: True если авторизация прошла успешно, иначе False
         """
-        if not self.driver or not self.email or not self.password:
+        if not self.driver or not self.email:
             selenium_logger.error("Драйвер не инициализирован или не указаны учетные данные")
             return False
+        
+        # Браузер из пула уже вошел в эту учетную запись в предыдущем задании или при прогреве
+        if self.browser_lease and self.browser_lease.logged_in:
+            selenium_logger.info("Браузер из пула уже авторизован, вход не требуется")
+            return True
+        
+        # Сначала пробуем сохраненную сессию, чтобы не проходить вход через интерфейс
+        if self.session_store and self.session_store.restore_driver(self.driver, self.email):
+            selenium_logger.info("Используем сохраненную сессию Amazon")
+            if self.browser_lease:
+                self.browser_lease.mark_logged_in()
+            return True
+        
+        if not self.password:
+            selenium_logger.error("Сохраненная сессия не найдена, а пароль не указан")
+            return False
             
         try:
             selenium_logger.info("Открываем страницу авторизации Amazon")
@@ -337,6 +360,10 @@ class KindleAPIScraperEnhanced:
                     lambda driver: "amazon.com" in driver.current_url and "ap/signin" not in driver.current_url
                 )
                 selenium_logger.info("Авторизация прошла успешно")
+                if self.session_store:
+                    self.session_store.save(self.email, cookies_from_driver(self.driver))
+                if self.browser_lease:
+                    self.browser_lease.mark_logged_in()
                 return True
                 
             except TimeoutException:
@@ -466,47 +493,69 @@ class KindleAPIScraperEnhanced:
             return False
             
         try:
-            logging.info(f"Начинаем навигацию по страницам. Максимум страниц: {self.max_pages}")
+            logging.info(f"Начинаем навигацию по страницам. Максимум страниц: {self.max_pages or 'до конца книги'}")
             
             # Устанавливаем счетчики
             self.current_page = 1
+            self.captured_requests, self.captured_images = [], []
+            if self.end_detector:
+                self.end_detector.reset()
             
             # Ожидаем загрузку первой страницы
             time.sleep(self.page_load_time)
             
+            # Счетчик команд WebDriver на страницу
+            commands = attach_command_counter(self.driver)
+            
             # Извлекаем контент с первой страницы
-            self.extract_current_page_content()
+            commands.start_page()
+            end_reached = self._check_end_of_book(self.extract_current_page_content())
+            commands.end_page()
+            
+            # Ожидание перелистывания по событиям DOM, page_load_time - верхняя граница
+            page_turn = PageTurnWaiter(self.driver, timeout=self.page_load_time)
             
-            # Перелистываем страницы до достижения максимума
-            for page_num in range(2, self.max_pages + 1):
+            # Перелистываем страницы до достижения максимума или конца книги
+            for page_num in page_numbers(2, self.max_pages):
+                if end_reached or self._reached_stop_location():
+                    break
+                
                 logging.info(f"Перелистываем на страницу {page_num}")
                 
                 # Нажимаем на область справа для перехода на следующую страницу
                 try:
                     # Нажимаем на правую часть экрана для перелистывания вперед
-                    webdriver.ActionChains(self.driver).move_to_element_with_offset(
-                        self.driver.find_element(By.TAG_NAME, 'body'),
-                        self.driver.get_window_size()['width'] - 100,
-                        self.driver.get_window_size()['height'] // 2
-                    ).click().perform()
+                    commands.start_page()
+                    page_turn.arm()
+                    self._turn_page()
                     
                     # Обновляем текущую страницу
                     self.current_page = page_num
                     
                     # Вызываем колбэк для обновления статуса
                     if self.current_page_callback:
-                        self.current_page_callback(self.current_page, self.max_pages)
+                        self.current_page_callback(self.current_page, self.max_pages or 0)
                     
-                    # Ждем загрузки страницы
-                    time.sleep(self.page_load_time)
+                    # Ждем отрисовки новой страницы
+                    page_turn.wait()
                     
                     # Извлекаем контент с текущей страницы
-                    self.extract_current_page_content()
+                    end_reached = self._check_end_of_book(self.extract_current_page_content())
+                    commands.end_page()
+                    
+                    # Тела ответов забираются сразу, пока Chrome не вытеснил их из буфера
+                    if self.network_capture:
+                        self.network_capture.drain()
+                    elif self.drain_every:
+                        self._stream_captured(page_num)
                     
                 except Exception as e:
                     logging.error(f"Ошибка при перелистывании на страницу {page_num}: {str(e)}")
                     break
             
+            logging.info(f"Ожидание перелистывания: {page_turn.summary()}")
+            log_command_summary(commands, "Навигация по страницам")
+            
             # Собираем все перехваченные запросы
             self.collect_captured_data()
             
@@ -516,104 +565,332 @@ class KindleAPIScraperEnhanced:
             logging.error(f"Ошибка при навигации по страницам: {str(e)}")
             return False
 
-    def extract_current_page_content(self):
+    def _turn_page(self):
         """
-        Извлекает текст и изображения с текущей страницы
+        Перелистывает текущую вкладку вперед нажатием на правую часть экрана
+        """
+        webdriver.ActionChains(self.driver).move_to_element_with_offset(
+            self.driver.find_element(By.TAG_NAME, 'body'),
+            self.driver.get_window_size()['width'] - 100,
+            self.driver.get_window_size()['height'] // 2
+        ).click().perform()
+
+    def navigate_pages_parallel(self):
+        """
+        Читает книгу несколькими вкладками одного браузера: каждая вкладка открывается на своем
+        диапазоне позиций, драйвер по очереди перелистывает вкладки, а страницы отрисовываются
+        одновременно. Результаты объединяются в structured_content по порядку диапазонов.
+        
+        :return: True если успешно, иначе False
         """
         if not self.driver:
+            logging.error("Драйвер не инициализирован")
+            return False
+        
+        try:
+            # Ожидаем загрузку книги и определяем количество позиций
+            time.sleep(self.page_load_time)
+            _, total = parse_location(extract_page(self.driver)["location"])
+            if not total:
+                logging.warning("Не удалось определить количество позиций книги, читаем последовательно")
+                return self.navigate_pages()
+            if self.max_pages:
+                logging.info(f"В параллельном режиме книга читается целиком, ограничение {self.max_pages} страниц не применяется")
+            
+            tabs = self._open_capture_tabs(location_ranges(1, total, self.parallel_tabs))
+            logging.info(f"Параллельное чтение: {len(tabs)} вкладок, {total} позиций")
+            self._capture_tabs(tabs)
+            
+            # Буферы перехватчика у каждой вкладки свои
+            self.captured_requests, self.captured_images = [], []
+            seen_urls = set()
+            for tab in tabs:
+                self.driver.switch_to.window(tab["handle"])
+                self._drain_tab_buffers(tab)
+                for captured, target in ((tab["requests"], self.captured_requests), (tab["images"], self.captured_images)):
+                    for item in captured:
+                        # Ответы, загруженные несколькими вкладками (например, метаданные книги), обрабатываются один раз
+                        key = (target is self.captured_images, item.get("url"))
+                        if item.get("url") and key in seen_urls:
+                            continue
+                        seen_urls.add(key)
+                        target.append(item)
+            self._close_capture_tabs(tabs)
+            
+            pages, gaps = merge_tab_pages(tabs)
+            self._store_merged_pages(pages)
+            
+            self.parallel_report = {
+                "tabs": [{"start": tab["start"], "stop": tab["stop"], "pages": len(tab["pages"]),
+                          "last_location": tab["last_location"], "reason": tab["reason"]} for tab in tabs],
+                "pages": len(pages),
+                "duplicates": sum(len(tab["pages"]) for tab in tabs) - len(pages),
+                "gaps": gaps
+            }
+            for gap in gaps:
+                logging.warning(f"Пропуск позиций {gap['from']}-{gap['to']}: вкладка {gap['tab']} остановилась ({gap['reason']})")
+            logging.info(f"Параллельное чтение завершено: {self.parallel_report}")
+            
+            # Обрабатываем перехваченные запросы всех вкладок
+            self.process_captured_images()
+            self.process_captured_json()
+            return True
+            
+        except Exception as e:
+            logging.error(f"Ошибка при параллельной навигации по страницам: {str(e)}")
+            return False
+
+    def _open_capture_tabs(self, ranges):
+        tabs = []
+        for index, (start, stop) in enumerate(ranges):
+            if index:
+                self.driver.switch_to.new_window('tab')
+                # Перехват в новой вкладке включается до загрузки читалки
+                self.setup_request_interceptor()
+            self.driver.get(location_url(self.book_url, self.asin, start))
+            tabs.append({
+                "handle": self.driver.current_window_handle,
+                "start": start,
+                "stop": stop,
+                "pages": [],
+                "requests": [],
+                "images": [],
+                "last_location": None,
+                "reason": None,
+                "done": False,
+                "retries": 0,
+                "waiter": PageTurnWaiter(self.driver, timeout=self.page_load_time),
+                "detector": EndOfBookDetector()
+            })
+        
+        # Вкладки загружаются одновременно, поэтому ждем один раз
+        time.sleep(self.page_load_time)
+        for tab in tabs:
+            self.driver.switch_to.window(tab["handle"])
+            self.setup_request_interceptor()
+        return tabs
+
+    def _capture_tabs(self, tabs):
+        active = list(tabs)
+        while active:
+            # Снимаем текущую страницу каждой вкладки и сразу перелистываем ее
+            turned = []
+            for tab in active:
+                self.driver.switch_to.window(tab["handle"])
+                if not self._capture_tab_page(tab) or tab["done"]:
+                    continue
+                if self.drain_every and not self.network_capture:
+                    self._stream_captured(len(tab["pages"]), tab)
+                try:
+                    tab["waiter"].arm()
+                    self._turn_page()
+                    turned.append(tab)
+                except Exception as e:
+                    self._retry_tab(tab, e)
+            
+            # Пока драйвер ждет одну вкладку, остальные уже отрисовывают следующую страницу
+            for tab in turned:
+                self.driver.switch_to.window(tab["handle"])
+                tab["waiter"].wait()
+            if self.network_capture:
+                self.network_capture.drain()
+            
+            active = [tab for tab in active if not tab["done"]]
+            self.current_page = sum(len(tab["pages"]) for tab in tabs)
+            if self.current_page_callback:
+                self.current_page_callback(self.current_page, 0)
+
+    def _capture_tab_page(self, tab):
+        """
+        Сохраняет текущую страницу вкладки и проверяет, дошла ли вкладка до конца своего диапазона
+        
+        :return: True если вкладку можно перелистывать дальше, False если она перезагружена
+        """
+        try:
+            page = extract_page(self.driver)
+        except Exception as e:
+            return self._retry_tab(tab, e)
+        
+        location, total = parse_location(page["location"])
+        page_text = "".join(text + "\n" for text in page["texts"])
+        end_reached = tab["detector"].observe(content=page_text, location=page["location"])
+        if not tab["detector"].repeated:
+            tab["pages"].append({
+                "location": location,
+                "text": page_text,
+                "images": [image for image in page["images"] if is_embedded_image(image["src"])]
+            })
+        if location is not None:
+            tab["last_location"] = location
+        
+        if location is not None and location >= tab["stop"]:
+            tab["done"], tab["reason"] = True, REACHED_NEXT_RANGE
+        elif location is not None and total and location >= total:
+            tab["done"], tab["reason"] = True, "end_of_book"
+        elif end_reached:
+            tab["done"], tab["reason"] = True, tab["detector"].reason
+        return True
+
+    def _retry_tab(self, tab, error, max_retries=2):
+        tab["retries"] += 1
+        if tab["retries"] > max_retries:
+            logging.error(f"Вкладка с позиции {tab['start']} остановлена после ошибок: {error}")
+            tab["done"], tab["reason"] = True, f"error: {error}"
+            return False
+        
+        # Открываем вкладку заново на последней прочитанной позиции, сохранив ее буфер перехватчика
+        logging.warning(f"Ошибка во вкладке с позиции {tab['start']}, открываем ее заново: {error}")
+        try:
+            self._drain_tab_buffers(tab)
+            self.driver.get(location_url(self.book_url, self.asin, tab["last_location"] or tab["start"]))
+            time.sleep(self.page_load_time)
+            self.setup_request_interceptor()
+        except Exception as e:
+            logging.error(f"Не удалось открыть вкладку заново: {e}")
+        return False
+
+    def _read_captured(self):
+        """
+        :return: Кортеж (перехваченные запросы, перехваченные изображения) выбранного способа перехвата
+        """
+        if self.network_capture:
+            return self.network_capture.take()
+        # Буферы страницы забираются порциями, а не одним ответом execute_script
+        requests, images, _ = self._get_capture_drain().take()
+        return requests, images
+
+    def _get_capture_drain(self):
+        if self.capture_drain is None:
+            self.capture_drain = CaptureDrain(self.driver, every=self.drain_every or 1)
+        return self.capture_drain
+
+    def _stream_captured(self, page, tab=None):
+        """
+        Забирает накопленные ответы JS перехватчика текущей вкладки (раз в drain_every страниц)
+
+        :param page: Номер обработанной страницы
+        :param tab: Вкладка параллельного чтения, в буферы которой сохраняются ответы (None - основной скрапер)
+        """
+        try:
+            requests, images = self._get_capture_drain().after_page(page)
+        except Exception as e:
+            logging.debug(f"Could not drain interceptor buffers: {e}")
             return
+        (tab["requests"] if tab else self.captured_requests).extend(requests)
+        (tab["images"] if tab else self.captured_images).extend(images)
+
+    def _drain_tab_buffers(self, tab):
+        try:
+            requests, images = self._read_captured()
+            tab["requests"].extend(requests)
+            tab["images"].extend(images)
+        except Exception as e:
+            logging.debug(f"Could not read interceptor buffers: {e}")
+
+    def _close_capture_tabs(self, tabs):
+        for tab in tabs[1:]:
+            try:
+                self.driver.switch_to.window(tab["handle"])
+                self.driver.close()
+            except Exception as e:
+                logging.debug(f"Could not close capture tab: {e}")
+        self.driver.switch_to.window(tabs[0]["handle"])
+
+    def _store_merged_pages(self, pages):
+        content = self.structured_content["result"]["content"]
+        for page_number, page in enumerate(pages, start=1):
+            content.append({"pageNumber": page_number, "location": page["location"], "text": page["text"]})
+            for image in page["images"]:
+                stored = {**image, "pageNumber": page_number}
+                if "src" in stored and not stored.get("alt"):
+                    stored["alt"] = f"Image_{page_number}_{stored['index']}"
+                self.images.append(stored)
+        self.current_page = len(pages)
+
+    def _reached_stop_location(self):
+        """
+        :return: True если читалка дошла до позиции stop_location
+        """
+        if not self.stop_location:
+            return False
+        location, _ = parse_location(self.current_location)
+        if location is not None and location >= self.stop_location:
+            logging.info(f"Достигнута позиция {location}, чтение остановлено на границе {self.stop_location}")
+            return True
+        return False
+
+    def _check_end_of_book(self, page_text):
+        """
+        Передает текст страницы детектору конца книги.
+        Страница, повторяющая предыдущую, удаляется из структурированного контента вместе с ее изображениями.
+        
+        :param page_text: Текст текущей страницы
+        :return: True если достигнут конец книги
+        """
+        if not self.end_detector:
+            return False
+        
+        end_reached = self.end_detector.observe(content=page_text, location=self.current_location)
+        if self.end_detector.repeated:
+            content = self.structured_content["result"]["content"]
+            if content and content[-1]["pageNumber"] == self.current_page:
+                content.pop()
+            self.images = [image for image in self.images if image["pageNumber"] != self.current_page]
+        
+        if end_reached:
+            logging.info(f"Достигнут конец книги на странице {self.current_page}: {self.end_detector.reason}")
+        return end_reached
+
+    def extract_current_page_content(self):
+        """
+        Извлекает текст и изображения с текущей страницы одним вызовом JavaScript
+        
+        :return: Текст страницы (пустая строка, если текст не найден)
+        """
+        page_text = ""
+        self.current_location = None
+        if not self.driver:
+            return page_text
             
         try:
             logging.info(f"Извлекаем контент со страницы {self.current_page}")
             
-            # Извлекаем текст
-            try:
-                # Пытаемся найти элементы с текстом (разные варианты селекторов)
-                content_elements = []
-                selectors = [
-                    "div.textLayer", 
-                    "div.kcrPage", 
-                    "div.bookReaderContainer", 
-                    "div.kindleReaderPage",
-                    "div.kb-viewarea"
-                ]
-                
-                for selector in selectors:
-                    try:
-                        elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                        if elements:
-                            content_elements = elements
-                            break
-                    except:
-                        continue
-                
-                # Если не нашли элементы ни по одному из селекторов, попробуем извлечь весь текст страницы
-                if not content_elements:
-                    logging.info("Не найдены стандартные элементы с текстом, извлекаем весь текст страницы")
-                    content_elements = [self.driver.find_element(By.TAG_NAME, "body")]
-                
-                # Извлекаем текст
-                page_text = ""
-                for elem in content_elements:
-                    elem_text = elem.text.strip()
-                    if elem_text:
-                        page_text += elem_text + "\n"
+            page = extract_page(self.driver)
+            self.current_location = page["location"]
+            
+            if not page["selector"]:
+                logging.info("Не найдены стандартные элементы с текстом, извлечен весь текст страницы")
+            
+            page_text = "".join(text + "\n" for text in page["texts"])
+            
+            # Добавляем текст в структурированный контент
+            if page_text:
+                self.structured_content["result"]["content"].append({
+                    "pageNumber": self.current_page,
+                    "location": parse_location(page["location"])[0],
+                    "text": page_text
+                })
                 
-                # Добавляем текст в структурированный контент
-                if page_text:
-                    self.structured_content["result"]["content"].append({
+                logging.info(f"Извлечен текст со страницы {self.current_page}: {len(page_text)} символов")
+            else:
+                logging.warning(f"Не удалось извлечь текст со страницы {self.current_page}")
+            
+            # Сохраняем информацию об изображениях, встроенных в страницу
+            for image in page["images"]:
+                if is_embedded_image(image["src"]):
+                    self.images.append({
                         "pageNumber": self.current_page,
-                        "text": page_text
+                        "index": image["index"],
+                        "src": image["src"],
+                        "alt": image["alt"] or f"Image_{self.current_page}_{image['index']}"
                     })
                     
-                    logging.info(f"Извлечен текст со страницы {self.current_page}: {len(page_text)} символов")
-                else:
-                    logging.warning(f"Не удалось извлечь текст со страницы {self.current_page}")
-                
-            except Exception as e:
-                logging.error(f"Ошибка при извлечении текста со страницы {self.current_page}: {str(e)}")
-            
-            # Извлекаем изображения
-            try:
-                # Пытаемся найти изображения на странице
-                image_selectors = [
-                    "img.kfx-image",
-                    "img.kc-kindle-image",
-                    "img.kb-image",
-                    "img:not(.ui-icon)"
-                ]
-                
-                images = []
-                for selector in image_selectors:
-                    try:
-                        found_images = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                        if found_images:
-                            images.extend(found_images)
-                    except:
-                        continue
-                
-                # Обрабатываем найденные изображения
-                for idx, img in enumerate(images):
-                    try:
-                        src = img.get_attribute("src")
-                        if src and (src.startswith("data:image") or src.startswith("blob:")):
-                            # Сохраняем информацию об изображении
-                            self.images.append({
-                                "pageNumber": self.current_page,
-                                "index": idx + 1,
-                                "src": src,
-                                "alt": img.get_attribute("alt") or f"Image_{self.current_page}_{idx+1}"
-                            })
-                            
-                            logging.info(f"Найдено изображение на странице {self.current_page}: {idx+1}")
-                    except Exception as img_err:
-                        logging.error(f"Ошибка при обработке изображения {idx+1} на странице {self.current_page}: {str(img_err)}")
-                
-            except Exception as e:
-                logging.error(f"Ошибка при извлечении изображений со страницы {self.current_page}: {str(e)}")
+                    logging.info(f"Найдено изображение на странице {self.current_page}: {image['index']}")
             
         except Exception as e:
             logging.error(f"Ошибка при извлечении контента со страницы {self.current_page}: {str(e)}")
+        
+        return page_text
 
     def collect_captured_data(self):
         """
@@ -625,12 +902,15 @@ class KindleAPIScraperEnhanced:
         try:
             logging.info("Собираем перехваченные данные")
             
-            # Получаем перехваченные запросы
-            self.captured_requests = self.driver.execute_script("return window.getCapturedRequests ? window.getCapturedRequests() : [];")
+            # Получаем оставшиеся перехваченные запросы и изображения (часть уже забрана по ходу чтения)
+            requests, images = self._read_captured()
+            self.captured_requests.extend(requests)
+            self.captured_images.extend(images)
             logging.info(f"Получено перехваченных запросов: {len(self.captured_requests)}")
-            
-            # Получаем перехваченные изображения
-            self.captured_images = self.driver.execute_script("return window.getCapturedImages ? window.getCapturedImages() : [];")
+            if self.network_capture:
+                logging.info(f"Перехват через CDP: {self.network_capture.stats}")
+            elif self.capture_drain:
+                logging.info(f"Сбор ответов перехватчика: {self.capture_drain.summary()}")
             logging.info(f"Получено перехваченных изображений: {len(self.captured_images)}")
             
             # Обрабатываем и сохраняем изображения
@@ -888,7 +1168,12 @@ class KindleAPIScraperEnhanced:
         Закрывает браузер и освобождает ресурсы
         """
         try:
-            if self.driver:
+            if self.driver and self.browser_lease:
+                # Браузер возвращает в пул владелец аренды
+                logging.info("Освобождаем браузер из пула")
+                self.browser_lease.pages += self.current_page
+                self.driver = None
+            elif self.driver:
                 logging.info("Закрываем браузер")
                 self.driver.quit()
                 self.driver = None
@@ -896,6 +1181,35 @@ class KindleAPIScraperEnhanced:
         except Exception as e:
             logging.error(f"Ошибка при закрытии браузера: {str(e)}")
 
+    def handoff_to_http(self, **scraper_kwargs):
+        """
+        Передает авторизованную сессию браузера HTTP-скраперу, закрывает браузер
+        и загружает API эндпоинты книги через requests
+        
+        :param scraper_kwargs: Дополнительные параметры KindleAPIScraper
+        :return: True если успешно, иначе False
+        """
+        if not self.driver:
+            logging.error("Драйвер не инициализирован")
+            return False
+        
+        logging.info("Передаем сессию браузера HTTP-скраперу")
+        http_scraper = http_scraper_from_browser(
+            self.driver,
+            email=self.email,
+            book_url=self.book_url,
+            output_file=self.output_file,
+            **scraper_kwargs
+        )
+        
+        # Браузер больше не нужен: остальные запросы идут по HTTP
+        self.cleanup()
+        
+        success = http_scraper.run()
+        self.structured_content = http_scraper.structured_content
+        logging.info(f"HTTP-загрузка завершена: {'успешно' if success else 'с ошибками'}")
+        return success
+
     def run(self):
         """
         Запускает весь процесс извлечения
@@ -911,6 +1225,10 @@ class KindleAPIScraperEnhanced:
             if not self.open_kindle_cloud_reader():
                 self.cleanup()
                 return False
+            
+            # Браузер нужен только для входа, контент загружается по HTTP
+            if self.http_handoff:
+                return self.handoff_to_http()
                 
             # Открываем книгу
             if not self.open_book():
@@ -918,7 +1236,8 @@ class KindleAPIScraperEnhanced:
                 return False
                 
             # Перелистываем страницы и собираем контент
-            if not self.navigate_pages():
+            navigate = self.navigate_pages_parallel if self.parallel_tabs > 1 else self.navigate_pages
+            if not navigate():
                 logging.warning("Произошла ошибка при навигации по страницам")
                 
             # Сохраняем извлеченный текст
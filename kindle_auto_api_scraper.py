@@ -17,8 +17,12 @@ from selenium.webdriver.firefox.service import Service as FirefoxService
 from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from webdriver_manager.firefox import GeckoDriverManager
-from webdriver_manager.chrome import ChromeDriverManager
+from session_store import cookies_from_driver, get_default_store
+from session_bridge import http_scraper_from_browser
+from browser_profile import LEAN_WINDOW_SIZE, lean_firefox_options, lean_chrome_options
+from driver_resolver import resolve_driver
+from capture_hook import ensure_capture_hook, install_capture_hook
+from page_watch import PageChangeWatcher
 
 # Импортируем расширенное логирование
 from debug_utils import (
@@ -48,7 +52,7 @@ logging.getLogger('').addHandler(console_handler)
 selenium_logger.info("Модуль kindle_auto_api_scraper инициализирован")
 
 class KindleAutoAPIScraper:
-    def __init__(self, email=None, password=None, book_url=None, output_file="kindle_auto_book.txt", page_load_time=5, max_wait_time=30):
+    def __init__(self, email=None, password=None, book_url=None, output_file="kindle_auto_book.txt", page_load_time=5, max_wait_time=30, session_store=None, http_handoff=False, lean_browser=False, browser_lease=None, page_watch=True):
         """
         Инициализация автоматического API скрапера для Kindle Cloud Reader
         
@@ -58,6 +62,11 @@ class KindleAutoAPIScraper:
         :param output_file: Имя файла для сохранения текста
         :param page_load_time: Время ожидания загрузки страницы в секундах
         :param max_wait_time: Максимальное время ожидания для операций Selenium
+        :param session_store: Зашифрованное хранилище авторизованных сессий (None - общее хранилище, False - всегда полный вход)
+        :param http_handoff: После входа закрыть браузер и загружать API эндпоинты книги через HTTP
+        :param lean_browser: Облегченный профиль браузера: без окна, анимаций, изображений и сторонних хостов (см. browser_profile)
+        :param browser_lease: Браузер из пула (browser_pool.BrowserLease): используется вместо запуска нового и не закрывается по завершении
+        :param page_watch: Обнаруживать перелистывание по событиям браузера (page_watch.PageChangeWatcher); False - опрос каждые 0.5 сек
         """
         self.email = email
         self.password = password
@@ -65,11 +74,20 @@ class KindleAutoAPIScraper:
         self.output_file = output_file
         self.page_load_time = page_load_time
         self.max_wait_time = max_wait_time
+        self.session_store = get_default_store() if session_store is None else session_store
+        self.http_handoff = http_handoff
+        self.lean_browser = lean_browser
+        self.browser_lease = browser_lease
+        self.page_watch = page_watch
+        self.page_watch_stats = {}
         self.driver = None
         self.extracted_text = ""
         self.current_page = 0
         self.total_pages = 0
         self.current_page_callback = None
+        self.traffic_stats = {}
+        # Порядковый номер следующего непрочитанного сетевого запроса в буфере перехватчика
+        self._network_cursor = 0
         self.asin = self._extract_asin(book_url) if book_url else None
         self.structured_content = {
             "type": "Success",
@@ -122,20 +140,33 @@ class KindleAutoAPIScraper:
         """
         Настройка и запуск веб-драйвера с поддержкой различных браузеров
         """
-        try:
-            # Пробуем сначала использовать Firefox напрямую
-            return self._setup_direct_browser()
-        except Exception as direct_error:
-            selenium_logger.warning(f"Не удалось настроить браузер напрямую: {str(direct_error)}")
-            selenium_logger.info("Пробуем установить браузерный драйвер...")
-            
-            # Если прямой запуск не удался, пробуем установку драйвера
+        if self.browser_lease:
+            selenium_logger.info("Используем браузер из пула")
+            self.driver = self.browser_lease.driver
+            started = True
+        else:
             try:
-                return self._setup_managed_browser()
-            except Exception as managed_error:
-                selenium_logger.error(f"Не удалось установить и настроить драйвер: {str(managed_error)}")
-                selenium_logger.error(f"Трассировка: {traceback.format_exc()}")
-                return False
+                # Пробуем сначала использовать Firefox напрямую
+                started = self._setup_direct_browser()
+            except Exception as direct_error:
+                selenium_logger.warning(f"Не удалось настроить браузер напрямую: {str(direct_error)}")
+                selenium_logger.info("Пробуем установить браузерный драйвер...")
+                
+                # Если прямой запуск не удался, пробуем установку драйвера
+                try:
+                    started = self._setup_managed_browser()
+                except Exception as managed_error:
+                    selenium_logger.error(f"Не удалось установить и настроить драйвер: {str(managed_error)}")
+                    selenium_logger.error(f"Трассировка: {traceback.format_exc()}")
+                    return False
+        
+        # Перехватчик регистрируется до первой загрузки страницы, чтобы видеть первые запросы читалки
+        if started and self.driver:
+            install_capture_hook(self.driver)
+        return started
+    
+    def _window_size(self):
+        return LEAN_WINDOW_SIZE if self.lean_browser else (1366, 768)
     
     def _setup_direct_browser(self):
         """
@@ -171,6 +202,8 @@ class KindleAutoAPIScraper:
             # Минимальные настройки для стабильного запуска
             options.set_preference("browser.cache.disk.enable", False)
             options.set_preference("browser.cache.memory.enable", False)
+            if self.lean_browser:
+                lean_firefox_options(options)
             
             # Создаём драйвер, возможно с указанием пути к драйверу
             geckodriver_path = os.path.join(os.getcwd(), "geckodriver")
@@ -181,7 +214,7 @@ class KindleAutoAPIScraper:
             else:
                 self.driver = webdriver.Firefox(options=options)
                 
-            self.driver.set_window_size(1366, 768)
+            self.driver.set_window_size(*self._window_size())
             selenium_logger.info("Firefox запущен успешно с локальным драйвером")
             
             return True
@@ -214,7 +247,10 @@ class KindleAutoAPIScraper:
                     options.binary_location = chrome_binary
                 
                 # Минимальные опции для стабильного запуска
-                options.add_argument("--window-size=1366,768")
+                if self.lean_browser:
+                    lean_chrome_options(options)
+                else:
+                    options.add_argument("--window-size=1366,768")
                 options.add_argument("--disable-notifications")
                 
                 # Отключаем опции перехвата, которые вызывают ошибку
@@ -251,11 +287,13 @@ class KindleAutoAPIScraper:
             # Минимальные настройки для стабильного запуска
             options.set_preference("browser.cache.disk.enable", False)
             options.set_preference("browser.cache.memory.enable", False)
+            if self.lean_browser:
+                lean_firefox_options(options)
             
-            # Устанавливаем без параметра timeout (который вызывает ошибку в вашей версии)
-            service = FirefoxService(GeckoDriverManager().install())
+            # Драйвер из закрепленного кэша, загрузка только если разрешена (KINDLE_ALLOW_DRIVER_DOWNLOAD)
+            service = FirefoxService(resolve_driver("geckodriver"))
             self.driver = webdriver.Firefox(service=service, options=options)
-            self.driver.set_window_size(1366, 768)
+            self.driver.set_window_size(*self._window_size())
             
             selenium_logger.info("Firefox успешно запущен с установленным драйвером")
             return True
@@ -266,15 +304,18 @@ class KindleAutoAPIScraper:
             try:
                 selenium_logger.info("Устанавливаем chromedriver")
                 options = ChromeOptions()
-                options.add_argument("--window-size=1366,768")
+                if self.lean_browser:
+                    lean_chrome_options(options)
+                else:
+                    options.add_argument("--window-size=1366,768")
                 options.add_argument("--disable-notifications")
                 
                 # Отключаем опции, которые вызывают ошибку
                 # options.add_argument("--auto-open-devtools-for-tabs")
                 # options.add_experimental_option("perfLoggingPrefs", {...})
                 
-                # Устанавливаем без параметра timeout (который вызывает ошибку в вашей версии)
-                service = ChromeService(ChromeDriverManager().install())
+                # Драйвер из закрепленного кэша, загрузка только если разрешена (KINDLE_ALLOW_DRIVER_DOWNLOAD)
+                service = ChromeService(resolve_driver("chromedriver"))
                 self.driver = webdriver.Chrome(service=service, options=options)
                 
                 selenium_logger.info("Chrome успешно запущен с установленным драйвером")
@@ -290,6 +331,18 @@ class KindleAutoAPIScraper:
         
         :return: True если авторизация прошла успешно, иначе False
         """
+        # Браузер из пула уже вошел в эту учетную запись в предыдущем задании или при прогреве
+        if self.browser_lease and self.browser_lease.logged_in:
+            selenium_logger.info("Браузер из пула уже авторизован, вход не требуется")
+            return True
+        
+        # Сначала пробуем сохраненную сессию, чтобы не проходить вход через интерфейс
+        if self.email and self.session_store and self.session_store.restore_driver(self.driver, self.email):
+            selenium_logger.info("Используем сохраненную сессию Amazon")
+            if self.browser_lease:
+                self.browser_lease.mark_logged_in()
+            return True
+        
         if not self.email or not self.password:
             selenium_logger.warning("Email или пароль не указаны, авторизация невозможна")
             return False
@@ -349,6 +402,10 @@ class KindleAutoAPIScraper:
                 log_page_content(self.driver, "after_login_page")
                 
                 selenium_logger.info("Авторизация прошла успешно")
+                if self.session_store:
+                    self.session_store.save(self.email, cookies_from_driver(self.driver))
+                if self.browser_lease:
+                    self.browser_lease.mark_logged_in()
                 return True
                 
             except TimeoutException:
@@ -436,7 +493,7 @@ class KindleAutoAPIScraper:
                     log_screenshot(self.driver, "amazon_login_screen")
                     
                     # Попытка авторизации
-                    if self.email and self.password:
+                    if self.email and (self.password or self.session_store):
                         selenium_logger.info("Выполняем автоматическую авторизацию")
                         return self.login()
                     else:
@@ -497,69 +554,32 @@ class KindleAutoAPIScraper:
             selenium_logger.error(f"Трассировка: {traceback.format_exc()}")
             return False
 
-    def capture_network_traffic(self):
+    def capture_network_traffic(self, pages=5):
         """
-        Перехватываем сетевой трафик для получения API-ответов
+        Перехватываем сетевой трафик для получения API-ответов.
+        Тела ответов записывает перехватчик читалки (extensions/kindle_capture/hook.js) в момент,
+        когда их получает сама читалка, поэтому каждый ответ загружается один раз.
         
-        :return: Словарь с перехваченными API-ответами
+        :param pages: Количество страниц для перелистывания
+        :return: Список перехваченных API-ответов ({url, data})
         """
         captured_data = []
         
         try:
             selenium_logger.info("Начинаем перехват сетевого трафика")
             
-            # Включаем режим разработчика в Selenium (открываем DevTools)
-            self.driver.execute_script("window.open()")
-            self.driver.switch_to.window(self.driver.window_handles[1])
-            self.driver.get("about:blank")
-            
-            # Запускаем JavaScript для перехвата запросов
-            capture_script = """
-            let capturedData = [];
-            
-            // Создаем новый объект Performance Observer
-            const observer = new PerformanceObserver((list) => {
-                list.getEntries().forEach((entry) => {
-                    // Фильтруем только запросы к API Kindle
-                    if (entry.initiatorType === 'xmlhttprequest' && 
-                        (entry.name.includes('read.amazon.com/api') || 
-                         entry.name.includes('amazon.com/service'))) {
-                        console.log('Captured API request:', entry.name);
-                        
-                        // Отправляем запрос к URL для получения содержимого
-                        fetch(entry.name)
-                            .then(response => response.json())
-                            .then(data => {
-                                capturedData.push({
-                                    url: entry.name,
-                                    data: data
-                                });
-                                console.log('API response captured:', entry.name);
-                            })
-                            .catch(error => {
-                                console.error('Error fetching API data:', error);
-                            });
-                    }
-                });
-            });
-            
-            // Начинаем наблюдение за PerformanceEntry типа resource
-            observer.observe({ entryTypes: ['resource'] });
-            
-            // Функция для получения собранных данных
-            window.getCapturedData = function() {
-                return capturedData;
-            };
-            """
-            
-            self.driver.execute_script(capture_script)
-            
-            # Возвращаемся к окну с книгой
+            # Перехватчик работает в окне с книгой: зарегистрирован при запуске браузера
+            # или устанавливается на уже загруженную страницу
             self.driver.switch_to.window(self.driver.window_handles[0])
+            state = ensure_capture_hook(self.driver)
+            if state and not state.get("documentStart"):
+                selenium_logger.warning("Перехватчик установлен после загрузки читалки: ответы, полученные раньше, не будут записаны")
             
             # Перелистываем несколько страниц для получения контента
             selenium_logger.info("Перелистываем страницы для получения контента")
-            for i in range(5):  # Перелистываем 5 страниц
+            traffic = self._read_traffic()
+            page_traffic = []
+            for i in range(pages):
                 # Нажимаем на правую часть экрана для перелистывания вперед
                 try:
                     webdriver.ActionChains(self.driver).move_to_element_with_offset(
@@ -573,23 +593,31 @@ class KindleAutoAPIScraper:
                     self.current_page = i + 1
                     
                     if self.current_page_callback:
-                        self.current_page_callback(self.current_page, 5)
-                        
+                        self.current_page_callback(self.current_page, pages)
+                    
+                    # Трафик, загруженный читалкой для этой страницы
+                    previous, traffic = traffic, self._read_traffic()
+                    page_traffic.append({
+                        "page": i + 1,
+                        "bytes": traffic["bytes"] - previous["bytes"],
+                        "captured_bytes": traffic["capturedBytes"] - previous["capturedBytes"]
+                    })
+                    
                     selenium_logger.info(f"Перелистана страница {i+1}")
                     
                 except Exception as e:
                     selenium_logger.error(f"Ошибка при перелистывании страницы: {str(e)}")
-                    
-            # Переходим обратно к окну с DevTools
-            self.driver.switch_to.window(self.driver.window_handles[1])
             
             # Получаем собранные данные
-            captured_data = self.driver.execute_script("return window.getCapturedData();")
+            captured_requests = self.driver.execute_script("return window.getCapturedRequests ? window.getCapturedRequests() : [];") or []
+            captured_data = [{"url": item["url"], "data": item["data"]} for item in captured_requests if item.get("type") == "json"]
             
             selenium_logger.info(f"Перехвачено {len(captured_data)} API-ответов")
-            
-            # Возвращаемся к окну с книгой
-            self.driver.switch_to.window(self.driver.window_handles[0])
+            self.traffic_stats = self._summarize_traffic(page_traffic)
+            selenium_logger.info(
+                f"Трафик на страницу: {self.traffic_stats['bytes_per_page']} байт, "
+                f"оценка с повторной загрузкой ответов (не измерена): {self.traffic_stats['estimated_refetch_bytes_per_page']} байт"
+            )
             
             return captured_data
             
@@ -598,6 +626,35 @@ class KindleAutoAPIScraper:
             selenium_logger.error(f"Трассировка: {traceback.format_exc()}")
             return []
 
+    def _read_traffic(self):
+        """
+        :return: Счетчики трафика текущей страницы ({requests, bytes, capturedResponses, capturedBytes})
+        """
+        traffic = self.driver.execute_script("return window.getKindleTraffic ? window.getKindleTraffic() : null;")
+        return traffic or {"requests": 0, "bytes": 0, "capturedResponses": 0, "capturedBytes": 0}
+
+    @staticmethod
+    def _summarize_traffic(page_traffic):
+        """
+        Считает измеренный трафик на страницу и оценку для прежнего способа, который загружал тело
+        каждого API-ответа повторно. Прежний способ не измеряется: оценка - измеренный трафик плюс
+        объем перехваченных тел, которые он загрузил бы второй раз.
+        
+        :param page_traffic: Трафик по страницам ({page, bytes, captured_bytes})
+        :return: Словарь со средним трафиком на страницу (bytes_per_page) и оценкой (estimated_refetch_bytes_per_page)
+        """
+        pages = len(page_traffic)
+        network_bytes = sum(page["bytes"] for page in page_traffic)
+        captured_bytes = sum(page["captured_bytes"] for page in page_traffic)
+        return {
+            "pages": pages,
+            "bytes": network_bytes,
+            "captured_bytes": captured_bytes,
+            "bytes_per_page": network_bytes // pages if pages else 0,
+            "estimated_refetch_bytes_per_page": (network_bytes + captured_bytes) // pages if pages else 0,
+            "per_page": page_traffic
+        }
+
     @log_function_call(parsing_logger)
     @log_function_call(selenium_logger)
     def manual_screenshots_mode(self):
@@ -623,7 +680,6 @@ class KindleAutoAPIScraper:
             current_page = 1
             max_pages = 300  # Безопасное ограничение
             last_page_content_hash = ""
-            last_network_requests = []
             
             # Делаем скриншот первой страницы
             screenshot_path = os.path.join(screenshots_dir, f"page_{current_page:04d}.png")
@@ -635,8 +691,13 @@ class KindleAutoAPIScraper:
             page_content = self._get_content_for_comparison()
             last_page_content_hash = self._hash_content(page_content)
             
-            # Устанавливаем JavaScript для мониторинга сетевых запросов
-            self._setup_network_monitor()
+            # Наблюдатель изменений в браузере; без него - опрос содержимого и сетевых запросов
+            watcher = self._setup_page_watcher() if self.page_watch else None
+            if watcher is None:
+                # Устанавливаем JavaScript для мониторинга сетевых запросов
+                self._setup_network_monitor()
+                # Запросы уже снятой первой страницы не считаются перелистыванием
+                self._get_network_requests()
             
             # Выводим сообщение для пользователя
             print("\n" + "="*80)
@@ -662,6 +723,19 @@ class KindleAutoAPIScraper:
                         is_changed = False
                         change_type = None
                         
+                        if watcher is not None:
+                            # Браузер отвечает, когда страница изменилась и изображения загружены, или по таймауту
+                            if watcher.wait():
+                                current_page += 1
+                                self.current_page = current_page
+                                if self.current_page_callback:
+                                    self.current_page_callback(current_page, max_pages)
+                                screenshot_path = os.path.join(screenshots_dir, f"page_{current_page:04d}.png")
+                                selenium_logger.info(f"Обнаружено изменение страницы (event)! Делаем скриншот страницы {current_page}")
+                                self.driver.save_screenshot(screenshot_path)
+                                print(f"✓ Сохранен скриншот страницы {current_page}: {screenshot_path}")
+                            continue
+                        
                         # 1. Проверка изменения содержимого страницы
                         current_content = self._get_content_for_comparison()
                         current_content_hash = self._hash_content(current_content)
@@ -671,9 +745,8 @@ class KindleAutoAPIScraper:
                             change_type = "content"
                         
                         # 2. Проверка новых сетевых запросов
-                        current_network_requests = self._get_network_requests()
-                        if current_network_requests and current_network_requests != last_network_requests:
-                            new_requests = [req for req in current_network_requests if req not in last_network_requests]
+                        new_requests = self._get_network_requests()
+                        if new_requests:
                             relevant_requests = [req for req in new_requests 
                                                if 'api' in req.lower() or 
                                                   'content' in req.lower() or 
@@ -691,6 +764,7 @@ class KindleAutoAPIScraper:
                             
                             # Увеличиваем счетчик страниц
                             current_page += 1
+                            self.current_page = current_page
                             
                             # Обновляем callback при наличии
                             if self.current_page_callback:
@@ -706,7 +780,6 @@ class KindleAutoAPIScraper:
                             
                             # Обновляем хеш последней страницы
                             last_page_content_hash = current_content_hash
-                            last_network_requests = current_network_requests
                             
                         # Короткая пауза между проверками
                         time.sleep(0.5)
@@ -718,6 +791,9 @@ class KindleAutoAPIScraper:
             except KeyboardInterrupt:
                 selenium_logger.info("Получен сигнал прерывания, завершаем режим автоматического скриншота")
             
+            if watcher is not None:
+                self.page_watch_stats = watcher.log_summary()
+            
             selenium_logger.info(f"Режим автоматического обнаружения перелистывания завершен. Создано {current_page} скриншотов.")
             selenium_logger.info(f"Скриншоты сохранены в директории: {screenshots_dir}")
             return True
@@ -727,38 +803,30 @@ class KindleAutoAPIScraper:
             selenium_logger.error(f"Трассировка: {traceback.format_exc()}")
             return False
     
+    def _setup_page_watcher(self):
+        """
+        Устанавливает наблюдатель изменений страницы (page_watch.PageChangeWatcher)
+        
+        :return: Экземпляр PageChangeWatcher или None, если установить не удалось
+        """
+        try:
+            watcher = PageChangeWatcher(self.driver)
+            watcher.install()
+            selenium_logger.info("Установлен наблюдатель изменений страницы")
+            return watcher
+        except Exception as e:
+            selenium_logger.error(f"Не удалось установить наблюдатель изменений страницы, используется опрос: {str(e)}")
+            return None
+    
     def _setup_network_monitor(self):
         """
-        Устанавливает JavaScript-скрипт для мониторинга сетевых запросов
+        Устанавливает скрипт мониторинга сетевых запросов (extensions/kindle_capture/hook.js)
         """
         try:
-            monitor_script = """
-            // Создаем массив для хранения запросов
-            window.capturedRequests = window.capturedRequests || [];
-            
-            // Создаем новый объект Performance Observer
-            if (!window.kindleNetworkObserver) {
-                window.kindleNetworkObserver = new PerformanceObserver((list) => {
-                    list.getEntries().forEach((entry) => {
-                        // Фильтруем запросы API
-                        if (entry.initiatorType === 'xmlhttprequest' || entry.initiatorType === 'fetch') {
-                            // Добавляем URL в список запросов
-                            window.capturedRequests.push(entry.name);
-                        }
-                    });
-                });
-                
-                // Начинаем наблюдение за resource entries
-                window.kindleNetworkObserver.observe({entryTypes: ['resource']});
-            }
-            
-            // Функция для получения списка запросов
-            window.getKindleNetworkRequests = function() {
-                return window.capturedRequests;
-            };
-            """
-            
-            self.driver.execute_script(monitor_script)
+            # Тот же перехватчик, что у улучшенного скрапера: регистрируется на старте каждого документа,
+            # поэтому после перезагрузки читалки мониторинг продолжается без повторной установки
+            ensure_capture_hook(self.driver)
+            self._network_cursor = 0
             selenium_logger.info("Установлен скрипт мониторинга сетевых запросов")
             
         except Exception as e:
@@ -766,13 +834,21 @@ class KindleAutoAPIScraper:
     
     def _get_network_requests(self):
         """
-        Получает список сетевых запросов из JavaScript
+        Получает сетевые запросы, появившиеся после предыдущего вызова.
+        Перехватчик отдает только записи после курсора и удаляет подтвержденные,
+        поэтому объем данных за опрос не зависит от длительности сессии.
         
-        :return: Список URL запросов
+        :return: Список новых URL запросов
         """
         try:
-            requests = self.driver.execute_script("return window.getKindleNetworkRequests ? window.getKindleNetworkRequests() : [];")
-            return requests
+            result = self.driver.execute_script(
+                "return window.getKindleNetworkRequestsSince ? window.getKindleNetworkRequestsSince(arguments[0]) : null;",
+                self._network_cursor
+            )
+            if not result:
+                return []
+            self._network_cursor = result["next"]
+            return result["entries"]
         except Exception as e:
             selenium_logger.error(f"Ошибка при получении сетевых запросов: {str(e)}")
             return []
@@ -904,6 +980,7 @@ class KindleAutoAPIScraper:
                     
                     # Увеличиваем счетчик текущей страницы
                     current_page += 1
+                    self.current_page = current_page
                     
                     # Обновляем callback при наличии
                     if self.current_page_callback:
@@ -1258,7 +1335,12 @@ class KindleAutoAPIScraper:
         :param ask_confirmation: Если True, запрашивает подтверждение перед закрытием браузера
         """
         try:
-            if self.driver:
+            if self.driver and self.browser_lease:
+                # Браузер возвращает в пул владелец аренды, подтверждение не нужно
+                selenium_logger.info("Освобождаем браузер из пула")
+                self.browser_lease.pages += self.current_page
+                self.driver = None
+            elif self.driver:
                 # Сохраняем финальный скриншот для отладки
                 try:
                     log_screenshot(self.driver, "final_state_before_quit")
@@ -1344,6 +1426,36 @@ class KindleAutoAPIScraper:
             selenium_logger.error(f"Ошибка при создании отчета окружения: {str(e)}")
             return {"error": str(e)}
 
+    @log_function_call(selenium_logger)
+    def handoff_to_http(self, **scraper_kwargs):
+        """
+        Передает авторизованную сессию браузера HTTP-скраперу, закрывает браузер
+        и загружает API эндпоинты книги через requests
+        
+        :param scraper_kwargs: Дополнительные параметры KindleAPIScraper
+        :return: True если успешно, иначе False
+        """
+        if not self.driver:
+            selenium_logger.error("Драйвер не инициализирован")
+            return False
+        
+        selenium_logger.info("Передаем сессию браузера HTTP-скраперу")
+        http_scraper = http_scraper_from_browser(
+            self.driver,
+            email=self.email,
+            book_url=self.book_url,
+            output_file=self.output_file,
+            **scraper_kwargs
+        )
+        
+        # Браузер больше не нужен: остальные запросы идут по HTTP
+        self.cleanup(ask_confirmation=False)
+        
+        success = http_scraper.run()
+        self.structured_content = http_scraper.structured_content
+        api_logger.info(f"HTTP-загрузка завершена: {'успешно' if success else 'с ошибками'}")
+        return success
+
     @log_function_call(selenium_logger)
     def run(self):
         """
@@ -1370,6 +1482,10 @@ class KindleAutoAPIScraper:
                 selenium_logger.error("Не удалось открыть Kindle Cloud Reader")
                 self.cleanup()
                 return False
+            
+            # Браузер нужен только для входа, контент загружается по HTTP
+            if self.http_handoff:
+                return self.handoff_to_http()
                 
             # Открываем книгу
             selenium_logger.info(f"Открываем книгу, ASIN: {self.asin}")
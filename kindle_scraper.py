@@ -10,7 +10,14 @@ from selenium.webdriver.firefox.options import Options as FirefoxOptions
 from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.firefox import GeckoDriverManager
+from end_of_book import EndOfBookDetector, page_numbers
+from session_store import cookies_from_driver, get_default_store
+from page_turn import PageTurnWaiter
+from page_extractor import extract_page, attach_command_counter, log_command_summary
+from selector_resolver import SelectorResolver
+from page_writer import BackgroundPageWriter
+from browser_profile import LEAN_WINDOW_SIZE, lean_firefox_options
+from driver_resolver import resolve_driver
 
 # Настройка логирования
 logging.basicConfig(
@@ -23,7 +30,7 @@ logging.basicConfig(
 )
 
 class KindleScraper:
-    def __init__(self, email=None, password=None, book_url=None, output_file="kindle_book.txt", pages_to_read=50, page_load_time=5):
+    def __init__(self, email=None, password=None, book_url=None, output_file="kindle_book.txt", pages_to_read=50, page_load_time=5, detect_end=False, session_store=None, selector_resolver=None, lean_browser=False, browser_lease=None, writer_queue_size=8):
         """
         Инициализация скрапера для Kindle Cloud Reader
         
@@ -31,8 +38,14 @@ class KindleScraper:
         :param password: Пароль для входа в Amazon
         :param book_url: URL книги в Kindle Cloud Reader
         :param output_file: Имя файла для сохранения текста
-        :param pages_to_read: Количество страниц для чтения
+        :param pages_to_read: Количество страниц для чтения (None или 0 - до конца книги)
         :param page_load_time: Время ожидания загрузки страницы в секундах
+        :param detect_end: Останавливать чтение при обнаружении конца книги (включается автоматически без pages_to_read)
+        :param session_store: Зашифрованное хранилище авторизованных сессий (None - общее хранилище, False - всегда ручной вход)
+        :param selector_resolver: Выбор селектора текста по версии читалки (None - кэш по умолчанию, False - фиксированный порядок селекторов)
+        :param lean_browser: Облегченный профиль браузера без окна (см. browser_profile); ручной вход в нем невозможен, нужна сохраненная сессия
+        :param browser_lease: Браузер из пула (browser_pool.BrowserLease): используется вместо запуска нового и не закрывается по завершении
+        :param writer_queue_size: Сколько извлеченных страниц может ждать записи в файл, пока браузер перелистывает дальше
         """
         self.email = email or os.environ.get("AMAZON_EMAIL")
         self.password = password or os.environ.get("AMAZON_PASSWORD")
@@ -40,10 +53,22 @@ class KindleScraper:
         self.output_file = output_file
         self.pages_to_read = pages_to_read
         self.page_load_time = page_load_time
+        self.end_detector = EndOfBookDetector() if detect_end or not pages_to_read else None
+        self.session_store = get_default_store() if session_store is None else session_store
+        self.selector_resolver = SelectorResolver() if selector_resolver is None else selector_resolver
+        self.lean_browser = lean_browser
+        self.browser_lease = browser_lease
+        self.writer_queue_size = writer_queue_size
+        self.writer_stats = {}
         self.driver = None
         
     def setup_driver(self):
         """Настройка и запуск веб-драйвера Firefox"""
+        if self.browser_lease:
+            logging.info("Используется браузер из пула")
+            self.driver = self.browser_lease.driver
+            return True
+        
         try:
             logging.info("Настройка веб-драйвера Firefox...")
             
@@ -54,19 +79,25 @@ class KindleScraper:
             options.set_preference("browser.download.dir", os.getcwd())
             options.set_preference("browser.helperApps.neverAsk.saveToDisk", "application/pdf")
             
-            # Отключаем headless режим, чтобы видеть процесс
-            # options.add_argument("--headless")
+            # Без облегченного профиля браузер виден, чтобы пользователь мог войти и открыть книгу
+            if self.lean_browser:
+                lean_firefox_options(options)
             
-            # Используем geckodriver через webdriver_manager
-            service = FirefoxService(GeckoDriverManager().install())
+            # geckodriver из закрепленного локального кэша (без обращения к сети)
+            service = FirefoxService(resolve_driver("geckodriver"))
             
             # Запускаем Firefox с нашими опциями
             self.driver = webdriver.Firefox(service=service, options=options)
             
             # Настраиваем размер окна и таймауты
-            self.driver.maximize_window()
+            if self.lean_browser:
+                self.driver.set_window_size(*LEAN_WINDOW_SIZE)
+            else:
+                self.driver.maximize_window()
             self.driver.set_page_load_timeout(60)
-            self.driver.implicitly_wait(20)
+            # Без неявного ожидания: каждый ненайденный селектор иначе блокировал бы на весь таймаут,
+            # отрисовку страницы ждут явно (SelectorResolver.probe, PageTurnWaiter)
+            self.driver.implicitly_wait(0)
             
             logging.info("Веб-драйвер Firefox успешно настроен")
             return True
@@ -77,6 +108,22 @@ class KindleScraper:
     def login(self):
         """Ожидание ручного входа пользователя"""
         try:
+            # Браузер из пула уже вошел в эту учетную запись в предыдущем задании
+            if self.browser_lease and self.browser_lease.logged_in:
+                logging.info("Браузер из пула уже авторизован, вход не требуется")
+                return True
+            
+            # Сохраненная сессия избавляет от ожидания ручного входа
+            if self.email and self.session_store and self.session_store.restore_driver(self.driver, self.email):
+                logging.info("Используется сохраненная сессия, ручной вход не требуется")
+                if self.browser_lease:
+                    self.browser_lease.mark_logged_in()
+                return True
+            
+            if self.lean_browser:
+                logging.error("Сохраненная сессия недействительна, а ручной вход в облегченном профиле без окна невозможен")
+                return False
+            
             logging.info("Открытие страницы Kindle Cloud Reader...")
             self.driver.get("https://read.amazon.com/")
             
@@ -96,6 +143,10 @@ class KindleScraper:
             # Проверяем, что мы находимся на странице Kindle Cloud Reader
             if "read.amazon.com" in self.driver.current_url:
                 logging.info("Пользователь успешно вошел и открыл Kindle Cloud Reader")
+                if self.email and self.session_store:
+                    self.session_store.save(self.email, cookies_from_driver(self.driver))
+                if self.browser_lease:
+                    self.browser_lease.mark_logged_in()
                 return True
             else:
                 logging.error("Не похоже, что мы находимся на странице Kindle Cloud Reader")
@@ -107,6 +158,15 @@ class KindleScraper:
     def open_book(self):
         """Ожидание, пока пользователь откроет книгу вручную"""
         try:
+            # В облегченном профиле без окна книга открывается по ссылке
+            if self.lean_browser:
+                if not self.book_url:
+                    logging.error("Для облегченного профиля без окна нужен URL книги")
+                    return False
+                logging.info(f"Открытие книги {self.book_url}")
+                self.driver.get(self.book_url)
+                return True
+            
             logging.info("Ожидание, пока пользователь откроет книгу вручную...")
             print("\n============================================")
             print("Пожалуйста, выберите книгу 'Quantum Poker' и откройте её.")
@@ -133,69 +193,89 @@ class KindleScraper:
     def extract_text(self):
         """Извлечение текста из книги"""
         try:
-            logging.info(f"Начало извлечения текста. Планируется прочитать {self.pages_to_read} страниц")
+            if self.pages_to_read:
+                logging.info(f"Начало извлечения текста. Планируется прочитать {self.pages_to_read} страниц")
+            else:
+                logging.info("Начало извлечения текста. Чтение до конца книги")
+            if self.end_detector:
+                self.end_detector.reset()
+            pages_saved = 0
+            # Ожидание перелистывания по событиям DOM, page_load_time - верхняя граница
+            page_turn = PageTurnWaiter(self.driver, timeout=self.page_load_time)
+            # Счетчик команд WebDriver на страницу
+            commands = attach_command_counter(self.driver)
             
             # Клик по центру, чтобы убрать интерфейс
             self.driver.find_element(By.TAG_NAME, "body").click()
             time.sleep(2)
             
-            # Создаем файл для сохранения текста
-            with open(self.output_file, 'w', encoding='utf-8') as f:
-                for page in range(self.pages_to_read):
+            # Селектор текста для этой версии читалки: из кэша или одной проверкой всех кандидатов
+            if self.selector_resolver:
+                self.selector_resolver.resolve(self.driver)
+            
+            # Сборка текста и запись в файл идут в фоновом потоке, пока браузер перелистывает страницы
+            writer = BackgroundPageWriter(self.output_file, queue_size=self.writer_queue_size)
+            with writer:
+                for page in page_numbers(1, self.pages_to_read):
                     try:
-                        logging.info(f"Обработка страницы {page + 1}")
-                        
-                        # Попытка найти элементы с текстом (разные варианты селекторов)
-                        content_elements = []
-                        selectors = [
-                            "div.textLayer", 
-                            "div.kcrPage", 
-                            "div.bookReaderContainer", 
-                            "div.kindleReaderPage"
-                        ]
+                        logging.info(f"Обработка страницы {page}")
                         
-                        for selector in selectors:
-                            try:
-                                elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                                if elements:
-                                    content_elements = elements
-                                    logging.info(f"Найдены элементы с текстом по селектору: {selector}")
-                                    break
-                            except:
-                                continue
+                        # Текст, изображения и позиция читалки за один вызов WebDriver
+                        commands.start_page()
+                        if self.selector_resolver:
+                            extracted = extract_page(self.driver, self.selector_resolver.selectors)
+                            self.selector_resolver.observe(extracted["selector"])
+                        else:
+                            extracted = extract_page(self.driver)
+                        if extracted["selector"]:
+                            logging.info(f"Найдены элементы с текстом по селектору: {extracted['selector']}")
+                        else:
+                            logging.warning("Не найдены стандартные элементы с текстом, извлечен весь текст страницы")
                         
-                        # Если не нашли элементы ни по одному из селекторов, попробуем извлечь весь текст страницы
-                        if not content_elements:
-                            logging.warning("Не найдены стандартные элементы с текстом, извлекаем весь текст страницы")
-                            content_elements = [self.driver.find_element(By.TAG_NAME, "body")]
+                        # Проверяем, продвигается ли читалка (повтор текста, пустые страницы, неизменная позиция)
+                        end_reached = False
+                        if self.end_detector:
+                            end_reached = self.end_detector.observe(content="\n".join(extracted["texts"]), location=extracted["location"])
                         
-                        # Извлекаем текст
-                        page_text = ""
-                        for elem in content_elements:
-                            elem_text = elem.text.strip()
-                            if elem_text:
-                                page_text += elem_text + "\n"
+                        # Делаем скриншот для проверки (опционально)
+                        # self.driver.save_screenshot(f"page_{page}.png")
                         
-                        # Записываем в файл
-                        f.write(f"\n\n=== Страница {page + 1} ===\n")
-                        f.write(page_text.strip())
+                        # Нажимаем стрелку "вперёд" сразу после снятия страницы, до записи в файл
+                        if not end_reached:
+                            body = self.driver.find_element(By.TAG_NAME, "body")
+                            page_turn.arm()
+                            body.send_keys(Keys.ARROW_RIGHT)
                         
-                        # Делаем скриншот для проверки (опционально)
-                        # self.driver.save_screenshot(f"page_{page+1}.png")
+                        # Отдаем страницу в очередь записи (страницы, повторяющие предыдущую, пропускаем)
+                        if not (self.end_detector and self.end_detector.repeated):
+                            writer.submit(page, extracted["texts"])
+                            pages_saved += 1
                         
-                        # Нажимаем стрелку "вперёд"
-                        body = self.driver.find_element(By.TAG_NAME, "body")
-                        body.send_keys(Keys.ARROW_RIGHT)
+                        if end_reached:
+                            logging.info(f"Достигнут конец книги на странице {page}: {self.end_detector.reason}")
+                            break
                         
-                        # Ждем загрузки новой страницы
-                        time.sleep(self.page_load_time)
+                        # Ждем отрисовки новой страницы
+                        page_turn.wait()
+                        commands.end_page()
                         
                     except Exception as e:
-                        logging.error(f"Ошибка на странице {page+1}: {e}")
+                        if writer.error:
+                            raise
+                        logging.error(f"Ошибка на странице {page}: {e}")
+                        # Страница с ошибкой считается пустой: без ограничения страниц иначе цикл не завершится
+                        if self.end_detector and self.end_detector.observe(content=None):
+                            break
                         # Продолжаем, несмотря на ошибку на одной странице
                         continue
                 
-            logging.info(f"Извлечение текста завершено. Сохранено {self.pages_to_read} страниц в файл: {self.output_file}")
+            self.writer_stats = writer.stats()
+            logging.info(f"Извлечение текста завершено. Сохранено {pages_saved} страниц в файл: {self.output_file}")
+            logging.info(f"Очередь записи: {self.writer_stats}")
+            logging.info(f"Ожидание перелистывания: {page_turn.summary()}")
+            log_command_summary(commands, "Извлечение текста")
+            if self.selector_resolver:
+                logging.info(f"Селектор текста: {self.selector_resolver.winner} ({self.selector_resolver.stats})")
             return True
         except Exception as e:
             logging.error(f"Ошибка при извлечении текста: {e}")
@@ -226,7 +306,11 @@ class KindleScraper:
             logging.error(f"Ошибка в процессе скрапинга: {e}")
             return False
         finally:
-            if self.driver:
+            if self.driver and self.browser_lease:
+                # Браузер возвращает в пул владелец аренды
+                logging.info("Освобождаем браузер из пула")
+                self.driver = None
+            elif self.driver:
                 self.driver.quit()
                 logging.info("Веб-драйвер закрыт")
 
@@ -5,14 +5,79 @@ import logging
 import time
 import os
 import re
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse, parse_qs
+from fetch_engine import ConcurrentFetcher
+from rate_governor import get_shared_governor
+from endpoint_cache import EndpointDiscoveryCache
+from http_session import get_session, connection_stats
+from session_store import cookies_from_jar, get_default_store
+from end_of_book import EndOfBookDetector, END_STATUS_CODES, page_numbers
 
 logging.basicConfig(filename='kindle_web_scraper.log', level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Шаблоны известных API эндпоинтов Kindle
+API_ENDPOINT_TEMPLATES = [
+    "https://read.amazon.com/api/book/{asin}/metadata",
+    "https://read.amazon.com/api/book/{asin}/content",
+    "https://read.amazon.com/service/metadata/lookup?asin={asin}",
+    "https://read.amazon.com/service/content/lookup?asin={asin}"
+]
+
+def parse_page_html(page_num, html):
+    """
+    Извлекает текст из HTML страницы книги
+    
+    Функция вынесена на уровень модуля, чтобы ее можно было выполнять в пуле процессов
+    
+    :param page_num: Номер страницы
+    :param html: HTML страницы
+    :return: Список текстовых блоков страницы
+    """
+    texts = []
+    
+    # Извлекаем текст из HTML с помощью BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Ищем контент - в разных книгах он может быть в разных элементах
+    content_elements = soup.select('.page-content, .bookReaderReadingPanel, .kindleReaderPage')
+    
+    if content_elements:
+        for element in content_elements:
+            text = element.get_text(strip=True)
+            if text:
+                texts.append(f"Page {page_num}:\n{text}")
+                logging.info(f"Extracted {len(text)} characters from page {page_num}")
+    else:
+        # Если не нашли специальные элементы, попробуем извлечь весь текст страницы
+        try:
+            text = trafilatura.extract(html)
+            if text:
+                texts.append(f"Page {page_num}:\n{text}")
+                logging.info(f"Extracted {len(text)} characters from page {page_num} using trafilatura")
+            else:
+                # Если trafilatura не смогла извлечь текст, извлекаем весь текст страницы через BeautifulSoup
+                text = soup.get_text(strip=True)
+                if text:
+                    texts.append(f"Page {page_num} (raw):\n{text}")
+                    logging.info(f"Extracted {len(text)} characters as raw text from page {page_num}")
+                else:
+                    logging.warning(f"No text found on page {page_num}")
+        except Exception as tex:
+            # Если с trafilatura проблемы, используем BeautifulSoup
+            logging.warning(f"Error using trafilatura: {tex}, falling back to BeautifulSoup")
+            text = soup.get_text(strip=True)
+            if text:
+                texts.append(f"Page {page_num} (raw):\n{text}")
+                logging.info(f"Extracted {len(text)} characters as raw text from page {page_num}")
+    
+    return texts
+
 class KindleWebScraper:
-    def __init__(self, book_url=None, output_file="kindle_book.txt", email=None, password=None, session_cookies=None, page_count=50, auto_paginate=True):
+    def __init__(self, book_url=None, output_file="kindle_book.txt", email=None, password=None, session_cookies=None, page_count=50, auto_paginate=True, rate_governor=None, endpoint_cache=None, http_cache=None, session_store=None, parallel_window=1, parse_workers=None, detect_end=False, retry_policy=None):
         """
         Инициализация веб-скрапера для Kindle Cloud Reader
         
@@ -21,21 +86,38 @@ class KindleWebScraper:
         :param email: Email для входа в Amazon
         :param password: Пароль для входа в Amazon
         :param session_cookies: Cookies для авторизации (опционально)
-        :param page_count: Количество страниц для чтения (при автоматической пагинации)
+        :param page_count: Количество страниц для чтения (при автоматической пагинации; None или 0 - до конца книги)
         :param auto_paginate: Включение автоматической пагинации
+        :param rate_governor: Регулятор частоты запросов (по умолчанию общий для процесса)
+        :param endpoint_cache: Кэш обнаруженных API эндпоинтов (по умолчанию дисковый кэш в .kindle_cache)
+        :param http_cache: Хранилище HTTP-ответов для условных запросов (None - общее дисковое хранилище, False - без кэша)
+        :param session_store: Зашифрованное хранилище авторизованных сессий (None - общее хранилище, False - всегда полный вход)
+        :param parallel_window: Количество страниц, загружаемых одновременно (1 - последовательная пагинация)
+        :param parse_workers: Количество процессов для разбора HTML (по умолчанию по размеру окна, не больше числа ядер)
+        :param detect_end: Останавливать пагинацию при обнаружении конца книги (включается автоматически без page_count)
+        :param retry_policy: Политика повторов временных ошибок (по умолчанию общая для процесса)
         """
         self.book_url = book_url
         self.output_file = output_file
         self.email = email
         self.password = password
         self.session_cookies = session_cookies or {}
-        self.session = requests.Session()
+        
+        # Общий для процесса пул соединений; cookies хранятся отдельно для каждой учетной записи.
+        # Кэш ответов с ревалидацией по ETag/Last-Modified подключен на уровне адаптера
+        self.session = get_session(account=email, http_cache=http_cache)
+        self.http_cache_adapter = self.session.get_adapter('https://') if http_cache is not False else None
+        
         self.page_count = page_count
         self.auto_paginate = auto_paginate
+        self.parallel_window = max(1, int(parallel_window or 1))
+        self.parse_workers = parse_workers
+        self.end_detector = EndOfBookDetector() if detect_end or not page_count else None
         self.current_page = 0
         self.current_page_callback = None
         self.stop_requested = False
         self.is_authenticated = False
+        self.session_store = get_default_store() if session_store is None else session_store
         
         # Устанавливаем заголовки для имитации браузера
         self.headers = {
@@ -50,10 +132,39 @@ class KindleWebScraper:
         for cookie_name, cookie_value in self.session_cookies.items():
             self.session.cookies.set(cookie_name, cookie_value)
         
+        # Адаптивный регулятор частоты запросов вместо фиксированных пауз
+        self.rate_governor = rate_governor or get_shared_governor()
+        self.fetcher = ConcurrentFetcher(
+            self.session,
+            headers=self.headers,
+            max_in_flight=1,
+            rate_governor=self.rate_governor,
+            retry_policy=retry_policy
+        )
+        
+        self.endpoint_cache = endpoint_cache or EndpointDiscoveryCache()
+        
         self.text_content = []
         self.asin = self._extract_asin(book_url) if book_url else None
         logging.info(f"Initialized Kindle Web Scraper for ASIN: {self.asin}")
     
+    def get_telemetry(self):
+        """
+        Возвращает телеметрию запросов скрапера
+        
+        :return: Словарь с текущей частотой запросов, состоянием регулятора по хостам, повторами и автоматами защиты
+        """
+        telemetry = {
+            "request_rate": self.rate_governor.current_rate("read.amazon.com"),
+            "hosts": self.rate_governor.snapshot(),
+            "connections": connection_stats(),
+            "retries": self.fetcher.metrics.snapshot(),
+            "breakers": self.fetcher.retry_policy.breaker.snapshot()
+        }
+        if self.http_cache_adapter:
+            telemetry["http_cache"] = dict(self.http_cache_adapter.store.stats)
+        return telemetry
+    
     def _extract_asin(self, url):
         """
         Извлекает ASIN книги из URL
@@ -121,35 +232,41 @@ class KindleWebScraper:
                 logging.error("ASIN is not available")
                 return False
             
-            # Пробуем разные API endpoints
-            api_endpoints = [
-                f"https://read.amazon.com/api/book/{self.asin}/metadata",
-                f"https://read.amazon.com/api/book/{self.asin}/content",
-                f"https://read.amazon.com/service/metadata/lookup?asin={self.asin}",
-                f"https://read.amazon.com/service/content/lookup?asin={self.asin}"
-            ]
+            # Пробуем разные API endpoints, пропуская известные нерабочие
+            templates = self.endpoint_cache.plan(self.asin, API_ENDPOINT_TEMPLATES)
             
-            for endpoint in api_endpoints:
-                logging.info(f"Trying API endpoint: {endpoint}")
-                response = self.session.get(endpoint, headers=self.headers)
-                
-                if response.status_code == 200:
-                    try:
-                        data = response.json()
-                        if data:
-                            self.text_content.append(json.dumps(data, indent=2))
-                            logging.info(f"Successfully got data from endpoint: {endpoint}")
-                            return True
-                    except:
-                        # Возможно, ответ не в формате JSON, сохраняем как текст
-                        text = response.text
-                        if text:
-                            self.text_content.append(text)
-                            logging.info(f"Got text response from endpoint: {endpoint}")
-                            return True
-                
-                # Задержка между запросами
-                time.sleep(1)
+            try:
+                for template in templates:
+                    endpoint = template.format(asin=self.asin)
+                    logging.info(f"Trying API endpoint: {endpoint}")
+                    response = self.fetcher.fetch_one(endpoint)["response"]
+                    
+                    if response is None:
+                        continue
+                    
+                    if response.status_code == 200:
+                        try:
+                            data = response.json()
+                            if data:
+                                self.text_content.append(json.dumps(data, indent=2))
+                                self.endpoint_cache.record(self.asin, template, True, response.status_code)
+                                logging.info(f"Successfully got data from endpoint: {endpoint}")
+                                return True
+                        except ValueError:
+                            # Возможно, ответ не в формате JSON, сохраняем как текст.
+                            # HTML (страница входа или капчи) - не контент книги и не признак рабочего эндпоинта
+                            text = response.text
+                            if 'text/html' in response.headers.get('Content-Type', '') or 'ap/signin' in response.url:
+                                logging.warning(f"Endpoint {endpoint} returned an HTML page instead of content")
+                            elif text:
+                                self.text_content.append(text)
+                                self.endpoint_cache.record(self.asin, template, True, response.status_code)
+                                logging.info(f"Got text response from endpoint: {endpoint}")
+                                return True
+                    
+                    self.endpoint_cache.record(self.asin, template, False, response.status_code)
+            finally:
+                self.endpoint_cache.save()
             
             logging.warning("No successful responses from API endpoints")
             return False
@@ -197,10 +314,21 @@ class KindleWebScraper:
             # URL-шаблон для страниц книги
             page_url_template = f"https://read.amazon.com/read?asin={self.asin}&page={{0}}"
             
-            logging.info(f"Starting automatic pagination for {self.page_count} pages")
+            if self.page_count:
+                logging.info(f"Starting automatic pagination for {self.page_count} pages")
+            else:
+                logging.info("Starting automatic pagination until the end of the book")
+            if self.end_detector:
+                self.end_detector.reset()
+            
+            if self.parallel_window > 1:
+                self._paginate_parallel(page_url_template)
+                logging.info(f"Pagination completed, processed {self.current_page} pages")
+                self.save_text()
+                return True
             
             # Перебираем страницы
-            for page_num in range(1, self.page_count + 1):
+            for page_num in page_numbers(1, self.page_count):
                 # Проверяем флаг остановки
                 if self.stop_requested:
                     logging.info("Stop requested, interrupting pagination")
@@ -214,57 +342,28 @@ class KindleWebScraper:
                 
                 # Обновляем статус через callback, если он установлен
                 if self.current_page_callback:
-                    self.current_page_callback(self.current_page, self.page_count)
+                    self.current_page_callback(self.current_page, self.page_count or 0)
                 
                 page_url = page_url_template.format(page_num)
                 
-                logging.info(f"Fetching page {page_num} of {self.page_count}: {page_url}")
+                logging.info(f"Fetching page {page_num}: {page_url}")
                 
-                # Получаем контент страницы
-                response = self.session.get(page_url, headers=self.headers)
+                # Получаем контент страницы (темп задает регулятор частоты)
+                result = self.fetcher.fetch_one(page_url, page_num)
+                response = result["response"]
                 
-                if response.status_code == 200:
-                    # Извлекаем текст из HTML с помощью BeautifulSoup
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # Ищем контент - в разных книгах он может быть в разных элементах
-                    content_elements = soup.select('.page-content, .bookReaderReadingPanel, .kindleReaderPage')
-                    
-                    if content_elements:
-                        for element in content_elements:
-                            text = element.get_text(strip=True)
-                            if text:
-                                self.text_content.append(f"Page {page_num}:\n{text}")
-                                logging.info(f"Extracted {len(text)} characters from page {page_num}")
-                    else:
-                        # Если не нашли специальные элементы, попробуем извлечь весь текст страницы
-                        try:
-                            text = trafilatura.extract(response.text)
-                            if text:
-                                self.text_content.append(f"Page {page_num}:\n{text}")
-                                logging.info(f"Extracted {len(text)} characters from page {page_num} using trafilatura")
-                            else:
-                                # Если trafilatura не смогла извлечь текст, извлекаем весь текст страницы через BeautifulSoup
-                                text = soup.get_text(strip=True)
-                                if text:
-                                    self.text_content.append(f"Page {page_num} (raw):\n{text}")
-                                    logging.info(f"Extracted {len(text)} characters as raw text from page {page_num}")
-                                else:
-                                    logging.warning(f"No text found on page {page_num}")
-                        except Exception as tex:
-                            # Если с trafilatura проблемы, используем BeautifulSoup
-                            logging.warning(f"Error using trafilatura: {tex}, falling back to BeautifulSoup")
-                            text = soup.get_text(strip=True)
-                            if text:
-                                self.text_content.append(f"Page {page_num} (raw):\n{text}")
-                                logging.info(f"Extracted {len(text)} characters as raw text from page {page_num}")
+                page_texts = []
+                if response is None:
+                    logging.error(f"Failed to fetch page {page_num}: {result['error']}")
+                elif response.status_code == 200:
+                    page_texts = parse_page_html(page_num, response.text)
                 else:
                     logging.error(f"Failed to fetch page {page_num}, status code: {response.status_code}")
                 
-                # Пауза между запросами, чтобы не перегружать сервер
-                time.sleep(2)
+                if self._accept_page(page_texts, response):
+                    break
             
-            logging.info(f"Pagination completed, processed {self.current_page} of {self.page_count} pages")
+            logging.info(f"Pagination completed, processed {self.current_page} pages")
             
             # Финальное сохранение всего контента
             self.save_text()
@@ -274,6 +373,133 @@ class KindleWebScraper:
             logging.error(f"Error during pagination: {e}")
             return False
     
+    def _accept_page(self, page_texts, response):
+        """
+        Добавляет текст страницы в результат и передает его детектору конца книги.
+        Страницы, повторяющие предыдущую, в результат не попадают.
+        
+        :param page_texts: Текстовые блоки страницы
+        :param response: Ответ сервера или None при сетевой ошибке
+        :return: True если пагинацию нужно остановить
+        """
+        if not self.end_detector:
+            self.text_content.extend(page_texts)
+            return False
+        
+        # Сетевые ошибки, разомкнутый автомат защиты, 403/429/5xx: страница без контента.
+        # Как в KindleScraper.extract_text, такие страницы подряд считаются пустыми,
+        # иначе пагинация без ограничения страниц не остановится
+        if response is None or response.status_code not in (200,) + END_STATUS_CODES:
+            end_reached = self.end_detector.observe(content=None)
+            if end_reached:
+                logging.info(f"Stopping pagination at page {self.current_page}: {self.end_detector.reason} (failed requests)")
+            return end_reached
+        
+        # Заголовок "Page N:" отбрасываем, чтобы повторяющиеся страницы давали одинаковый хэш
+        content = "\n".join(text.split("\n", 1)[-1] for text in page_texts)
+        # Позицией читалки служит итоговый URL, если сервер перенаправил запрос страницы
+        location = response.url if response.history else None
+        end_reached = self.end_detector.observe(content=content, status_code=response.status_code, location=location)
+        if not self.end_detector.repeated:
+            self.text_content.extend(page_texts)
+        
+        if end_reached:
+            logging.info(f"Stopping pagination at page {self.current_page}: {self.end_detector.reason}")
+        return end_reached
+    
+    def _paginate_parallel(self, page_url_template):
+        """
+        Параллельная пагинация: окно страниц загружается одновременно, HTML разбирается
+        в пуле процессов, а буфер пересборки выдает страницы в text_content строго по порядку
+        
+        :param page_url_template: Шаблон URL страницы книги
+        """
+        window = self.parallel_window
+        parse_workers = self.parse_workers or min(window, os.cpu_count() or 1)
+        logging.info(f"Parallel pagination: window of {window} pages, {parse_workers} parse workers")
+        
+        next_to_submit = 1
+        next_to_emit = 1
+        in_flight = {}
+        parse_responses = {}
+        reassembly_buffer = {}
+        end_reached = False
+        
+        # spawn вместо fork: процесс Flask многопоточный, fork может унаследовать захваченные блокировки
+        mp_context = multiprocessing.get_context("spawn")
+        fetch_pool = ThreadPoolExecutor(max_workers=window)
+        parse_pool = ProcessPoolExecutor(max_workers=parse_workers, mp_context=mp_context)
+        try:
+            while not self.page_count or next_to_emit <= self.page_count:
+                if self.stop_requested:
+                    logging.info("Stop requested, interrupting pagination")
+                    break
+                
+                # Держим окно заполненным: не больше window страниц между выданной и запрошенной
+                while (not self.page_count or next_to_submit <= self.page_count) and next_to_submit < next_to_emit + window:
+                    page_url = page_url_template.format(next_to_submit)
+                    logging.info(f"Fetching page {next_to_submit}: {page_url}")
+                    future = fetch_pool.submit(self.fetcher.fetch_one, page_url, next_to_submit)
+                    in_flight[future] = ("fetch", next_to_submit)
+                    next_to_submit += 1
+                
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, page_num = in_flight.pop(future)
+                    
+                    if stage == "fetch":
+                        result = future.result()
+                        response = result["response"]
+                        if response is None:
+                            logging.error(f"Failed to fetch page {page_num}: {result['error']}")
+                            reassembly_buffer[page_num] = ([], None)
+                        elif response.status_code != 200:
+                            logging.error(f"Failed to fetch page {page_num}, status code: {response.status_code}")
+                            reassembly_buffer[page_num] = ([], response)
+                        else:
+                            parse_future = parse_pool.submit(parse_page_html, page_num, response.text)
+                            in_flight[parse_future] = ("parse", page_num)
+                            parse_responses[parse_future] = response
+                    else:
+                        response = parse_responses.pop(future)
+                        try:
+                            reassembly_buffer[page_num] = (future.result(), response)
+                        except Exception as e:
+                            logging.error(f"Error parsing page {page_num}: {e}")
+                            reassembly_buffer[page_num] = ([], response)
+                
+                # Выдаем готовые страницы строго по порядку
+                while next_to_emit in reassembly_buffer:
+                    page_texts, response = reassembly_buffer.pop(next_to_emit)
+                    self.current_page = next_to_emit
+                    end_reached = self._accept_page(page_texts, response)
+                    
+                    if self.current_page_callback:
+                        self.current_page_callback(self.current_page, self.page_count or 0)
+                    
+                    # Сохраняем прогресс после каждого окна страниц
+                    if next_to_emit % window == 0:
+                        self.save_text()
+                    
+                    next_to_emit += 1
+                    
+                    # Страницы после конца книги, уже запрошенные в окне, отбрасываются
+                    if end_reached:
+                        break
+                
+                if end_reached:
+                    break
+        finally:
+            fetch_pool.shutdown(wait=False, cancel_futures=True)
+            parse_pool.shutdown(wait=True, cancel_futures=True)
+    
+    def _store_session(self):
+        """
+        Сохраняет cookies авторизованной сессии для следующих запусков
+        """
+        if self.session_store and self.email:
+            self.session_store.save(self.email, cookies_from_jar(self.session.cookies))
+    
     def authenticate(self):
         """
         Авторизация на сайте Amazon
@@ -282,6 +508,11 @@ class KindleWebScraper:
         """
         if self.is_authenticated:
             return True
+        
+        # Сначала пробуем сохраненную сессию: одна проверка вместо полного входа
+        if self.email and self.session_store and self.session_store.restore_session(self.session, self.email, self.headers, self.fetcher):
+            self.is_authenticated = True
+            return True
             
         if not self.email or not self.password:
             logging.warning("No credentials provided for authentication")
@@ -345,12 +576,14 @@ class KindleWebScraper:
             if "Your Account" in login_response.text or "Hello," in login_response.text:
                 logging.info("Successfully authenticated with Amazon")
                 self.is_authenticated = True
+                self._store_session()
                 return True
                 
             # Проверяем перенаправление на страницу Kindle
             if "read.amazon.com" in login_response.url:
                 logging.info("Redirected to Kindle Cloud Reader, authentication successful")
                 self.is_authenticated = True
+                self._store_session()
                 return True
                 
             logging.warning("Authentication status uncertain, proceeding anyway")
@@ -370,8 +603,8 @@ class KindleWebScraper:
         logging.info(f"Starting extraction from URL: {self.book_url}")
         success = False
         
-        # Авторизуемся, если предоставлены учетные данные
-        if self.email and self.password:
+        # Авторизуемся, если предоставлены учетные данные или сохранена сессия
+        if self.email and (self.password or self.session_store):
             auth_success = self.authenticate()
             if not auth_success:
                 logging.error("Authentication failed, extraction might be limited")
@@ -407,10 +640,14 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Extract text from Kindle Cloud Reader using web scraping')
     parser.add_argument('--url', required=True, help='URL of the Kindle book')
     parser.add_argument('--output', default='kindle_book.txt', help='Path to save extracted text')
+    parser.add_argument('--pages', type=int, default=50, help='Number of pages to paginate')
+    parser.add_argument('--window', type=int, default=1, help='Number of pages fetched in parallel (1 = sequential)')
+    parser.add_argument('--parse-workers', type=int, default=None, help='Number of processes used to parse page HTML')
     
     args = parser.parse_args()
     
-    scraper = KindleWebScraper(book_url=args.url, output_file=args.output)
+    scraper = KindleWebScraper(book_url=args.url, output_file=args.output, page_count=args.pages,
+                               parallel_window=args.window, parse_workers=args.parse_workers)
     success = scraper.run()
     
     if success:
@@ -1,5 +1,6 @@
 from flask import Flask, render_template, request, jsonify, session, flash, redirect, url_for
 import os
+import atexit
 import threading
 import time
 import logging
@@ -9,6 +10,11 @@ from kindle_api_scraper import KindleAPIScraper
 from kindle_web_scraper import KindleWebScraper
 from kindle_auto_api_scraper import KindleAutoAPIScraper
 from kindle_api_scraper_enhanced import KindleAPIScraperEnhanced
+from page_turn import PageTurnWaiter
+from page_extractor import extract_page, attach_command_counter
+from page_writer import BackgroundPageWriter
+from browser_pool import BrowserPool
+from driver_resolver import get_default_resolver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 
@@ -31,9 +37,24 @@ scraper_status = {
     "progress": 0,
     "total_pages": 0,
     "current_page": 0,
-    "log_messages": []
+    "log_messages": [],
+    "telemetry": {}
 }
 
+# Пул запущенных браузеров, общий для заданий (включается KINDLE_BROWSER_POOL_SIZE=N, по умолчанию отключен)
+BROWSER_POOL_SIZE = int(os.environ.get("KINDLE_BROWSER_POOL_SIZE", "0"))
+browser_pool = BrowserPool(
+    size=BROWSER_POOL_SIZE,
+    lean=os.environ.get("KINDLE_BROWSER_POOL_LEAN") == "1",
+    max_pages=int(os.environ.get("KINDLE_BROWSER_MAX_PAGES", "500")),
+    max_memory_growth=int(os.environ.get("KINDLE_BROWSER_MAX_MEMORY_GROWTH_MB", "512")) * 1024 * 1024
+) if BROWSER_POOL_SIZE else None
+if browser_pool:
+    atexit.register(browser_pool.shutdown)
+
+# Перехват ответов улучшенного скрапера: js (подмена fetch в Firefox) или cdp (протокол DevTools в Chrome, без пула браузеров)
+CAPTURE_BACKEND = os.environ.get("KINDLE_CAPTURE_BACKEND", "js")
+
 def log_handler(message):
     """Обработчик логов для вывода в веб-интерфейс"""
     scraper_status["log_messages"].append(message)
@@ -41,24 +62,68 @@ def log_handler(message):
         # Ограничиваем количество сообщений в логе
         scraper_status["log_messages"] = scraper_status["log_messages"][-100:]
 
+_pool_warmed = False
+_pool_warm_lock = threading.Lock()
+
+def warm_browser_pool():
+    """
+    Прогревает пул браузеров один раз за процесс. Вызывается при запуске сервера и перед первым запросом,
+    но не при импорте модуля: дочерние процессы spawn (разбор страниц, шарды) импортируют main.py заново
+    и не должны запускать браузеры. KINDLE_BROWSER_POOL_ACCOUNT - учетная запись, сохраненная сессия
+    которой восстанавливается при прогреве.
+    """
+    global _pool_warmed
+    if not browser_pool:
+        return
+    with _pool_warm_lock:
+        if _pool_warmed:
+            return
+        _pool_warmed = True
+    browser_pool.warm(account=os.environ.get("KINDLE_BROWSER_POOL_ACCOUNT") or None)
+
+@app.before_request
+def warm_browser_pool_before_request():
+    """Прогрев пула в процессе, который обслуживает запросы (в том числе под WSGI сервером)"""
+    warm_browser_pool()
+
+def lease_browser(email):
+    """Берет браузер из пула для задания (None - пул отключен или занят, скрапер запустит свой браузер)"""
+    if not browser_pool:
+        return None
+    log_handler("Получение браузера из пула...")
+    lease = browser_pool.acquire(account=email)
+    if lease is None:
+        log_handler("Браузер из пула недоступен, будет запущен отдельный браузер")
+    return lease
+
+def release_browser(lease, pages=None):
+    """Возвращает браузер задания в пул"""
+    if lease:
+        browser_pool.release(lease, pages=pages)
+
 def run_scraper(email, password, book_url, output_file, pages_to_read, page_load_time):
     """Функция для запуска скрапера в отдельном потоке"""
+    scraper = None
+    lease = None
     try:
         scraper_status["running"] = True
         scraper_status["progress"] = 0
         scraper_status["total_pages"] = pages_to_read
         scraper_status["current_page"] = 0
         scraper_status["log_messages"] = []
+        scraper_status["telemetry"] = {}
         
         log_handler("Запуск процесса извлечения текста из Kindle Cloud Reader")
         
+        lease = lease_browser(email)
         scraper = KindleScraper(
             email=email,
             password=password,
             book_url=book_url,
             output_file=output_file,
             pages_to_read=pages_to_read,
-            page_load_time=page_load_time
+            page_load_time=page_load_time,
+            browser_lease=lease
         )
         
         # Настройка драйвера
@@ -73,7 +138,6 @@ def run_scraper(email, password, book_url, output_file, pages_to_read, page_load
         if not scraper.login():
             log_handler("Ошибка авторизации в Amazon!")
             scraper_status["running"] = False
-            scraper.driver.quit()
             return
         
         # Открытие книги
@@ -81,18 +145,27 @@ def run_scraper(email, password, book_url, output_file, pages_to_read, page_load
         if not scraper.open_book():
             log_handler("Ошибка при открытии книги!")
             scraper_status["running"] = False
-            scraper.driver.quit()
             return
         
         # Клик по центру, чтобы убрать интерфейс
         scraper.driver.find_element(By.TAG_NAME, "body").click()
         time.sleep(2)
         
+        # Селектор текста для этой версии читалки
+        if scraper.selector_resolver:
+            scraper.selector_resolver.resolve(scraper.driver)
+        
         # Извлечение текста
         log_handler(f"Начало извлечения текста. Планируется прочитать {pages_to_read} страниц")
         
-        # Создаем файл для сохранения текста
-        with open(output_file, 'w', encoding='utf-8') as f:
+        # Ожидание перелистывания по событиям DOM, page_load_time - верхняя граница
+        page_turn = PageTurnWaiter(scraper.driver, timeout=page_load_time)
+        # Счетчик команд WebDriver на страницу
+        commands = attach_command_counter(scraper.driver)
+        
+        # Сборка текста и запись в файл идут в фоновом потоке, пока браузер перелистывает страницы
+        writer = BackgroundPageWriter(output_file)
+        with writer:
             for page in range(pages_to_read):
                 try:
                     scraper_status["current_page"] = page + 1
@@ -100,58 +173,49 @@ def run_scraper(email, password, book_url, output_file, pages_to_read, page_load
                     
                     log_handler(f"Обработка страницы {page + 1}")
                     
-                    # Попытка найти элементы с текстом (разные варианты селекторов)
-                    content_elements = []
-                    selectors = [
-                        "div.textLayer", 
-                        "div.kcrPage", 
-                        "div.bookReaderContainer", 
-                        "div.kindleReaderPage"
-                    ]
-                    
-                    for selector in selectors:
-                        try:
-                            elements = scraper.driver.find_elements(By.CSS_SELECTOR, selector)
-                            if elements:
-                                content_elements = elements
-                                break
-                        except:
-                            continue
-                    
-                    # Если не нашли элементы ни по одному из селекторов, попробуем извлечь весь текст страницы
-                    if not content_elements:
-                        log_handler("Не найдены стандартные элементы с текстом, извлекаем весь текст страницы")
-                        content_elements = [scraper.driver.find_element(By.TAG_NAME, "body")]
+                    # Текст страницы за один вызов WebDriver
+                    commands.start_page()
+                    if scraper.selector_resolver:
+                        extracted = extract_page(scraper.driver, scraper.selector_resolver.selectors)
+                        scraper.selector_resolver.observe(extracted["selector"])
+                    else:
+                        extracted = extract_page(scraper.driver)
+                    if not extracted["selector"]:
+                        log_handler("Не найдены стандартные элементы с текстом, извлечен весь текст страницы")
                     
-                    # Извлекаем текст
-                    page_text = ""
-                    for elem in content_elements:
-                        elem_text = elem.text.strip()
-                        if elem_text:
-                            page_text += elem_text + "\n"
-                    
-                    # Записываем в файл
-                    f.write(f"\n\n=== Страница {page + 1} ===\n")
-                    f.write(page_text.strip())
-                    
-                    # Нажимаем стрелку "вперёд"
+                    # Нажимаем стрелку "вперёд" сразу после снятия страницы, до записи в файл
                     body = scraper.driver.find_element(By.TAG_NAME, "body")
+                    page_turn.arm()
                     body.send_keys(Keys.ARROW_RIGHT)
                     
-                    # Ждем загрузки новой страницы
-                    time.sleep(page_load_time)
+                    # Отдаем страницу в очередь записи
+                    writer.submit(page + 1, extracted["texts"])
+                    scraper_status["telemetry"] = {"writer": writer.stats()}
+                    
+                    # Ждем отрисовки новой страницы
+                    page_turn.wait()
+                    commands.end_page()
                     
                 except Exception as e:
+                    if writer.error:
+                        raise
                     log_handler(f"Ошибка на странице {page+1}: {str(e)}")
                     # Продолжаем, несмотря на ошибку на одной странице
                     continue
         
         log_handler(f"Извлечение текста завершено. Сохранено {pages_to_read} страниц в файл: {output_file}")
+        log_handler(f"Среднее ожидание перелистывания: {page_turn.summary()['average_wait']} с")
+        log_handler(f"Команд WebDriver на страницу: {commands.summary()['per_page']}")
+        scraper_status["telemetry"] = {"writer": writer.stats()}
+        log_handler(f"Очередь записи: {scraper_status['telemetry']['writer']}")
         
     except Exception as e:
         log_handler(f"Ошибка в процессе скрапинга: {str(e)}")
     finally:
-        if scraper and hasattr(scraper, 'driver') and scraper.driver:
+        if lease:
+            release_browser(lease, pages=scraper_status["current_page"])
+            log_handler("Браузер возвращен в пул")
+        elif scraper and hasattr(scraper, 'driver') and scraper.driver:
             scraper.driver.quit()
             log_handler("Веб-драйвер закрыт")
         scraper_status["running"] = False
@@ -165,6 +229,7 @@ def run_api_scraper(response_file=None, output_file=None, book_url=None, email=N
         scraper_status["total_pages"] = 1  # Изначально устанавливаем одну операцию
         scraper_status["current_page"] = 0
         scraper_status["log_messages"] = []
+        scraper_status["telemetry"] = {}
         
         log_handler("Запуск процесса извлечения текста через API")
         
@@ -207,6 +272,9 @@ def run_api_scraper(response_file=None, output_file=None, book_url=None, email=N
         end_time = time.time()
         processing_time = end_time - start_time
         
+        # Публикуем телеметрию запросов (текущая частота регулятора)
+        scraper_status["telemetry"] = scraper.get_telemetry()
+        
         if success:
             scraper_status["progress"] = 100
             log_handler(f"Текст успешно извлечен и сохранен в файл: {output_file}")
@@ -266,22 +334,27 @@ def test_enhanced_api_scraper():
 
 def run_auto_api_scraper(book_url, output_file, email=None, password=None, page_load_time=5):
     """Функция для запуска автоматического API скрапера в отдельном потоке"""
+    scraper = None
+    lease = None
     try:
         scraper_status["running"] = True
         scraper_status["progress"] = 0
         scraper_status["total_pages"] = 10  # Предполагаемое количество страниц для начала
         scraper_status["current_page"] = 0
         scraper_status["log_messages"] = []
+        scraper_status["telemetry"] = {}
         
         log_handler("Запуск автоматического API парсера для книги")
         
         # Создаем экземпляр автоматического API скрапера
+        lease = lease_browser(email)
         scraper = KindleAutoAPIScraper(
             email=email,
             password=password,
             book_url=book_url,
             output_file=output_file,
-            page_load_time=page_load_time
+            page_load_time=page_load_time,
+            browser_lease=lease
         )
         
         # Устанавливаем обработчик обновления текущей страницы
@@ -316,6 +389,13 @@ def run_auto_api_scraper(book_url, output_file, email=None, password=None, page_
         # Засекаем время окончания обработки
         end_time = time.time()
         processing_time = end_time - start_time
+        if scraper.traffic_stats:
+            scraper_status["telemetry"] = {"traffic": scraper.traffic_stats}
+            log_handler(f"Трафик на страницу: {scraper.traffic_stats['bytes_per_page']} байт "
+                        f"(оценка с повторной загрузкой ответов, не измерена: {scraper.traffic_stats['estimated_refetch_bytes_per_page']} байт)")
+        if scraper.page_watch_stats:
+            scraper_status["telemetry"]["page_watch"] = scraper.page_watch_stats
+            log_handler(f"Обнаружение перелистывания: {scraper.page_watch_stats}")
         
         if success:
             # Обновляем прогресс до 100%
@@ -343,6 +423,7 @@ def run_auto_api_scraper(book_url, output_file, email=None, password=None, page_
     except Exception as e:
         log_handler(f"Ошибка в процессе автоматического API-скрапинга: {str(e)}")
     finally:
+        release_browser(lease, pages=scraper.current_page if scraper else None)
         scraper_status["running"] = False
 
 def run_web_scraper(book_url, output_file, email=None, password=None, page_count=50, auto_paginate=True):
@@ -355,6 +436,7 @@ def run_web_scraper(book_url, output_file, email=None, password=None, page_count
         scraper_status["total_pages"] = page_count if auto_paginate else 1
         scraper_status["current_page"] = 0
         scraper_status["log_messages"] = []
+        scraper_status["telemetry"] = {}
         
         log_handler("Запуск процесса извлечения текста через веб-парсер")
         
@@ -394,8 +476,10 @@ def run_web_scraper(book_url, output_file, email=None, password=None, page_count
         def update_status_callback(current_page, total_pages):
             scraper_status["current_page"] = current_page
             # Вычисляем прогресс на основе текущей страницы
-            progress = min(100, int(10 + (current_page / total_pages) * 90)) if total_pages > 0 else 100
-            scraper_status["progress"] = progress
+            # Без ограничения страниц (чтение до конца книги) прогресс неизвестен до завершения
+            if total_pages > 0:
+                scraper_status["progress"] = min(100, int(10 + (current_page / total_pages) * 90))
+            scraper_status["telemetry"] = scraper.get_telemetry()
             
         # Привязываем обработчик к скраперу
         scraper.current_page_callback = update_status_callback
@@ -405,6 +489,7 @@ def run_web_scraper(book_url, output_file, email=None, password=None, page_count
         
         # Устанавливаем 100% прогресс по окончании
         scraper_status["progress"] = 100
+        scraper_status["telemetry"] = scraper.get_telemetry()
         if success:
             log_handler(f"Текст успешно извлечен и сохранен в файл: {output_file}")
         else:
@@ -417,6 +502,8 @@ def run_web_scraper(book_url, output_file, email=None, password=None, page_count
 
 def run_enhanced_api_scraper(book_url, output_file, email=None, password=None, images_dir=None, max_pages=20, page_load_time=5):
     """Функция для запуска улучшенного API скрапера с поддержкой изображений в отдельном потоке"""
+    scraper = None
+    lease = None
     try:
         scraper_status["running"] = True
         scraper_status["progress"] = 0
@@ -426,7 +513,8 @@ def run_enhanced_api_scraper(book_url, output_file, email=None, password=None, i
         
         log_handler("Запуск улучшенного API парсера для книги с поддержкой изображений")
         
-        # Создаем экземпляр улучшенного API скрапера
+        # Создаем экземпляр улучшенного API скрапера (пул содержит только Firefox)
+        lease = lease_browser(email) if CAPTURE_BACKEND != "cdp" else None
         scraper = KindleAPIScraperEnhanced(
             email=email,
             password=password,
@@ -434,16 +522,18 @@ def run_enhanced_api_scraper(book_url, output_file, email=None, password=None, i
             output_file=output_file,
             images_dir=images_dir if images_dir else "kindle_images",
             page_load_time=page_load_time,
-            max_pages=max_pages
+            max_pages=max_pages,
+            browser_lease=lease,
+            capture_backend=CAPTURE_BACKEND
         )
         
         # Устанавливаем обработчик обновления статуса
         def update_status_callback(current_page, total_pages):
             scraper_status["current_page"] = current_page
             scraper_status["total_pages"] = max(total_pages, max_pages)
-            # Вычисляем прогресс на основе текущей страницы
-            progress = min(100, int((current_page / max_pages) * 100))
-            scraper_status["progress"] = progress
+            # Вычисляем прогресс на основе текущей страницы (без ограничения страниц прогресс неизвестен)
+            if max_pages:
+                scraper_status["progress"] = min(100, int((current_page / max_pages) * 100))
             
         # Устанавливаем колбэк для отслеживания прогресса
         scraper.current_page_callback = update_status_callback
@@ -509,6 +599,7 @@ def run_enhanced_api_scraper(book_url, output_file, email=None, password=None, i
     except Exception as e:
         log_handler(f"Ошибка в процессе улучшенного API-скрапинга: {str(e)}")
     finally:
+        release_browser(lease, pages=scraper.current_page if scraper else None)
         scraper_status["running"] = False
 
 @app.route('/start_enhanced_scraping', methods=['POST'])
@@ -685,7 +776,11 @@ def start_scraping():
 @app.route('/get_status')
 def get_status():
     """Получение текущего статуса скрапера"""
-    return jsonify(scraper_status)
+    return jsonify({
+        **scraper_status,
+        "browser_pool": browser_pool.snapshot() if browser_pool else None,
+        "driver_resolutions": list(get_default_resolver().resolutions)[-10:]
+    })
 
 @app.route('/stop_scraping')
 def stop_scraping():
@@ -698,4 +793,7 @@ def stop_scraping():
     return jsonify({"status": "success", "message": "Процесс остановлен"})
 
 if __name__ == '__main__':
+    # С debug=True модуль выполняется и в процессе-наблюдателе перезагрузчика: браузеры запускаются только в рабочем процессе
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        warm_browser_pool()
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
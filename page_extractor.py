@@ -0,0 +1,222 @@
+import logging
+from collections import Counter
+
+from selenium.webdriver.common.by import By
+
+from end_of_book import READER_LOCATION_SELECTORS
+from page_turn import READER_CONTENT_SELECTORS
+
+
+# Изображения страницы (в порядке приоритета)
+READER_IMAGE_SELECTORS = [
+    "img.kfx-image",
+    "img.kc-kindle-image",
+    "img.kb-image",
+    "img:not(.ui-icon)"
+]
+
+# За один вызов возвращает блоки текста первого найденного контейнера, изображения и позицию читалки
+EXTRACT_SCRIPT = """
+var textSelectors = arguments[0], imageSelectors = arguments[1], locationSelectors = arguments[2];
+var result = {selector: null, texts: [], images: [], location: null};
+
+var elements = [];
+for (var i = 0; i < textSelectors.length; i++) {
+    elements = document.querySelectorAll(textSelectors[i]);
+    if (elements.length) {
+        result.selector = textSelectors[i];
+        break;
+    }
+}
+if (!elements.length && document.body) {
+    elements = [document.body];
+}
+for (var j = 0; j < elements.length; j++) {
+    var text = (elements[j].innerText || '').trim();
+    if (text) {
+        result.texts.push(text);
+    }
+}
+
+// Одно изображение может подходить под несколько селекторов
+var seen = new Set();
+for (var k = 0; k < imageSelectors.length; k++) {
+    var images = document.querySelectorAll(imageSelectors[k]);
+    for (var m = 0; m < images.length; m++) {
+        if (seen.has(images[m])) {
+            continue;
+        }
+        seen.add(images[m]);
+        result.images.push({
+            index: result.images.length + 1,
+            src: images[m].src || '',
+            alt: images[m].getAttribute('alt') || ''
+        });
+    }
+}
+
+for (var n = 0; n < locationSelectors.length; n++) {
+    var element = document.querySelector(locationSelectors[n]);
+    if (element && element.textContent.trim()) {
+        result.location = element.textContent.trim();
+        break;
+    }
+}
+return result;
+"""
+
+
+def is_embedded_image(src):
+    """
+    :param src: Адрес изображения
+    :return: True для изображений, которые можно сохранить без отдельного запроса (data: и blob:)
+    """
+    return bool(src) and (src.startswith("data:image") or src.startswith("blob:"))
+
+
+def extract_page(driver, text_selectors=None, image_selectors=None):
+    """
+    Извлекает текст, изображения и позицию читалки текущей страницы одним вызовом WebDriver
+
+    :param driver: Экземпляр веб-драйвера
+    :param text_selectors: CSS селекторы контейнеров текста
+    :param image_selectors: CSS селекторы изображений
+    :return: Словарь {selector, texts, images: [{index, src, alt}], location}
+    """
+    result = driver.execute_script(
+        EXTRACT_SCRIPT,
+        text_selectors or READER_CONTENT_SELECTORS,
+        image_selectors or READER_IMAGE_SELECTORS,
+        READER_LOCATION_SELECTORS
+    ) or {}
+    return {
+        "selector": result.get("selector"),
+        "texts": result.get("texts") or [],
+        "images": result.get("images") or [],
+        "location": result.get("location")
+    }
+
+
+def extract_page_per_element(driver, text_selectors=None, image_selectors=None):
+    """
+    Прежний способ извлечения: отдельный вызов WebDriver на каждый поиск, элемент и атрибут.
+    Оставлен для сравнения количества команд (см. CommandCounter).
+
+    :param driver: Экземпляр веб-драйвера
+    :param text_selectors: CSS селекторы контейнеров текста
+    :param image_selectors: CSS селекторы изображений
+    :return: Словарь в формате extract_page
+    """
+    result = {"selector": None, "texts": [], "images": [], "location": None}
+
+    for selector in text_selectors or READER_CONTENT_SELECTORS:
+        elements = driver.find_elements(By.CSS_SELECTOR, selector)
+        if elements:
+            result["selector"] = selector
+            result["texts"] = [elem.text.strip() for elem in elements if elem.text.strip()]
+            break
+    else:
+        text = driver.find_element(By.TAG_NAME, "body").text.strip()
+        result["texts"] = [text] if text else []
+
+    for selector in image_selectors or READER_IMAGE_SELECTORS:
+        for img in driver.find_elements(By.CSS_SELECTOR, selector):
+            result["images"].append({
+                "index": len(result["images"]) + 1,
+                "src": img.get_attribute("src") or "",
+                "alt": img.get_attribute("alt") or ""
+            })
+
+    for selector in READER_LOCATION_SELECTORS:
+        elements = driver.find_elements(By.CSS_SELECTOR, selector)
+        if elements and elements[0].text.strip():
+            result["location"] = elements[0].text.strip()
+            break
+
+    return result
+
+
+class CommandCounter:
+    def __init__(self, driver):
+        """
+        Считает команды WebDriver (каждая команда - отдельный запрос к драйверу браузера).
+        Перехватывает driver.execute, через который проходят все команды Selenium.
+
+        :param driver: Экземпляр веб-драйвера
+        """
+        self.driver = driver
+        self.total = 0
+        self.by_command = Counter()
+        self._pages = 0
+        self._page_start = 0
+        self._page_counts = []
+        self._original_execute = driver.execute
+
+        def execute(driver_command, params=None):
+            self.total += 1
+            self.by_command[driver_command] += 1
+            return self._original_execute(driver_command, params)
+
+        driver.execute = execute
+
+    def start_page(self):
+        """
+        Отмечает начало обработки страницы
+        """
+        self._page_start = self.total
+
+    def end_page(self):
+        """
+        Отмечает конец обработки страницы
+
+        :return: Количество команд WebDriver на этой странице
+        """
+        count = self.total - self._page_start
+        self._page_counts.append(count)
+        return count
+
+    def detach(self):
+        """
+        Возвращает драйверу исходный метод execute
+        """
+        self.driver.execute = self._original_execute
+
+    def summary(self):
+        """
+        :return: Словарь со статистикой (всего команд, страниц, команд на страницу, по типам команд)
+        """
+        pages = len(self._page_counts)
+        return {
+            "total": self.total,
+            "pages": pages,
+            "per_page": round(sum(self._page_counts) / pages, 1) if pages else 0.0,
+            "max_per_page": max(self._page_counts) if pages else 0,
+            "by_command": dict(self.by_command.most_common())
+        }
+
+
+def attach_command_counter(driver):
+    """
+    Возвращает счетчик команд драйвера, создавая его при первом обращении
+
+    :param driver: Экземпляр веб-драйвера
+    :return: Экземпляр CommandCounter
+    """
+    counter = getattr(driver, "_command_counter", None)
+    if counter is None:
+        counter = CommandCounter(driver)
+        driver._command_counter = counter
+    return counter
+
+
+def log_command_summary(counter, label="Page extraction"):
+    """
+    Пишет в лог статистику команд WebDriver
+
+    :param counter: Экземпляр CommandCounter
+    :param label: Подпись для строки лога
+    """
+    summary = counter.summary()
+    logging.info(f"{label}: {summary['per_page']} WebDriver commands per page "
+                 f"(max {summary['max_per_page']}, {summary['total']} total over {summary['pages']} pages)")
+    logging.debug(f"WebDriver commands by type: {summary['by_command']}")
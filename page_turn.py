@@ -0,0 +1,146 @@
+import time
+import logging
+
+
+# Контейнеры страницы в Kindle Cloud Reader (в порядке приоритета)
+READER_CONTENT_SELECTORS = [
+    "div.textLayer",
+    "div.kcrPage",
+    "div.bookReaderContainer",
+    "div.kindleReaderPage",
+    "div.kb-viewarea"
+]
+
+# Устанавливает наблюдатель: запоминает подпись текущей страницы (адрес, текст и изображения контейнера)
+# и отмечает момент, когда подпись изменилась, и время последней мутации DOM
+ARM_SCRIPT = """
+var selectors = arguments[0];
+function signature() {
+    var container = null;
+    for (var i = 0; i < selectors.length && !container; i++) {
+        container = document.querySelector(selectors[i]);
+    }
+    container = container || document.body;
+    var images = Array.prototype.map.call(container.querySelectorAll('img'), function (img) { return img.src; });
+    return location.href + '|' + container.textContent + '|' + images.join(',');
+}
+if (window.__kindlePageTurn && window.__kindlePageTurn.observer) {
+    window.__kindlePageTurn.observer.disconnect();
+}
+var state = {signature: signature, before: signature(), changedAt: 0, lastMutation: 0};
+state.observer = new MutationObserver(function () {
+    state.lastMutation = Date.now();
+    if (!state.changedAt && state.signature() !== state.before) {
+        state.changedAt = state.lastMutation;
+    }
+});
+state.observer.observe(document.body, {childList: true, subtree: true, characterData: true, attributes: true});
+window.__kindlePageTurn = state;
+return true;
+"""
+
+# Ждет изменения подписи страницы, затем паузы в мутациях (страница дорисована), не дольше таймаута
+WAIT_SCRIPT = """
+var timeoutMs = arguments[0], quietMs = arguments[1], callback = arguments[arguments.length - 1];
+var state = window.__kindlePageTurn, start = Date.now();
+if (!state) {
+    callback({armed: false, changed: false, elapsed: 0});
+    return;
+}
+var timer = setInterval(function () {
+    var now = Date.now();
+    // Смена адреса или перерисовка без мутаций DOM (например, только location.hash)
+    if (!state.changedAt && state.signature() !== state.before) {
+        state.changedAt = now;
+        state.lastMutation = now;
+    }
+    var settled = state.changedAt && now - state.lastMutation >= quietMs;
+    if (settled || now - start >= timeoutMs) {
+        clearInterval(timer);
+        state.observer.disconnect();
+        window.__kindlePageTurn = null;
+        callback({armed: true, changed: !!state.changedAt, elapsed: now - start});
+    }
+}, 25);
+"""
+
+
+class PageTurnWaiter:
+    def __init__(self, driver, timeout=5, quiet_period=0.15, selectors=None):
+        """
+        Ожидание перелистывания страницы по событиям DOM вместо фиксированной паузы.
+        Перед перелистыванием вызывается arm(), после него wait(): ожидание заканчивается,
+        как только новая страница отрисована, а timeout остается верхней границей.
+
+        :param driver: Экземпляр веб-драйвера
+        :param timeout: Максимальное время ожидания в секундах (прежний page_load_time)
+        :param quiet_period: Пауза без мутаций DOM, после которой страница считается отрисованной
+        :param selectors: CSS селекторы контейнера страницы
+        """
+        self.driver = driver
+        self.timeout = timeout
+        self.quiet_period = quiet_period
+        self.selectors = selectors or READER_CONTENT_SELECTORS
+        self._armed = False
+        self.stats = {"turns": 0, "timeouts": 0, "fallbacks": 0, "total_wait": 0.0}
+
+    def arm(self):
+        """
+        Запоминает текущую страницу. Вызывается до действия, которое перелистывает страницу.
+        """
+        try:
+            self._armed = bool(self.driver.execute_script(ARM_SCRIPT, self.selectors))
+        except Exception as e:
+            logging.debug(f"Could not install page turn observer: {e}")
+            self._armed = False
+
+    def wait(self):
+        """
+        Блокирует до отрисовки новой страницы или до истечения таймаута
+
+        :return: True если страница сменилась, False по таймауту
+        """
+        start_time = time.monotonic()
+        self.stats["turns"] += 1
+        changed = False
+
+        if self._armed:
+            try:
+                # Запас к таймауту скрипта, чтобы WebDriver не прервал ожидание раньше самого скрипта
+                self.driver.set_script_timeout(self.timeout + 5)
+                result = self.driver.execute_async_script(WAIT_SCRIPT, int(self.timeout * 1000), int(self.quiet_period * 1000)) or {}
+                changed = bool(result.get("changed"))
+                if not result.get("armed"):
+                    # Страница перезагрузилась целиком, наблюдатель потерян: ждем остаток таймаута
+                    self._sleep_remaining(start_time)
+            except Exception as e:
+                logging.debug(f"Page turn wait failed, falling back to fixed delay: {e}")
+                self.stats["fallbacks"] += 1
+                self._sleep_remaining(start_time)
+        else:
+            self.stats["fallbacks"] += 1
+            self._sleep_remaining(start_time)
+
+        self._armed = False
+        elapsed = time.monotonic() - start_time
+        self.stats["total_wait"] += elapsed
+        if not changed:
+            self.stats["timeouts"] += 1
+        logging.debug(f"Page turn {'completed' if changed else 'timed out'} in {elapsed:.2f}s")
+        return changed
+
+    def _sleep_remaining(self, start_time):
+        remaining = self.timeout - (time.monotonic() - start_time)
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def summary(self):
+        """
+        :return: Словарь со статистикой ожиданий (количество, таймауты, среднее время)
+        """
+        turns = self.stats["turns"]
+        return {
+            **self.stats,
+            "total_wait": round(self.stats["total_wait"], 3),
+            "average_wait": round(self.stats["total_wait"] / turns, 3) if turns else 0.0
+        }
@@ -0,0 +1,277 @@
+import time
+import logging
+
+from selenium.common.exceptions import TimeoutException
+
+
+# Наблюдатель изменений страницы читалки. MutationObserver пересчитывает отпечаток страницы только
+# после изменений DOM (когда они затихли на settle мс, но не позже 3 * settle от первого изменения серии,
+# иначе непрерывные мутации индикаторов загрузки откладывали бы проверку бесконечно), а ожидающий execute_async_script
+# разрешается, как только отпечаток меняется. Пока страница не меняется, ни браузер, ни Python не работают.
+WATCH_SCRIPT = """
+var settleMs = arguments[0];
+var selectors = arguments[1];
+var maxSettleMs = settleMs * 3;
+if (window.__kindlePageWatch) {
+    return window.__kindlePageWatch.state();
+}
+
+// Те же замены, что в KindleAutoAPIScraper._hash_content: время, даты, номер страницы, проценты
+var NORMALIZE = [
+    [/\\s+/g, ' '],
+    [/\\d{2}:\\d{2}:\\d{2}/g, ''],
+    [/\\d{1,2}\\/\\d{1,2}\\/\\d{2,4}/g, ''],
+    [/(Стр.|Страница|Page)\\s*\\d+\\s*(из|of)\\s*\\d+/g, ''],
+    [/\\d+\\s*%/g, '']
+];
+
+function fnv1a(text) {
+    var hash = 0x811c9dc5;
+    for (var i = 0; i < text.length; i++) {
+        hash ^= text.charCodeAt(i);
+        hash = Math.imul(hash, 0x01000193);
+    }
+    return (hash >>> 0).toString(16);
+}
+
+function readerElements() {
+    var elements = document.querySelectorAll(selectors);
+    return elements.length ? Array.prototype.slice.call(elements) : [document.body];
+}
+
+// Текст страницы и адреса изображений: читалка часто рисует страницу картинками (blob:),
+// и тогда при перелистывании меняется только src
+function fingerprint(elements) {
+    var parts = [];
+    elements.forEach(function(el) {
+        if (!el) {
+            return;
+        }
+        parts.push(el.innerText || '');
+        el.querySelectorAll('img').forEach(function(img) {
+            parts.push(img.currentSrc || img.src || '');
+        });
+    });
+    var text = parts.join('\\n');
+    NORMALIZE.forEach(function(rule) {
+        text = text.replace(rule[0], rule[1]);
+    });
+    return fnv1a(text.trim());
+}
+
+function imagesLoading(elements) {
+    return elements.some(function(el) {
+        return el && Array.prototype.some.call(el.querySelectorAll('img'), function(img) {
+            return !img.complete;
+        });
+    });
+}
+
+var watch = {
+    seq: 0,
+    fingerprint: fingerprint(readerElements()),
+    changedAt: Date.now(),
+    mutations: 0,
+    checks: 0,
+    waiters: [],
+    timer: null,
+    burstStart: null,
+    // Первое изменение, после которого отпечаток еще не сравнивался: от него считается задержка обнаружения
+    firstChangeAt: null,
+    imageRetries: 0,
+    state: function() {
+        return {
+            seq: watch.seq,
+            fingerprint: watch.fingerprint,
+            changedAt: watch.changedAt,
+            mutations: watch.mutations,
+            checks: watch.checks
+        };
+    },
+    resolve: function() {
+        var waiters = watch.waiters;
+        watch.waiters = [];
+        waiters.forEach(function(waiter) {
+            clearTimeout(waiter.timer);
+            waiter.callback(watch.state());
+        });
+    },
+    check: function() {
+        watch.timer = null;
+        watch.burstStart = null;
+        var elements = readerElements();
+        // Скриншот делается после загрузки изображений страницы (не дольше 10 попыток)
+        if (imagesLoading(elements) && watch.imageRetries < 10) {
+            watch.imageRetries += 1;
+            watch.schedule();
+            return;
+        }
+        watch.imageRetries = 0;
+        watch.checks += 1;
+        var firstChangeAt = watch.firstChangeAt;
+        watch.firstChangeAt = null;
+        var current = fingerprint(elements);
+        if (current !== watch.fingerprint) {
+            watch.fingerprint = current;
+            watch.seq += 1;
+            watch.changedAt = firstChangeAt || Date.now();
+            watch.resolve();
+        }
+    },
+    schedule: function() {
+        var now = Date.now();
+        if (watch.burstStart === null) {
+            watch.burstStart = now;
+        }
+        if (watch.firstChangeAt === null) {
+            watch.firstChangeAt = now;
+        }
+        clearTimeout(watch.timer);
+        watch.timer = setTimeout(watch.check, Math.max(0, Math.min(settleMs, watch.burstStart + maxSettleMs - now)));
+    },
+    wait: function(seq, timeoutMs, callback) {
+        if (watch.seq > seq) {
+            callback(watch.state());
+            return;
+        }
+        var waiter = {callback: callback};
+        waiter.timer = setTimeout(function() {
+            watch.waiters = watch.waiters.filter(function(other) {
+                return other !== waiter;
+            });
+            callback(watch.state());
+        }, timeoutMs);
+        watch.waiters.push(waiter);
+    }
+};
+
+new MutationObserver(function(records) {
+    watch.mutations += records.length;
+    watch.schedule();
+}).observe(document.documentElement, {
+    childList: true,
+    subtree: true,
+    characterData: true,
+    attributes: true,
+    attributeFilter: ['src', 'style', 'class']
+});
+
+// Новый запрос API без изменений DOM (например, страница из кэша) тоже ведет к проверке отпечатка
+try {
+    new PerformanceObserver(function(list) {
+        if (list.getEntries().some(function(entry) {
+            return /api|content|page/i.test(entry.name);
+        })) {
+            watch.schedule();
+        }
+    }).observe({type: 'resource'});
+} catch (e) {
+}
+
+window.__kindlePageWatch = watch;
+return watch.state();
+"""
+
+# Long-poll: возвращает состояние сразу, если отпечаток сменился после seq, иначе ждет изменения или таймаута.
+# null означает, что наблюдатель потерян (документ перезагружен) и его нужно установить заново.
+WAIT_SCRIPT = """
+var callback = arguments[arguments.length - 1];
+if (!window.__kindlePageWatch) {
+    callback(null);
+    return;
+}
+window.__kindlePageWatch.wait(arguments[0], arguments[1], callback);
+"""
+
+READER_SELECTORS = ".page-content, .book-content, .kindle-content, main, .app-reader, .app-view"
+
+
+class PageChangeWatcher:
+    def __init__(self, driver, settle=0.3, timeout=10, selectors=READER_SELECTORS):
+        """
+        Ожидание перелистывания страницы по событиям браузера вместо периодического опроса.
+
+        :param driver: Экземпляр веб-драйвера
+        :param settle: Сколько секунд DOM должен не меняться, прежде чем пересчитать отпечаток
+        :param timeout: Максимальная длительность одного ожидания в браузере (сек)
+        :param selectors: CSS селекторы области чтения
+        """
+        self.driver = driver
+        self.settle = settle
+        self.timeout = timeout
+        self.selectors = selectors
+        self.seq = 0
+        self.fingerprint = None
+        self.stats = {"changes": 0, "timed_changes": 0, "waits": 0, "timeouts": 0, "reinstalls": 0, "latency": 0.0, "max_latency": 0.0}
+
+    def install(self):
+        """
+        Устанавливает наблюдатель на текущей странице (повторная установка возвращает его состояние)
+
+        :return: Отпечаток текущей страницы
+        """
+        state = self.driver.execute_script(WATCH_SCRIPT, int(self.settle * 1000), self.selectors)
+        self.seq = state["seq"]
+        self.fingerprint = state["fingerprint"]
+        return self.fingerprint
+
+    def wait(self):
+        """
+        Ждет изменения страницы не дольше timeout секунд
+
+        :return: Состояние наблюдателя ({seq, fingerprint, changedAt, mutations, checks}),
+            если страница изменилась, иначе None
+        """
+        self.stats["waits"] += 1
+        # Запас на передачу ответа: таймаут скрипта не должен сработать раньше таймаута ожидания
+        self.driver.set_script_timeout(self.timeout + 5)
+        try:
+            state = self.driver.execute_async_script(WAIT_SCRIPT, self.seq, int(self.timeout * 1000))
+        except TimeoutException:
+            self.stats["timeouts"] += 1
+            return None
+
+        if state is None:
+            # Документ перезагружен: новый наблюдатель начинает отсчет заново, поэтому сравниваем отпечатки
+            self.stats["reinstalls"] += 1
+            previous = self.fingerprint
+            self.install()
+            if previous is None or self.fingerprint == previous:
+                return None
+            state = {"seq": self.seq, "fingerprint": self.fingerprint, "changedAt": None}
+        elif state["seq"] <= self.seq:
+            self.stats["timeouts"] += 1
+            return None
+
+        self.seq = state["seq"]
+        self.fingerprint = state["fingerprint"]
+        self.stats["changes"] += 1
+        if state.get("changedAt"):
+            # changedAt - первое изменение DOM серии, поэтому задержка включает ожидание settle.
+            # Браузер и скрапер работают на одной машине, поэтому часы совпадают
+            latency = max(0.0, time.time() - state["changedAt"] / 1000.0)
+            self.stats["timed_changes"] += 1
+            self.stats["latency"] += latency
+            self.stats["max_latency"] = max(self.stats["max_latency"], latency)
+        return state
+
+    def summary(self):
+        """
+        :return: Словарь метрик: количество изменений, ожиданий, таймаутов и задержка обнаружения
+            (средняя считается по изменениям со временем первой мутации; изменения, найденные
+            после перезагрузки документа, его не имеют)
+        """
+        stats = dict(self.stats)
+        timed = stats.pop("timed_changes")
+        stats["average_latency"] = round(stats.pop("latency") / timed, 3) if timed else 0.0
+        stats["max_latency"] = round(stats["max_latency"], 3)
+        return stats
+
+    def log_summary(self):
+        summary = self.summary()
+        logging.info(
+            f"Page watch: {summary['changes']} changes, {summary['waits']} waits, "
+            f"{summary['timeouts']} idle timeouts, {summary['reinstalls']} reinstalls, "
+            f"latency avg {summary['average_latency']}s max {summary['max_latency']}s"
+        )
+        return summary
@@ -0,0 +1,151 @@
+import time
+import queue
+import logging
+import threading
+
+
+# Признак завершения очереди записи
+_CLOSE = object()
+
+
+def normalize_page(texts):
+    """
+    :param texts: Тексты элементов страницы (extract_page()["texts"])
+    :return: Текст страницы для записи в файл
+    """
+    return "".join(text + "\n" for text in texts).strip()
+
+
+class BackgroundPageWriter:
+    def __init__(self, output_file, queue_size=8, flush_every=10):
+        """
+        Запись страниц в файл в фоновом потоке: цикл перелистывания только кладет сырой текст страницы
+        в ограниченную очередь и сразу перелистывает дальше, а сборка текста и запись на диск идут параллельно.
+        Переполненная очередь блокирует цикл (обратное давление), поэтому память не растет без ограничений.
+
+        :param output_file: Файл для сохранения текста
+        :param queue_size: Максимальное количество страниц в очереди
+        :param flush_every: Сбрасывать буфер файла на диск каждые столько страниц
+        """
+        self.output_file = output_file
+        self.queue_size = queue_size
+        self.flush_every = flush_every
+        self.error = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "written": 0,
+            "bytes": 0,
+            "max_depth": 0,
+            "depth_total": 0,
+            "full": 0,
+            "producer_wait": 0.0,
+            "consumer_idle": 0.0,
+            "write_seconds": 0.0
+        }
+        # Файл открывается в вызывающем потоке, чтобы ошибка доступа проявилась сразу
+        self._file = open(output_file, 'w', encoding='utf-8')
+        self._thread = threading.Thread(target=self._run, name="page-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, page, texts):
+        """
+        Ставит страницу в очередь записи. Блокирует, если очередь заполнена.
+
+        :param page: Номер страницы
+        :param texts: Тексты элементов страницы
+        :raises Exception: Ошибка фонового потока записи
+        """
+        if self.error:
+            raise self.error
+
+        depth = self._queue.qsize()
+        start_time = time.monotonic()
+        self._queue.put((page, texts))
+        waited = time.monotonic() - start_time
+
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["depth_total"] += depth
+            self._stats["max_depth"] = max(self._stats["max_depth"], depth + 1)
+            self._stats["producer_wait"] += waited
+            if depth >= self.queue_size:
+                self._stats["full"] += 1
+
+    def _run(self):
+        written_since_flush = 0
+        while True:
+            start_time = time.monotonic()
+            item = self._queue.get()
+            idle = time.monotonic() - start_time
+            if item is _CLOSE:
+                break
+            if self.error:
+                # После ошибки очередь только опустошается, чтобы цикл перелистывания не заблокировался
+                continue
+
+            page, texts = item
+            start_time = time.monotonic()
+            try:
+                chunk = f"\n\n=== Страница {page} ===\n" + normalize_page(texts)
+                self._file.write(chunk)
+                written_since_flush += 1
+                if written_since_flush >= self.flush_every:
+                    self._file.flush()
+                    written_since_flush = 0
+            except Exception as e:
+                logging.error(f"Background writer failed on page {page}: {e}")
+                self.error = e
+                continue
+
+            with self._lock:
+                self._stats["written"] += 1
+                self._stats["bytes"] += len(chunk)
+                self._stats["consumer_idle"] += idle
+                self._stats["write_seconds"] += time.monotonic() - start_time
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        """
+        Метрики очереди: producer_wait растет, когда не успевает запись (узкое место - диск),
+        consumer_idle растет, когда поток записи ждет страниц (узкое место - браузер)
+
+        :return: Словарь метрик
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["depth"] = self.depth
+        stats["average_depth"] = round(stats.pop("depth_total") / stats["submitted"], 2) if stats["submitted"] else 0.0
+        for key in ("producer_wait", "consumer_idle", "write_seconds"):
+            stats[key] = round(stats[key], 3)
+        return stats
+
+    def close(self):
+        """
+        Дожидается записи всех страниц из очереди и закрывает файл
+
+        :raises Exception: Ошибка фонового потока записи
+        """
+        if self._thread.is_alive():
+            self._queue.put(_CLOSE)
+            self._thread.join()
+        if not self._file.closed:
+            self._file.close()
+        if self.error:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.close()
+        except Exception:
+            # Исключение цикла перелистывания важнее ошибки записи
+            if exc_type is None:
+                raise
+        return False
@@ -0,0 +1,188 @@
+import time
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+
+# Статусы, которыми сервер сообщает о перегрузке
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+def parse_retry_after(value):
+    """
+    Разбирает заголовок Retry-After (секунды или HTTP-дата)
+
+    :param value: Значение заголовка
+    :return: Задержка в секундах или None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class AIMDRateGovernor:
+    def __init__(self, initial_rate=1.0, min_rate=0.1, max_rate=10.0, increase_step=0.25,
+                 decrease_factor=0.5, latency_factor=2.0, decrease_cooldown=1.0):
+        """
+        Адаптивный регулятор частоты запросов (AIMD) с отдельным состоянием для каждого хоста.
+        Частота растет аддитивно, пока ответы успешные и быстрые, и уменьшается
+        мультипликативно при 429/503 или росте задержки.
+
+        :param initial_rate: Начальная частота запросов в секунду
+        :param min_rate: Минимальная частота запросов в секунду
+        :param max_rate: Максимальная частота запросов в секунду (0 - регулятор отключен)
+        :param increase_step: Прирост частоты после каждого быстрого успешного ответа
+        :param decrease_factor: Множитель частоты при признаках перегрузки
+        :param latency_factor: Во сколько раз задержка должна превысить базовую, чтобы считаться ростом
+        :param decrease_cooldown: Минимальный интервал между двумя снижениями частоты в секундах
+        """
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.latency_factor = latency_factor
+        self.decrease_cooldown = decrease_cooldown
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    @property
+    def enabled(self):
+        return bool(self.max_rate and self.max_rate > 0)
+
+    def _host_state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = {
+                "rate": min(self.initial_rate, self.max_rate) if self.enabled else self.initial_rate,
+                "next_slot": 0.0,
+                "blocked_until": 0.0,
+                "baseline_latency": None,
+                "latency": None,
+                "last_decrease": 0.0,
+                "requests": 0,
+                "throttled": 0
+            }
+            self._hosts[host] = state
+        return state
+
+    def acquire(self, url):
+        """
+        Блокирует поток до момента, когда к хосту можно отправить следующий запрос
+
+        :param url: URL запроса
+        """
+        if not self.enabled:
+            return
+
+        host = urlparse(url).netloc
+        with self._lock:
+            state = self._host_state(host)
+            now = time.monotonic()
+            slot = max(now, state["next_slot"], state["blocked_until"])
+            state["next_slot"] = slot + 1.0 / state["rate"]
+
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def record(self, url, status_code=None, latency=None, headers=None):
+        """
+        Учитывает результат запроса и корректирует частоту для хоста
+
+        :param url: URL запроса
+        :param status_code: HTTP статус ответа (None при сетевой ошибке)
+        :param latency: Время ответа в секундах
+        :param headers: Заголовки ответа (для Retry-After)
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            state = self._host_state(host)
+            state["requests"] += 1
+            now = time.monotonic()
+
+            slow = False
+            if latency is not None:
+                if state["latency"] is None:
+                    state["latency"] = latency
+                else:
+                    state["latency"] = 0.8 * state["latency"] + 0.2 * latency
+                baseline = state["baseline_latency"]
+                if baseline is None or latency < baseline:
+                    state["baseline_latency"] = latency
+                else:
+                    # Базовая задержка медленно подстраивается под текущие условия
+                    state["baseline_latency"] = 0.95 * baseline + 0.05 * latency
+                slow = state["latency"] > state["baseline_latency"] * self.latency_factor
+
+            if status_code in THROTTLE_STATUS_CODES or status_code is None or slow:
+                if status_code in THROTTLE_STATUS_CODES:
+                    state["throttled"] += 1
+                    retry_after = parse_retry_after((headers or {}).get('Retry-After'))
+                    if retry_after:
+                        state["blocked_until"] = max(state["blocked_until"], now + retry_after)
+                        logging.warning(f"{host} asked to retry after {retry_after:.1f}s")
+
+                if now - state["last_decrease"] >= self.decrease_cooldown:
+                    old_rate = state["rate"]
+                    state["rate"] = max(self.min_rate, old_rate * self.decrease_factor)
+                    state["last_decrease"] = now
+                    reason = f"status {status_code}" if not slow else f"latency {state['latency']:.2f}s"
+                    logging.info(f"Rate for {host} decreased {old_rate:.2f} -> {state['rate']:.2f} req/s ({reason})")
+            elif 200 <= status_code < 300:
+                ceiling = self.max_rate if self.enabled else float('inf')
+                state["rate"] = min(ceiling, state["rate"] + self.increase_step)
+
+    def current_rate(self, url_or_host):
+        """
+        Возвращает текущую частоту запросов для хоста
+
+        :param url_or_host: URL или имя хоста
+        :return: Частота запросов в секунду
+        """
+        host = urlparse(url_or_host).netloc or url_or_host
+        with self._lock:
+            return self._host_state(host)["rate"]
+
+    def snapshot(self):
+        """
+        Возвращает состояние регулятора для телеметрии
+
+        :return: Словарь {хост: {rate, latency, requests, throttled}}
+        """
+        with self._lock:
+            return {
+                host: {
+                    "rate": round(state["rate"], 3),
+                    "latency": round(state["latency"], 3) if state["latency"] is not None else None,
+                    "requests": state["requests"],
+                    "throttled": state["throttled"]
+                }
+                for host, state in self._hosts.items()
+            }
+
+
+_shared_governor = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_governor():
+    """
+    Возвращает общий для процесса регулятор частоты запросов
+
+    :return: Экземпляр AIMDRateGovernor
+    """
+    global _shared_governor
+    with _shared_lock:
+        if _shared_governor is None:
+            _shared_governor = AIMDRateGovernor()
+        return _shared_governor
@@ -0,0 +1,366 @@
+import time
+import random
+import logging
+import threading
+from collections import deque
+from urllib.parse import urlparse
+
+import requests
+
+from rate_governor import parse_retry_after
+
+
+# Статусы временных ошибок, после которых запрос имеет смысл повторить
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Методы, повтор которых не меняет состояние на сервере
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(requests.RequestException):
+    """Запрос не отправлен: автомат защиты хоста разомкнут"""
+
+
+class RetryMetrics:
+    def __init__(self, max_events=100):
+        """
+        Метрики повторов и автоматов защиты для одного задания
+
+        :param max_events: Количество последних событий, которые хранятся для телеметрии
+        """
+        self._lock = threading.Lock()
+        self.counters = {
+            "attempts": 0,
+            "retries": 0,
+            "recovered": 0,
+            "gave_up": 0,
+            "budget_exhausted": 0,
+            "breaker_rejections": 0,
+            "breaker_transitions": 0
+        }
+        self.events = deque(maxlen=max_events)
+
+    def _event(self, kind, **details):
+        self.events.append({"time": time.time(), "event": kind, **details})
+
+    def record_attempt(self):
+        with self._lock:
+            self.counters["attempts"] += 1
+
+    def record_retry(self, url, attempt, reason, delay):
+        with self._lock:
+            self.counters["retries"] += 1
+            self._event("retry", url=url, attempt=attempt, reason=reason, delay=round(delay, 3))
+
+    def record_recovered(self, url, attempts):
+        with self._lock:
+            self.counters["recovered"] += 1
+            self._event("recovered", url=url, attempts=attempts)
+
+    def record_give_up(self, url, attempts, reason):
+        with self._lock:
+            self.counters["gave_up"] += 1
+            self._event("gave_up", url=url, attempts=attempts, reason=reason)
+
+    def record_budget_exhausted(self, url):
+        with self._lock:
+            self.counters["budget_exhausted"] += 1
+            self._event("budget_exhausted", url=url)
+
+    def record_rejection(self, host):
+        with self._lock:
+            self.counters["breaker_rejections"] += 1
+
+    def record_transition(self, host, old_state, new_state):
+        with self._lock:
+            self.counters["breaker_transitions"] += 1
+            self._event("breaker", host=host, old_state=old_state, new_state=new_state)
+
+    def snapshot(self):
+        """
+        :return: Словарь со счетчиками и последними событиями
+        """
+        with self._lock:
+            return {**self.counters, "events": list(self.events)}
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0):
+        """
+        Автомат защиты с отдельным состоянием для каждого хоста.
+        После failure_threshold ошибок подряд хост размыкается, запросы к нему не отправляются.
+        Через recovery_timeout секунд пропускается один пробный запрос: успех замыкает автомат,
+        ошибка снова размыкает его.
+
+        :param failure_threshold: Количество ошибок подряд для размыкания
+        :param recovery_timeout: Время до пробного запроса в секундах
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _host_state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = {"state": CLOSED, "failures": 0, "opened_at": 0.0, "probe_in_flight": False}
+            self._hosts[host] = state
+        return state
+
+    def _transition(self, host, state, new_state, metrics):
+        old_state = state["state"]
+        state["state"] = new_state
+        logging.warning(f"Circuit breaker for {host}: {old_state} -> {new_state}")
+        if metrics:
+            metrics.record_transition(host, old_state, new_state)
+
+    def allow(self, url, metrics=None):
+        """
+        Проверяет, можно ли отправить запрос к хосту
+
+        :param url: URL запроса
+        :param metrics: Метрики задания
+        :return: True если запрос разрешен
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            state = self._host_state(host)
+            if state["state"] == CLOSED:
+                return True
+
+            if state["state"] == OPEN and time.monotonic() - state["opened_at"] >= self.recovery_timeout:
+                self._transition(host, state, HALF_OPEN, metrics)
+
+            if state["state"] == HALF_OPEN and not state["probe_in_flight"]:
+                state["probe_in_flight"] = True
+                return True
+
+        if metrics:
+            metrics.record_rejection(host)
+        return False
+
+    def record(self, url, success, metrics=None):
+        """
+        Учитывает результат запроса
+
+        :param url: URL запроса
+        :param success: False для сетевых ошибок и ответов 5xx
+        :param metrics: Метрики задания
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            state = self._host_state(host)
+            state["probe_in_flight"] = False
+            if success:
+                state["failures"] = 0
+                if state["state"] != CLOSED:
+                    self._transition(host, state, CLOSED, metrics)
+                return
+
+            state["failures"] += 1
+            if state["state"] == HALF_OPEN or (state["state"] == CLOSED and state["failures"] >= self.failure_threshold):
+                state["opened_at"] = time.monotonic()
+                self._transition(host, state, OPEN, metrics)
+
+    def retry_in(self, url):
+        """
+        Возвращает время до пробного запроса к хосту
+
+        :param url: URL запроса
+        :return: Секунды до перехода в полуоткрытое состояние (0, если запрос можно пробовать сейчас)
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            state = self._host_state(host)
+            if state["state"] != OPEN:
+                return 0.0
+            return max(0.0, self.recovery_timeout - (time.monotonic() - state["opened_at"]))
+
+    def snapshot(self):
+        """
+        :return: Словарь {хост: {state, failures}}
+        """
+        with self._lock:
+            return {host: {"state": state["state"], "failures": state["failures"]} for host, state in self._hosts.items()}
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=20.0, multiplier=2.0, jitter="full",
+                 retry_statuses=RETRY_STATUS_CODES, budget_ratio=0.2, min_budget=10, breaker=None,
+                 max_breaker_wait=60.0):
+        """
+        Политика повторов с экспоненциальной задержкой, случайным разбросом и бюджетом повторов
+
+        :param max_attempts: Максимальное количество попыток одного запроса (1 - без повторов)
+        :param base_delay: Задержка перед первым повтором в секундах
+        :param max_delay: Максимальная задержка в секундах
+        :param multiplier: Множитель задержки для каждого следующего повтора
+        :param jitter: Разброс задержки: "full" (от 0 до задержки), "equal" (от половины до задержки) или None
+        :param retry_statuses: HTTP статусы, после которых запрос повторяется
+        :param budget_ratio: Доля повторов относительно первых попыток, которую разрешает бюджет
+        :param min_budget: Емкость бюджета: столько повторов доступно сразу, даже без первых попыток
+        :param breaker: Автомат защиты хостов (по умолчанию общий для процесса)
+        :param max_breaker_wait: Сколько секунд запрос может ждать пробного окна разомкнутого автомата
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.retry_statuses = tuple(retry_statuses)
+        self.budget_ratio = budget_ratio
+        self.budget_capacity = float(min_budget)
+        self.breaker = breaker or get_shared_breaker()
+        self.max_breaker_wait = max_breaker_wait
+        self._lock = threading.Lock()
+        self._budget = float(min_budget)
+
+    def delay(self, attempt, retry_after=None):
+        """
+        Вычисляет задержку перед повтором
+
+        :param attempt: Номер завершившейся попытки (начиная с 1)
+        :param retry_after: Задержка из заголовка Retry-After в секундах
+        :return: Задержка в секундах
+        """
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        if self.jitter == "full":
+            delay = random.uniform(0, delay)
+        elif self.jitter == "equal":
+            delay = delay / 2 + random.uniform(0, delay / 2)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def _deposit(self):
+        # Каждая первая попытка пополняет бюджет, поэтому доля повторов не превышает budget_ratio
+        with self._lock:
+            self._budget = min(self.budget_capacity, self._budget + self.budget_ratio)
+
+    def _withdraw(self):
+        with self._lock:
+            if self._budget < 1:
+                return False
+            self._budget -= 1
+            return True
+
+    def is_retryable(self, method, status_code=None, error=None):
+        """
+        Проверяет, является ли результат временной ошибкой, которую безопасно повторить
+
+        :param method: HTTP метод
+        :param status_code: HTTP статус ответа
+        :param error: Исключение при сетевой ошибке
+        :return: True если запрос можно повторить
+        """
+        if method.upper() not in IDEMPOTENT_METHODS:
+            return False
+        if error is not None:
+            return isinstance(error, (requests.ConnectionError, requests.Timeout)) and not isinstance(error, CircuitOpenError)
+        return status_code in self.retry_statuses
+
+    def execute(self, send, url, method="GET", metrics=None):
+        """
+        Выполняет запрос с повторами
+
+        :param send: Функция без аргументов, отправляющая запрос и возвращающая ответ requests
+        :param url: URL запроса (для автомата защиты и метрик)
+        :param method: HTTP метод
+        :param metrics: Метрики задания
+        :return: Кортеж (ответ или None, исключение или None, количество отправленных попыток)
+        """
+        attempt = 0
+        breaker_wait = 0.0
+        while True:
+            if not self.breaker.allow(url, metrics):
+                # Запрос не отправляется, а ждет пробного окна автомата (не дольше max_breaker_wait)
+                wait = max(self.breaker.retry_in(url), self.base_delay)
+                if breaker_wait + wait > self.max_breaker_wait:
+                    return None, CircuitOpenError(f"Circuit breaker is open for {urlparse(url).netloc}"), attempt
+                time.sleep(wait)
+                breaker_wait += wait
+                continue
+
+            if attempt == 0:
+                self._deposit()
+            attempt += 1
+            if metrics:
+                metrics.record_attempt()
+
+            response, error = None, None
+            try:
+                response = send()
+                status_code = response.status_code
+            except requests.RequestException as e:
+                error = e
+                status_code = None
+            except BaseException:
+                # Непредвиденная ошибка тоже учитывается, иначе пробный запрос полуоткрытого автомата не завершится
+                self.breaker.record(url, False, metrics)
+                raise
+
+            self.breaker.record(url, error is None and status_code < 500, metrics)
+
+            if not self.is_retryable(method, status_code, error):
+                if attempt > 1 and metrics:
+                    metrics.record_recovered(url, attempt)
+                return response, error, attempt
+
+            reason = f"status {status_code}" if error is None else type(error).__name__
+            if attempt >= self.max_attempts:
+                if metrics:
+                    metrics.record_give_up(url, attempt, reason)
+                return response, error, attempt
+
+            if not self._withdraw():
+                logging.warning(f"Retry budget exhausted, not retrying {url}")
+                if metrics:
+                    metrics.record_budget_exhausted(url)
+                return response, error, attempt
+
+            retry_after = parse_retry_after(response.headers.get('Retry-After')) if response is not None else None
+            delay = self.delay(attempt, retry_after)
+            logging.info(f"Retrying {url} in {delay:.2f}s (attempt {attempt} failed: {reason})")
+            if metrics:
+                metrics.record_retry(url, attempt, reason, delay)
+
+            # Освобождаем соединение неудачного ответа перед повтором
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+
+
+_shared_breaker = None
+_shared_policy = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_breaker():
+    """
+    Возвращает общий для процесса автомат защиты хостов
+
+    :return: Экземпляр CircuitBreaker
+    """
+    global _shared_breaker
+    with _shared_lock:
+        if _shared_breaker is None:
+            _shared_breaker = CircuitBreaker()
+        return _shared_breaker
+
+
+def get_default_policy():
+    """
+    Возвращает общую для процесса политику повторов
+
+    :return: Экземпляр RetryPolicy
+    """
+    global _shared_policy
+    breaker = get_shared_breaker()
+    with _shared_lock:
+        if _shared_policy is None:
+            _shared_policy = RetryPolicy(breaker=breaker)
+        return _shared_policy
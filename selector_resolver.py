@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+from page_turn import READER_CONTENT_SELECTORS
+
+
+DEFAULT_CACHE_FILE = os.path.join(os.environ.get("KINDLE_CACHE_DIR", ".kindle_cache"), "selectors.json")
+
+# Версия сборки читалки: явная версия, если читалка ее публикует, иначе имена ее скриптов (в них хэш сборки)
+READER_VERSION_SCRIPT = """
+var version = window.KindleReaderVersion || null;
+if (!version) {
+    var meta = document.querySelector('meta[name="kindle-reader-version"], meta[name="version"]');
+    version = meta ? meta.getAttribute('content') : null;
+}
+if (!version) {
+    var scripts = [];
+    for (var i = 0; i < document.scripts.length; i++) {
+        var src = document.scripts[i].src;
+        if (src && /reader|kindle|kcr/i.test(src)) {
+            scripts.push(src.split('?')[0].split('/').pop());
+        }
+    }
+    version = scripts.sort().join(',');
+}
+return location.host + '|' + (version || 'unknown');
+"""
+
+# Для каждого селектора возвращает количество элементов с непустым текстом
+PROBE_SCRIPT = """
+var selectors = arguments[0], counts = {};
+for (var i = 0; i < selectors.length; i++) {
+    var elements = document.querySelectorAll(selectors[i]), count = 0;
+    for (var j = 0; j < elements.length; j++) {
+        if ((elements[j].textContent || '').trim()) {
+            count++;
+        }
+    }
+    counts[selectors[i]] = count;
+}
+return counts;
+"""
+
+
+class SelectorResolver:
+    def __init__(self, cache_file=DEFAULT_CACHE_FILE, candidates=None, ttl=30 * 24 * 3600):
+        """
+        Выбор селектора контейнера текста для текущей сборки читалки.
+        Все кандидаты проверяются одним вызовом JavaScript, подошедший селектор запоминается
+        на диске по версии читалки, поэтому следующие страницы и запуски сразу используют его.
+
+        :param cache_file: Путь к JSON файлу кэша
+        :param candidates: CSS селекторы в порядке приоритета
+        :param ttl: Время жизни записи в секундах
+        """
+        self.cache_file = cache_file
+        self.candidates = list(candidates or READER_CONTENT_SELECTORS)
+        self.ttl = ttl
+        self.version = None
+        self.winner = None
+        self.stats = {"hits": 0, "probes": 0, "relearned": 0}
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Selector cache {self.cache_file} is unreadable, starting empty: {e}")
+        return {}
+
+    @property
+    def selectors(self):
+        """
+        :return: Кандидаты, упорядоченные так, что выученный селектор проверяется первым
+        """
+        if not self.winner:
+            return list(self.candidates)
+        return [self.winner] + [selector for selector in self.candidates if selector != self.winner]
+
+    def reader_version(self, driver):
+        """
+        Определяет версию сборки читалки
+
+        :param driver: Экземпляр веб-драйвера
+        :return: Короткий ключ версии или None
+        """
+        try:
+            version = driver.execute_script(READER_VERSION_SCRIPT)
+        except Exception as e:
+            logging.debug(f"Could not read reader version: {e}")
+            return None
+        return hashlib.sha1(version.encode('utf-8')).hexdigest()[:16] if version else None
+
+    def probe(self, driver, timeout=10, poll_interval=0.5):
+        """
+        Проверяет всех кандидатов одним вызовом, повторяя проверку, пока страница не отрисуется
+
+        :param driver: Экземпляр веб-драйвера
+        :param timeout: Максимальное время ожидания в секундах
+        :param poll_interval: Интервал между проверками в секундах
+        :return: Первый по приоритету селектор с текстом или None
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            self.stats["probes"] += 1
+            try:
+                counts = driver.execute_script(PROBE_SCRIPT, self.candidates) or {}
+            except Exception as e:
+                logging.debug(f"Selector probe failed: {e}")
+                counts = {}
+
+            for selector in self.candidates:
+                if counts.get(selector):
+                    return selector
+
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+    def resolve(self, driver, timeout=10):
+        """
+        Выбирает селектор для открытой книги: из кэша по версии читалки или проверкой кандидатов
+
+        :param driver: Экземпляр веб-драйвера
+        :param timeout: Максимальное время ожидания отрисовки при проверке
+        :return: Селекторы в порядке проверки (см. selectors)
+        """
+        self.version = self.reader_version(driver)
+        with self._lock:
+            entry = self._entries.get(self.version) if self.version else None
+        if entry and time.time() - entry.get("learned_at", 0) < self.ttl and entry.get("selector") in self.candidates:
+            self.winner = entry["selector"]
+            self.stats["hits"] += 1
+            logging.info(f"Selector cache hit for reader {self.version}: {self.winner}")
+            return self.selectors
+
+        self.winner = None
+        selector = self.probe(driver, timeout)
+        if selector:
+            logging.info(f"Learned text selector for reader {self.version}: {selector}")
+            self.learn(selector)
+        else:
+            logging.warning("None of the text selectors matched, using them in default order")
+        return self.selectors
+
+    def observe(self, selector):
+        """
+        Учитывает селектор, по которому фактически найден текст страницы.
+        Если сработал не выученный селектор, читалка изменилась и выбор переучивается.
+
+        :param selector: Сработавший селектор (None, если текст взят из body)
+        """
+        if selector and selector != self.winner:
+            if self.winner:
+                self.stats["relearned"] += 1
+                logging.info(f"Text selector changed from {self.winner} to {selector}")
+            self.learn(selector)
+
+    def learn(self, selector):
+        """
+        Запоминает селектор для текущей версии читалки и сохраняет кэш
+
+        :param selector: CSS селектор
+        """
+        self.winner = selector
+        if not self.version:
+            return
+        with self._lock:
+            self._entries[self.version] = {"selector": selector, "learned_at": time.time()}
+        self.save()
+
+    def save(self):
+        """
+        Сохраняет кэш на диск
+        """
+        with self._lock:
+            try:
+                cache_dir = os.path.dirname(self.cache_file)
+                if cache_dir and not os.path.exists(cache_dir):
+                    os.makedirs(cache_dir)
+
+                # Пишем во временный файл и атомарно заменяем, чтобы не повредить кэш
+                tmp_file = f"{self.cache_file}.tmp"
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(self._entries, f, indent=2)
+                os.replace(tmp_file, self.cache_file)
+            except OSError as e:
+                logging.error(f"Error saving selector cache: {e}")
@@ -0,0 +1,73 @@
+import logging
+from urllib.parse import urlparse
+
+from session_store import apply_to_session, cookies_from_driver
+
+
+# Заголовки браузера, которые переносятся в HTTP-сессию вместе с cookies
+BROWSER_HEADERS_SCRIPT = """
+return {
+    userAgent: navigator.userAgent,
+    languages: navigator.languages || [navigator.language]
+};
+"""
+
+
+def export_browser_session(driver, session, headers=None):
+    """
+    Переносит авторизацию из браузера в сессию requests: cookies, User-Agent и Accept-Language.
+    Сервер видит тот же клиент, что и при работе через браузер.
+
+    :param driver: Экземпляр веб-драйвера с выполненным входом
+    :param session: Сессия requests
+    :param headers: Исходные заголовки HTTP-клиента
+    :return: Заголовки, дополненные значениями браузера
+    """
+    cookies = cookies_from_driver(driver)
+    apply_to_session(session, cookies)
+
+    headers = dict(headers or {})
+    try:
+        browser = driver.execute_script(BROWSER_HEADERS_SCRIPT) or {}
+    except Exception as e:
+        logging.warning(f"Could not read browser headers: {e}")
+        browser = {}
+
+    if browser.get("userAgent"):
+        headers['User-Agent'] = browser["userAgent"]
+    languages = [language for language in browser.get("languages") or [] if language]
+    if languages:
+        # Формат как у браузера: en-US,en;q=0.9,ru;q=0.8
+        weighted = [languages[0]] + [f"{language};q={max(0.1, 1 - 0.1 * index):.1f}"
+                                     for index, language in enumerate(languages[1:], start=1)]
+        headers['Accept-Language'] = ",".join(weighted)
+
+    current = urlparse(driver.current_url)
+    if current.scheme in ('http', 'https') and current.netloc:
+        headers['Referer'] = f"{current.scheme}://{current.netloc}/"
+        headers['Origin'] = f"{current.scheme}://{current.netloc}"
+
+    logging.info(f"Exported {len(cookies)} browser cookies into HTTP session")
+    return headers
+
+
+def http_scraper_from_browser(driver, email=None, book_url=None, output_file="kindle_book.txt", **scraper_kwargs):
+    """
+    Создает KindleAPIScraper, авторизованный cookies браузера
+
+    :param driver: Экземпляр веб-драйвера с выполненным входом
+    :param email: Учетная запись (для отдельной сессии и сохранения в хранилище сессий)
+    :param book_url: URL книги
+    :param output_file: Файл для сохранения текста
+    :param scraper_kwargs: Дополнительные параметры KindleAPIScraper
+    :return: Экземпляр KindleAPIScraper
+    """
+    # Импорт внутри функции: модуль HTTP-скрапера настраивает свой лог-файл при импорте
+    from kindle_api_scraper import KindleAPIScraper
+
+    scraper = KindleAPIScraper(email=email, book_url=book_url, output_file=output_file, **scraper_kwargs)
+    # Обновляем словарь на месте: он же используется загрузчиком scraper.fetcher
+    scraper.headers.update(export_browser_session(driver, scraper.session, scraper.headers))
+    scraper.is_authenticated = True
+    scraper._store_session()
+    return scraper
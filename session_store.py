@@ -0,0 +1,323 @@
+import os
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from urllib.parse import urlparse
+
+from Cryptodome.Cipher import AES
+from Cryptodome.Random import get_random_bytes
+
+
+DEFAULT_STORE_DIR = os.path.join(os.environ.get("KINDLE_CACHE_DIR", ".kindle_cache"), "sessions")
+DEFAULT_KEY_FILE = os.path.join(os.environ.get("KINDLE_CACHE_DIR", ".kindle_cache"), "session.key")
+
+# Дешевая страница, которая без авторизации перенаправляет на форму входа
+PROBE_URL = "https://read.amazon.com/kindle-library"
+
+# Ответы проверки, означающие, что сохраненная сессия больше не действительна
+SIGNED_OUT_STATUSES = (401, 403)
+
+NONCE_SIZE = 12
+TAG_SIZE = 16
+
+
+def load_key(key_file=DEFAULT_KEY_FILE):
+    """
+    Возвращает ключ шифрования хранилища сессий.
+    Ключ берется из переменной окружения KINDLE_SESSION_KEY (любая строка),
+    иначе из файла ключа, который создается с правами 0600 при первом обращении.
+
+    :param key_file: Путь к файлу ключа
+    :return: 32 байта ключа AES-256
+    """
+    secret = os.environ.get("KINDLE_SESSION_KEY")
+    if secret:
+        return hashlib.sha256(secret.encode('utf-8')).digest()
+
+    if os.path.exists(key_file):
+        with open(key_file, 'rb') as f:
+            return base64.b64decode(f.read().strip())
+
+    key_dir = os.path.dirname(key_file)
+    if key_dir and not os.path.exists(key_dir):
+        os.makedirs(key_dir)
+
+    key = get_random_bytes(32)
+    fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(base64.b64encode(key))
+    logging.info(f"Created session store key {key_file}")
+    return key
+
+
+def cookies_from_jar(jar):
+    """
+    Преобразует cookies сессии requests в список словарей
+
+    :param jar: RequestsCookieJar
+    :return: Список cookies
+    """
+    return [{
+        "name": cookie.name,
+        "value": cookie.value,
+        "domain": cookie.domain,
+        "path": cookie.path,
+        "secure": bool(cookie.secure),
+        "expiry": int(cookie.expires) if cookie.expires else None
+    } for cookie in jar]
+
+
+def apply_to_session(session, cookies):
+    """
+    Загружает cookies в сессию requests
+
+    :param session: Сессия requests
+    :param cookies: Список cookies
+    """
+    for cookie in cookies:
+        session.cookies.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie.get("domain"),
+            path=cookie.get("path") or "/",
+            secure=cookie.get("secure", False),
+            expires=cookie.get("expiry")
+        )
+
+
+def cookies_from_driver(driver):
+    """
+    Возвращает cookies браузера в виде списка словарей
+
+    :param driver: Экземпляр веб-драйвера
+    :return: Список cookies
+    """
+    return [{
+        "name": cookie["name"],
+        "value": cookie["value"],
+        "domain": cookie.get("domain"),
+        "path": cookie.get("path", "/"),
+        "secure": cookie.get("secure", False),
+        "httpOnly": cookie.get("httpOnly", False),
+        "expiry": cookie.get("expiry")
+    } for cookie in driver.get_cookies()]
+
+
+def _cookie_matches_host(cookie, host):
+    domain = cookie.get("domain") or host
+    if domain.startswith('.'):
+        return host == domain[1:] or host.endswith(domain)
+    return host == domain
+
+
+def apply_to_driver(driver, cookies):
+    """
+    Загружает cookies в браузер.
+    WebDriver принимает cookie только для домена открытой страницы, поэтому открывается
+    легкая страница хоста проверки (read.amazon.com), а дополнительная страница - только для cookies,
+    которые нельзя установить с этого хоста. Для обычной сессии Amazon (cookies .amazon.com)
+    это одна навигация.
+
+    :param driver: Экземпляр веб-драйвера
+    :param cookies: Список cookies
+    """
+    probe_host = urlparse(PROBE_URL).netloc
+    by_host = {probe_host: []}
+    for cookie in cookies:
+        if _cookie_matches_host(cookie, probe_host):
+            by_host[probe_host].append(cookie)
+        else:
+            by_host.setdefault((cookie.get("domain") or probe_host).lstrip('.'), []).append(cookie)
+
+    for host, host_cookies in by_host.items():
+        if not host_cookies:
+            continue
+        driver.get(f"https://{host}/robots.txt")
+        for cookie in host_cookies:
+            selenium_cookie = {key: value for key, value in cookie.items() if value is not None}
+            try:
+                driver.add_cookie(selenium_cookie)
+            except Exception as e:
+                logging.debug(f"Could not restore cookie {cookie['name']} for {host}: {e}")
+
+
+class SessionStore:
+    def __init__(self, store_dir=DEFAULT_STORE_DIR, key=None, ttl=14 * 24 * 3600):
+        """
+        Зашифрованное (AES-GCM) хранилище cookies авторизованных сессий Amazon по учетным записям
+
+        :param store_dir: Директория хранилища
+        :param key: Ключ шифрования (по умолчанию из KINDLE_SESSION_KEY или файла ключа)
+        :param ttl: Максимальный возраст сохраненной сессии в секундах
+        """
+        self.store_dir = store_dir
+        self.ttl = ttl
+        self._key = key
+        self._lock = threading.Lock()
+
+    @property
+    def key(self):
+        if self._key is None:
+            self._key = load_key()
+        return self._key
+
+    def _path(self, account):
+        name = hashlib.sha256(account.lower().encode('utf-8')).hexdigest()
+        return os.path.join(self.store_dir, f"{name}.session")
+
+    def save(self, account, cookies):
+        """
+        Шифрует и сохраняет cookies учетной записи
+
+        :param account: Идентификатор учетной записи (email)
+        :param cookies: Список cookies
+        """
+        payload = json.dumps({"account": account, "saved_at": time.time(), "cookies": cookies}).encode('utf-8')
+        nonce = get_random_bytes(NONCE_SIZE)
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(account.lower().encode('utf-8'))
+        ciphertext, tag = cipher.encrypt_and_digest(payload)
+
+        with self._lock:
+            try:
+                if not os.path.exists(self.store_dir):
+                    os.makedirs(self.store_dir, mode=0o700)
+                path = self._path(account)
+                tmp_path = f"{path}.tmp"
+                fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(nonce + tag + ciphertext)
+                os.replace(tmp_path, path)
+                logging.info(f"Saved session for {account} ({len(cookies)} cookies)")
+            except OSError as e:
+                logging.error(f"Error saving session for {account}: {e}")
+
+    def load(self, account):
+        """
+        Загружает и расшифровывает cookies учетной записи
+
+        :param account: Идентификатор учетной записи (email)
+        :return: Список неистекших cookies или None, если сессии нет, она устарела или повреждена
+        """
+        path = self._path(account)
+        with self._lock:
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                return None
+
+        try:
+            nonce, tag, ciphertext = data[:NONCE_SIZE], data[NONCE_SIZE:NONCE_SIZE + TAG_SIZE], data[NONCE_SIZE + TAG_SIZE:]
+            cipher = AES.new(self.key, AES.MODE_GCM, nonce=nonce)
+            cipher.update(account.lower().encode('utf-8'))
+            payload = json.loads(cipher.decrypt_and_verify(ciphertext, tag))
+        except (ValueError, KeyError) as e:
+            logging.warning(f"Stored session for {account} cannot be decrypted, ignoring it: {e}")
+            return None
+
+        if time.time() - payload.get("saved_at", 0) > self.ttl:
+            logging.info(f"Stored session for {account} is older than {self.ttl}s, ignoring it")
+            return None
+
+        now = time.time()
+        return [cookie for cookie in payload.get("cookies", []) if not cookie.get("expiry") or cookie["expiry"] > now]
+
+    def delete(self, account):
+        """
+        Удаляет сохраненную сессию учетной записи
+
+        :param account: Идентификатор учетной записи (email)
+        """
+        with self._lock:
+            try:
+                os.remove(self._path(account))
+            except OSError:
+                pass
+
+    def restore_session(self, session, account, headers=None, fetcher=None):
+        """
+        Загружает сохраненные cookies в сессию requests и проверяет их одним запросом
+        (через регулятор частоты и политику повторов загрузчика).
+        Сессия удаляется только при перенаправлении на вход или ответе 401/403;
+        при 429, 5xx и сетевых ошибках она сохраняется для следующей попытки.
+
+        :param session: Сессия requests
+        :param account: Идентификатор учетной записи (email)
+        :param headers: Заголовки для проверочного запроса
+        :param fetcher: Загрузчик (fetch_engine.ConcurrentFetcher) для проверки (по умолчанию с общими регулятором и политикой)
+        :return: True если сохраненная сессия действительна
+        """
+        cookies = self.load(account)
+        if not cookies:
+            return False
+
+        apply_to_session(session, cookies)
+        if fetcher is None:
+            # Импорт внутри метода: fetch_engine не нужен браузерным скраперам
+            from fetch_engine import ConcurrentFetcher
+            fetcher = ConcurrentFetcher(session, headers=headers, timeout=15)
+        result = fetcher.fetch_one(PROBE_URL)
+        response = result["response"]
+        if response is None:
+            logging.warning(f"Session probe for {account} failed, keeping the stored session: {result['error']}")
+            return False
+
+        signed_out = "ap/signin" in response.url or any("ap/signin" in r.headers.get('Location', '') for r in response.history)
+        if response.status_code == 200 and not signed_out:
+            logging.info(f"Restored stored session for {account}")
+            return True
+
+        if signed_out or response.status_code in SIGNED_OUT_STATUSES:
+            logging.info(f"Stored session for {account} is no longer valid (status {response.status_code})")
+            self.delete(account)
+        else:
+            logging.warning(f"Could not verify stored session for {account} (status {response.status_code}), keeping it")
+        return False
+
+    def restore_driver(self, driver, account):
+        """
+        Загружает сохраненные cookies в браузер и проверяет их открытием страницы библиотеки
+
+        :param driver: Экземпляр веб-драйвера
+        :param account: Идентификатор учетной записи (email)
+        :return: True если сохраненная сессия действительна
+        """
+        cookies = self.load(account)
+        if not cookies:
+            return False
+
+        try:
+            apply_to_driver(driver, cookies)
+            driver.get(PROBE_URL)
+            valid = "ap/signin" not in driver.current_url
+        except Exception as e:
+            logging.warning(f"Browser session probe for {account} failed: {e}")
+            return False
+
+        if valid:
+            logging.info(f"Restored stored browser session for {account}")
+        else:
+            logging.info(f"Stored browser session for {account} is no longer valid")
+            self.delete(account)
+        return valid
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_default_store():
+    """
+    Возвращает общее для процесса хранилище сессий
+
+    :return: Экземпляр SessionStore
+    """
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = SessionStore()
+        return _default_store
@@ -0,0 +1,297 @@
+import os
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tab_capture import REACHED_NEXT_RANGE, location_ranges, location_url, merge_tab_pages, parse_location
+
+
+def run_shard(shard):
+    """
+    Читает один диапазон позиций книги в отдельном браузере (выполняется в процессе-исполнителе)
+
+    :param shard: Словарь задания ({index, book_url, asin, start, stop, cookies, output_file, images_dir,
+                  page_load_time, lean_browser})
+    :return: Словарь результата ({index, start, stop, pages, images, requests, last_location, reason,
+             error, startup_seconds, capture_seconds, pages_per_second})
+    """
+    # Импорт внутри функции: модуль скрапера настраивает логирование и Selenium при импорте
+    from kindle_api_scraper_enhanced import KindleAPIScraperEnhanced
+    from session_store import apply_to_driver
+
+    result = {
+        "index": shard["index"],
+        "start": shard["start"],
+        "stop": shard["stop"],
+        "pages": [],
+        "images": [],
+        "requests": [],
+        "last_location": None,
+        "reason": None,
+        "error": None,
+        "startup_seconds": 0.0,
+        "capture_seconds": 0.0,
+        "pages_per_second": 0.0
+    }
+
+    base, ext = os.path.splitext(shard["output_file"])
+    scraper = KindleAPIScraperEnhanced(
+        book_url=location_url(shard["book_url"], shard["asin"], shard["start"]),
+        output_file=f"{base}.shard{shard['index']}{ext}",
+        images_dir=os.path.join(shard["images_dir"], f"shard_{shard['index']}"),
+        page_load_time=shard["page_load_time"],
+        max_pages=None,
+        session_store=False,
+        lean_browser=shard["lean_browser"],
+        stop_location=shard["stop"]
+    )
+
+    start_time = time.monotonic()
+    try:
+        if not scraper.setup_driver():
+            raise RuntimeError("browser did not start")
+        # Снимок cookies координатора: вход не повторяется в каждом процессе
+        apply_to_driver(scraper.driver, shard["cookies"])
+        if not scraper.open_book():
+            raise RuntimeError("book did not open with the shared session")
+        result["startup_seconds"] = round(time.monotonic() - start_time, 3)
+
+        capture_start = time.monotonic()
+        scraper.navigate_pages()
+        result["capture_seconds"] = round(time.monotonic() - capture_start, 3)
+
+        location, total = parse_location(scraper.current_location)
+        result["last_location"] = location
+        if location is not None and location >= shard["stop"]:
+            result["reason"] = REACHED_NEXT_RANGE
+        elif location is not None and total and location >= total:
+            result["reason"] = "end_of_book"
+        elif scraper.end_detector and scraper.end_detector.finished:
+            result["reason"] = scraper.end_detector.reason
+        else:
+            result["reason"] = "stopped"
+
+        result["pages"] = scraper.structured_content["result"]["content"]
+        result["images"] = scraper.images
+        result["requests"] = scraper.captured_requests
+        result["metadata"] = {key: scraper.structured_content["result"][key] for key in ("title", "author", "bookId")}
+        if result["capture_seconds"]:
+            result["pages_per_second"] = round(len(result["pages"]) / result["capture_seconds"], 3)
+
+    except Exception as e:
+        logging.error(f"Shard {shard['index']} ({shard['start']}-{shard['stop']}) failed: {e}")
+        result["error"] = str(e)
+        result["reason"] = f"error: {e}"
+    finally:
+        scraper.cleanup()
+
+    return result
+
+
+def shard_pages(result):
+    """
+    Переводит результат процесса в формат вкладки для merge_tab_pages: изображения
+    привязываются к своей странице, изображения без страницы - к последней странице диапазона
+
+    :param result: Результат run_shard
+    :return: Словарь вкладки ({start, stop, pages, last_location, reason})
+    """
+    pages = [{"location": item.get("location"), "text": item["text"], "images": []} for item in result["pages"]]
+    by_number = {item["pageNumber"]: page for item, page in zip(result["pages"], pages)}
+    for image in result["images"]:
+        page = by_number.get(image.get("pageNumber")) or (pages[-1] if pages else None)
+        if page is not None:
+            page["images"].append({key: value for key, value in image.items() if key != "pageNumber"})
+
+    return {
+        "start": result["start"],
+        "stop": result["stop"],
+        "pages": pages,
+        "last_location": result["last_location"],
+        "reason": result["reason"]
+    }
+
+
+class ShardedBookScraper:
+    def __init__(self, email=None, password=None, book_url=None, output_file="kindle_sharded_book.txt",
+                 images_dir="kindle_images", page_load_time=5, shards=None, lean_browser=True, session_store=None):
+        """
+        Чтение одной книги несколькими процессами: диапазон позиций делится между процессами,
+        у каждого свой браузер и общий снимок cookies, результаты объединяются в structured_content
+
+        :param email: Email для входа в Amazon
+        :param password: Пароль для входа в Amazon
+        :param book_url: URL книги в Kindle Cloud Reader
+        :param output_file: Имя файла для сохранения текста
+        :param images_dir: Директория для сохранения изображений
+        :param page_load_time: Время ожидания загрузки страницы в секундах
+        :param shards: Количество процессов (по умолчанию половина ядер: браузер занимает несколько процессов)
+        :param lean_browser: Облегченный профиль браузера в процессах
+        :param session_store: Зашифрованное хранилище авторизованных сессий для входа координатора
+        """
+        self.email = email
+        self.password = password
+        self.book_url = book_url
+        self.output_file = output_file
+        self.images_dir = images_dir
+        self.page_load_time = page_load_time
+        self.shards = shards or max(1, (os.cpu_count() or 2) // 2)
+        self.lean_browser = lean_browser
+        self.session_store = session_store
+        self.scraper = None
+        self.report = {}
+
+    def _prepare(self):
+        """
+        Входит в учетную запись и определяет количество позиций книги в браузере координатора
+
+        :return: Кортеж (снимок cookies, всего позиций) или (None, None)
+        """
+        from kindle_api_scraper_enhanced import KindleAPIScraperEnhanced
+        from page_extractor import extract_page
+        from session_store import cookies_from_driver
+
+        coordinator = KindleAPIScraperEnhanced(
+            email=self.email,
+            password=self.password,
+            book_url=self.book_url,
+            output_file=self.output_file,
+            images_dir=self.images_dir,
+            page_load_time=self.page_load_time,
+            max_pages=None,
+            session_store=self.session_store,
+            lean_browser=self.lean_browser
+        )
+        self.scraper = coordinator
+        try:
+            if not coordinator.setup_driver() or not coordinator.open_kindle_cloud_reader() or not coordinator.open_book():
+                return None, None
+            _, total = parse_location(extract_page(coordinator.driver)["location"])
+            return cookies_from_driver(coordinator.driver), total
+        finally:
+            coordinator.cleanup()
+
+    def run(self):
+        """
+        Запускает чтение по процессам и сохраняет объединенный результат
+
+        :return: True если успешно, иначе False
+        """
+        start_time = time.monotonic()
+        cookies, total = self._prepare()
+        if not cookies or not total:
+            logging.error("Could not log in or read the book's location count, sharding is not possible")
+            return False
+
+        ranges = location_ranges(1, total, self.shards)
+        logging.info(f"Splitting {total} locations across {len(ranges)} processes: {ranges}")
+        shards = [{
+            "index": index,
+            "book_url": self.book_url,
+            "asin": self.scraper.asin,
+            "start": start,
+            "stop": stop,
+            "cookies": cookies,
+            "output_file": self.output_file,
+            "images_dir": self.images_dir,
+            "page_load_time": self.page_load_time,
+            "lean_browser": self.lean_browser
+        } for index, (start, stop) in enumerate(ranges)]
+
+        # spawn вместо fork: у каждого процесса свой Selenium и свои потоки
+        results = []
+        mp_context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=len(shards), mp_context=mp_context) as pool:
+            futures = [pool.submit(run_shard, shard) for shard in shards]
+            for future in as_completed(futures):
+                result = future.result()
+                logging.info(f"Shard {result['index']} finished: {len(result['pages'])} pages, {result['reason']}")
+                results.append(result)
+        results.sort(key=lambda result: result["index"])
+
+        gaps = self._merge(results)
+        wall_seconds = time.monotonic() - start_time
+        self.report = {
+            "shards": [{
+                "index": result["index"],
+                "start": result["start"],
+                "stop": result["stop"],
+                "pages": len(result["pages"]),
+                "reason": result["reason"],
+                "startup_seconds": result["startup_seconds"],
+                "capture_seconds": result["capture_seconds"],
+                "pages_per_second": result["pages_per_second"]
+            } for result in results],
+            "pages": len(self.scraper.structured_content["result"]["content"]),
+            "gaps": gaps,
+            "wall_seconds": round(wall_seconds, 3),
+            "pages_per_second": round(len(self.scraper.structured_content["result"]["content"]) / wall_seconds, 3),
+            "cpu_count": os.cpu_count()
+        }
+        self.log_report()
+
+        self.scraper.save_text()
+        self.scraper.save_structured_content()
+        return not any(result["error"] for result in results)
+
+    def _merge(self, results):
+        """
+        Объединяет результаты процессов в structured_content скрапера координатора
+
+        :param results: Результаты run_shard в порядке диапазонов
+        :return: Список пропущенных диапазонов позиций
+        """
+        tabs = [shard_pages(result) for result in results]
+        pages, gaps = merge_tab_pages(tabs, clip=True)
+        for gap in gaps:
+            logging.warning(f"Locations {gap['from']}-{gap['to']} are missing: shard {gap['tab'] - 1} stopped ({gap['reason']})")
+
+        book = self.scraper.structured_content["result"]
+        for result in results:
+            for key, value in result.get("metadata", {}).items():
+                if value and not book[key]:
+                    book[key] = value
+
+        self.scraper._store_merged_pages(pages)
+        self.scraper.captured_requests = [request for result in results for request in result["requests"]]
+        self.scraper.process_captured_json()
+        return gaps
+
+    def log_report(self):
+        """
+        Выводит пропускную способность процессов, чтобы подобрать их количество под ядра хоста
+        """
+        logging.info(f"{'shard':>6} {'locations':>13} {'pages':>6} {'startup, s':>11} {'capture, s':>11} {'pages/s':>8}  reason")
+        for shard in self.report["shards"]:
+            locations = f"{shard['start']}-{shard['stop'] - 1}"
+            logging.info(f"{shard['index']:>6} {locations:>13} {shard['pages']:>6} {shard['startup_seconds']:>11.1f} "
+                         f"{shard['capture_seconds']:>11.1f} {shard['pages_per_second']:>8.2f}  {shard['reason']}")
+        logging.info(f"Total: {self.report['pages']} pages in {self.report['wall_seconds']:.1f}s "
+                     f"({self.report['pages_per_second']:.2f} pages/s) with {len(self.report['shards'])} processes "
+                     f"on {self.report['cpu_count']} cores")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Read one Kindle book with several browser processes')
+    parser.add_argument('--url', required=True, help='URL of the Kindle book')
+    parser.add_argument('--email', required=True, help='Amazon account email')
+    parser.add_argument('--password', default=os.environ.get('KINDLE_PASSWORD'), help='Amazon password (default: KINDLE_PASSWORD)')
+    parser.add_argument('--output', default='kindle_sharded_book.txt', help='Path to save extracted text')
+    parser.add_argument('--images-dir', default='kindle_images', help='Directory for extracted images')
+    parser.add_argument('--shards', type=int, default=None, help='Number of browser processes (default: half of the cores)')
+    parser.add_argument('--page-load-time', type=float, default=5, help='Page load timeout in seconds')
+    parser.add_argument('--full-browser', action='store_true', help='Use the regular browser profile instead of the lean one')
+
+    args = parser.parse_args()
+
+    runner = ShardedBookScraper(email=args.email, password=args.password, book_url=args.url, output_file=args.output,
+                                images_dir=args.images_dir, page_load_time=args.page_load_time, shards=args.shards,
+                                lean_browser=not args.full_browser)
+    success = runner.run()
+    print(f"Extracted {runner.report.get('pages', 0)} pages to {args.output}" if success
+          else "Sharded extraction finished with errors. Check the log file for details.")
@@ -0,0 +1,94 @@
+import re
+from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
+
+from end_of_book import EndOfBookDetector
+
+
+# "Location 1,234 of 5,678", "Page 5 of 300", "Позиция 12 из 300", "5 / 300"
+LOCATION_PATTERN = re.compile(r'(\d[\d,]*)\s*(?:of|из|/)\s*(\d[\d,]*)', re.IGNORECASE)
+
+# Вкладка дошла до начала диапазона следующей вкладки
+REACHED_NEXT_RANGE = "reached_next_range"
+
+
+def parse_location(text):
+    """
+    Разбирает индикатор позиции читалки
+
+    :param text: Текст индикатора (например, "Location 120 of 4500")
+    :return: Кортеж (текущая позиция, всего позиций) или (None, None)
+    """
+    match = LOCATION_PATTERN.search(text or "")
+    if not match:
+        return None, None
+    return int(match.group(1).replace(",", "")), int(match.group(2).replace(",", ""))
+
+
+def location_ranges(first, total, parts):
+    """
+    Делит позиции книги на непрерывные диапазоны для вкладок
+
+    :param first: Первая позиция
+    :param total: Последняя позиция
+    :param parts: Количество диапазонов
+    :return: Список кортежей (начало, начало следующего диапазона); у последнего диапазона граница total + 1
+    """
+    parts = max(1, min(parts, total - first + 1))
+    span = (total - first + 1) / parts
+    starts = [first + int(round(span * index)) for index in range(parts)]
+    return list(zip(starts, starts[1:] + [total + 1]))
+
+
+def location_url(book_url, asin, location):
+    """
+    Формирует URL книги, открывающийся на заданной позиции
+
+    :param book_url: URL книги (может быть None)
+    :param asin: ASIN книги
+    :param location: Позиция читалки
+    :return: URL
+    """
+    parsed = urlparse(book_url or f"https://read.amazon.com/reader?asin={asin}")
+    query = parse_qs(parsed.query)
+    if asin:
+        query["asin"] = [asin]
+    query["location"] = [str(location)]
+    return urlunparse(parsed._replace(query=urlencode(query, doseq=True)))
+
+
+def merge_tab_pages(tabs, clip=False):
+    """
+    Объединяет страницы вкладок в порядке книги: вкладки идут по возрастанию диапазонов,
+    страницы внутри вкладки - в порядке чтения. Страницы на стыке диапазонов, прочитанные
+    обеими вкладками, остаются в одном экземпляре.
+
+    :param tabs: Список вкладок в порядке диапазонов ({start, stop, pages, last_location, reason})
+    :param clip: Отбрасывать страницы с позицией за границей диапазона: их владелец - следующий диапазон,
+                 поэтому результат на стыке не зависит от того, какая вкладка дочитала первой
+    :return: Кортеж (список страниц {location, text, images, tab}, список пропусков {tab, from, to, reason})
+    """
+    pages = []
+    seen = set()
+    gaps = []
+
+    for index, tab in enumerate(tabs):
+        for page in tab["pages"]:
+            if clip and index + 1 < len(tabs) and page.get("location") is not None and page["location"] >= tab["stop"]:
+                continue
+            if page["text"].strip():
+                digest = EndOfBookDetector.content_hash(page["text"])
+                if digest in seen:
+                    continue
+                seen.add(digest)
+            pages.append({**page, "tab": index + 1})
+
+        # Вкладка остановилась раньше начала следующего диапазона: часть книги не прочитана
+        if index + 1 < len(tabs) and tab["reason"] != REACHED_NEXT_RANGE:
+            gaps.append({
+                "tab": index + 1,
+                "from": tab["last_location"] or tab["start"],
+                "to": tabs[index + 1]["start"],
+                "reason": tab["reason"]
+            })
+
+    return pages, gaps